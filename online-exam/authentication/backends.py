@@ -0,0 +1,91 @@
+"""
+Sign-in with a username or an email address.
+
+The login form takes either. Resolving it used to take two rounds: an
+``authenticate`` by username and, when that failed, a lookup by email and a
+second ``authenticate``. A failed login therefore cost two password hashes
+(``ModelBackend`` hashes a dummy password for unknown usernames so that
+timing does not reveal them). This backend finds the account with one query
+on the two unique (indexed) columns, then hashes exactly once, real or dummy.
+
+Inactive accounts are returned when the password is right so the login view
+can tell the user to verify their email first. The view does not log them
+in, and ``get_user`` still refuses them, so their sessions stay invalid.
+
+Resolving the signed-in user on every request (``get_user``) reads the
+cache first. Entries are keyed by user id and a per-user version
+(``auth_user:<id>:v<n>``). Any save or delete of the user, including a
+role change, bumps the version (``authentication.signals``). A request
+that loaded the old row can then only write it under a key nobody reads,
+so it cannot put a stale user back.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models import Q
+
+
+USER_CACHE_TTL = getattr(settings, 'USER_CACHE_TTL', 3600)
+
+
+def _version_key(user_id):
+    return f'auth_user:{user_id}:version'
+
+
+def invalidate_user(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), 2, None)
+
+
+def find_user(identifier):
+    """The account whose username (preferred) or email is ``identifier``, or ``None``."""
+    if not identifier:
+        return None
+    User = get_user_model()
+    matches = list(User.objects.filter(Q(username=identifier) | Q(email=identifier))[:2])
+    # A username may look like someone else's email; the username wins, as before
+    for user in matches:
+        if user.username == identifier:
+            return user
+    return matches[0] if matches else None
+
+
+class UsernameOrEmailBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = find_user(username)
+        if user is None:
+            # Same cost as a wrong password for a real account
+            get_user_model()().set_password(password)
+            return None
+        if user.check_password(password):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        version = cache.get(_version_key(user_id), 1)
+        key = f'auth_user:{user_id}:v{version}'
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TTL)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        version = await cache.aget(_version_key(user_id), 1)
+        key = f'auth_user:{user_id}:v{version}'
+        user = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is None:
+                return None
+            await cache.aset(key, user, USER_CACHE_TTL)
+        return user if self.user_can_authenticate(user) else None
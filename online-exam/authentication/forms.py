@@ -0,0 +1,15 @@
+from django.contrib.auth.forms import PasswordResetForm
+from django.template import loader
+
+from .outbox import queue_email
+
+
+class OutboxPasswordResetForm(PasswordResetForm):
+    """Password reset that queues the mail instead of sending it in the request."""
+
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = ''.join(loader.render_to_string(subject_template_name, context).splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_body = loader.render_to_string(html_email_template_name, context) if html_email_template_name else ''
+        queue_email(to_email, subject, body, html_body=html_body, from_email=from_email)
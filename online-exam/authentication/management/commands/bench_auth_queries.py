@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+SETUPS = (
+    ('database sessions, user from DB', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    }),
+    ('cached_db sessions, cached user', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'AUTHENTICATION_BACKENDS': ['authentication.backends.UsernameOrEmailBackend'],
+    }),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Count queries per authenticated request with database sessions and DB user loads "
+        "against cached_db sessions and the cached user. Creates and removes its own users."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Requests per page and setup.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        student = User.objects.create_user(
+            username='bench_auth_student', email='bench_auth_student@example.com', password=None, user_type=3
+        )
+        teacher = User.objects.create_user(
+            username='bench_auth_teacher', email='bench_auth_teacher@example.com', password=None, user_type=2
+        )
+        pages = [
+            (student, reverse('student_dashboard')),
+            (student, reverse('questions_list')),
+            (student, reverse('exams_list')),
+            (teacher, reverse('teacher_dashboard')),
+            (teacher, reverse('submissions_list')),
+        ]
+        try:
+            for label, overrides in SETUPS:
+                with override_settings(ALLOWED_HOSTS=['localhost'], **overrides):
+                    self.stdout.write(label)
+                    self._run(pages, options['requests'], overrides['AUTHENTICATION_BACKENDS'][0])
+        finally:
+            student.delete()
+            teacher.delete()
+
+    def _run(self, pages, requests, backend):
+        totals = [0, 0, 0]
+        for user, url in pages:
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(user, backend=backend)
+            client.get(url)  # warm the page's own caches
+            with CaptureQueriesContext(connection) as captured:
+                for _ in range(requests):
+                    assert client.get(url).status_code == 200, url
+            sql = [q['sql'] for q in captured.captured_queries]
+            session = sum('django_session' in s for s in sql)
+            users = sum('"authentication_customuser"' in s and 'JOIN' not in s for s in sql)
+            self.stdout.write(
+                f"  {url:32s} {len(sql) / requests:5.1f} queries/request "
+                f"(session {session / requests:.1f}, user {users / requests:.1f})"
+            )
+            for n, value in enumerate((len(sql), session, users)):
+                totals[n] += value
+        count = requests * len(pages)
+        self.stdout.write(
+            f"  {'all pages':32s} {totals[0] / count:5.1f} queries/request "
+            f"(session {totals[1] / count:.1f}, user {totals[2] / count:.1f})"
+        )
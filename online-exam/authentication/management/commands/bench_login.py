@@ -0,0 +1,84 @@
+import time
+
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+
+from authentication.throttle import LIMITS, login_succeeded
+
+
+def _legacy_login(identifier, password):
+    # The login view before single-lookup authentication: username first,
+    # then a lookup by email and a second authenticate
+    user = authenticate(None, username=identifier, password=password)
+    if not user:
+        u = get_user_model().objects.filter(email=identifier).first()
+        if u:
+            user = authenticate(None, username=u.username, password=password)
+    return user
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure CPU time and queries per failed login: the old username-then-email path, "
+        "the single-lookup backend, and attempts refused by the rate limiter. "
+        "Creates and removes its own user."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=10, help='Failed logins per case.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user = User.objects.create_user(
+            username='bench_login', email='bench_login@example.com', password='right horse battery', user_type=3
+        )
+        attempts = options['attempts']
+        legacy = ['django.contrib.auth.backends.ModelBackend']
+        single = ['authentication.backends.UsernameOrEmailBackend']
+        try:
+            with override_settings(DEBUG=True):
+                for label, identifier in (('username', user.username), ('email', user.email), ('unknown', 'nobody')):
+                    with override_settings(AUTHENTICATION_BACKENDS=legacy):
+                        self._report(f'old path, {label}', attempts, lambda: _legacy_login(identifier, 'wrong'))
+                    with override_settings(AUTHENTICATION_BACKENDS=single):
+                        self._report(
+                            f'single lookup, {label}', attempts,
+                            lambda: authenticate(None, username=identifier, password='wrong'),
+                        )
+                self._throttled(attempts)
+        finally:
+            user.delete()
+
+    def _report(self, label, attempts, attempt):
+        reset_queries()
+        cpu, wall = time.process_time(), time.perf_counter()
+        for _ in range(attempts):
+            assert attempt() is None
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+        self.stdout.write(
+            f"{label:28s} {cpu / attempts * 1000:8.1f} ms CPU  {wall / attempts * 1000:8.1f} ms wall  "
+            f"{len(connection.queries) / attempts:4.1f} queries per attempt"
+        )
+
+    def _throttled(self, attempts):
+        # Through the view: empty the account's bucket, then time refused posts
+        client = Client(HTTP_HOST='localhost')
+        capacity = LIMITS['account'][0]
+        with override_settings(ALLOWED_HOSTS=['localhost']):
+            login_succeeded('bench_login')
+            for _ in range(capacity + 1):
+                if client.post('/auth/login/', {'username': 'bench_login', 'password': 'wrong'}).status_code == 429:
+                    break
+            reset_queries()
+            cpu, wall = time.process_time(), time.perf_counter()
+            for _ in range(attempts):
+                response = client.post('/auth/login/', {'username': 'bench_login', 'password': 'wrong'})
+                assert response.status_code == 429, response.status_code
+            cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+        self.stdout.write(
+            f"{'refused by rate limiter':28s} {cpu / attempts * 1000:8.1f} ms CPU  {wall / attempts * 1000:8.1f} ms wall  "
+            f"{len(connection.queries) / attempts:4.1f} queries per attempt (whole request)"
+        )
+        login_succeeded('bench_login')
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.outbox import BACKENDS, BATCH_SIZE, send_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the outbox in batches, one connection per batch (use --loop to run as a worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when nothing is due.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls in --loop mode.')
+        parser.add_argument('--backend', default=None,
+                            help=f"Mail backend: {', '.join(BACKENDS)} or a dotted path (default: EMAIL_BACKEND).")
+        parser.add_argument('--file-path', default=None, help='Directory for the file backend (default: EMAIL_FILE_PATH).')
+
+    def handle(self, *args, **options):
+        backend_options = {'file_path': options['file_path']} if options['file_path'] else {}
+        total_sent = total_failed = 0
+        while True:
+            started = time.monotonic()
+            while True:
+                sent, failed = send_pending(options['batch_size'], options['backend'], **backend_options)
+                if sent or failed:
+                    self.stdout.write(f"sent {sent}, failed {failed}")
+                total_sent += sent
+                total_failed += failed
+                # A batch with failures usually means the server is struggling; wait for the next poll
+                if not sent or failed:
+                    break
+            if not options['loop']:
+                break
+            time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
+        self.stdout.write(f"Outbox idle; {total_sent} sent, {total_failed} failed attempts.")
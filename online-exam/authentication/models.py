@@ -13,3 +13,32 @@ class CustomUser(AbstractUser):
     
     def __str__(self):
         return f"{self.username} ({self.get_user_type_display()})"
+
+
+class OutboundEmail(models.Model):
+    """A message waiting in the outbox (see ``authentication.outbox``)."""
+    to = models.EmailField()
+    from_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Next try (or the end of a worker's claim on it)
+    send_after = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's "what is due" scan only ever reads unsent rows
+            models.Index(
+                fields=['send_after'],
+                condition=models.Q(sent_at__isnull=True, failed_at__isnull=True),
+                name='outbound_email_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to}"
@@ -0,0 +1,142 @@
+"""
+Outbound email queue.
+
+Requests never talk to the mail server. Verification and password-reset
+mails are written to the ``OutboundEmail`` table (in the request's own
+transaction, so a rolled-back registration sends nothing), and
+``manage.py send_outbox --loop`` delivers them: it claims a batch of due
+rows, opens one connection for the whole batch and hands each message to
+``send_messages`` over it.
+
+Claims: a claimed row's ``send_after`` is pushed ``OUTBOX_LEASE`` seconds
+ahead, so a second worker skips it and a crashed worker's rows come back
+on their own (delivery is at-least-once). On databases with row locks the
+claim uses ``SELECT ... FOR UPDATE SKIP LOCKED``.
+
+Failures are retried with exponential backoff (``OUTBOX_BACKOFF`` doubled
+per attempt, capped at ``OUTBOX_MAX_BACKOFF``). After
+``OUTBOX_MAX_ATTEMPTS`` the row is marked failed and kept with its last
+error. If the connection itself breaks, the rest of the batch backs off
+with it instead of being tried against a dead socket.
+
+The worker uses ``EMAIL_BACKEND`` unless told otherwise. The console and
+file backends make it easy to watch the queue locally without a mail
+server.
+"""
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+BACKOFF = getattr(settings, 'OUTBOX_BACKOFF', 30)
+MAX_BACKOFF = getattr(settings, 'OUTBOX_MAX_BACKOFF', 3600)
+LEASE = getattr(settings, 'OUTBOX_LEASE', 300)
+
+BACKENDS = {
+    'smtp': 'django.core.mail.backends.smtp.EmailBackend',
+    'console': 'django.core.mail.backends.console.EmailBackend',
+    'file': 'django.core.mail.backends.filebased.EmailBackend',
+}
+
+
+def queue_email(to, subject, body, html_body='', from_email=None):
+    """Put a message in the outbox; the worker sends it."""
+    return OutboundEmail.objects.create(
+        to=to,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject,
+        body=body,
+        html_body=html_body or '',
+        send_after=timezone.now(),
+    )
+
+
+def backoff(attempts):
+    return min(MAX_BACKOFF, BACKOFF * 2 ** (attempts - 1))
+
+
+def _claim(batch_size, now):
+    with transaction.atomic():
+        rows = list(
+            OutboundEmail.objects
+            .filter(sent_at__isnull=True, failed_at__isnull=True, send_after__lte=now)
+            .order_by('send_after')
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        if rows:
+            OutboundEmail.objects.filter(id__in=[r.id for r in rows]).update(
+                send_after=now + timedelta(seconds=LEASE), attempts=F('attempts') + 1,
+            )
+    for row in rows:
+        row.attempts += 1
+    return rows
+
+
+def _message(row, connection):
+    message = EmailMultiAlternatives(row.subject, row.body, row.from_email, [row.to], connection=connection)
+    if row.html_body:
+        message.attach_alternative(row.html_body, 'text/html')
+    return message
+
+
+def _connection_broken(exc):
+    # SMTPException derives from OSError; anything else from the socket layer
+    # (or a disconnect) means the remaining messages cannot go out on it
+    return isinstance(exc, smtplib.SMTPServerDisconnected) or (
+        isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+    )
+
+
+def send_pending(batch_size=BATCH_SIZE, backend=None, **backend_options):
+    """Send one batch of due messages; returns ``(sent, failed)``."""
+    now = timezone.now()
+    rows = _claim(batch_size, now)
+    if not rows:
+        return 0, 0
+    connection = get_connection(BACKENDS.get(backend, backend), fail_silently=False, **backend_options)
+    sent, failed = [], []
+    try:
+        connection.open()
+    except Exception as exc:
+        failed = [(row, exc) for row in rows]
+    else:
+        try:
+            for n, row in enumerate(rows):
+                try:
+                    connection.send_messages([_message(row, connection)])
+                except Exception as exc:
+                    if _connection_broken(exc):
+                        failed.extend((r, exc) for r in rows[n:])
+                        break
+                    failed.append((row, exc))
+                else:
+                    sent.append(row.id)
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    done = timezone.now()
+    if sent:
+        OutboundEmail.objects.filter(id__in=sent).update(sent_at=done, last_error='')
+    for row, exc in failed:
+        row.last_error = f'{type(exc).__name__}: {exc}'[:2000]
+        if row.attempts >= MAX_ATTEMPTS:
+            row.failed_at = done
+        else:
+            row.send_after = done + timedelta(seconds=backoff(row.attempts))
+    if failed:
+        OutboundEmail.objects.bulk_update(
+            [row for row, _ in failed], ['last_error', 'failed_at', 'send_after'], batch_size=500,
+        )
+    return len(sent), len(failed)
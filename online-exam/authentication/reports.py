@@ -0,0 +1,174 @@
+"""
+Cached report payloads for ``teacher_reports`` and ``admin_activity``.
+
+The reports aggregate the whole Submission/Question tables but only change
+when something is created, graded or deleted, so each payload is built once
+and kept in the default cache under a versioned key
+(``reports:<name>:v<version>``). Bumping the version makes every old key
+unreachable at once instead of deleting keys one by one.
+
+Coarse events bump it at once: grading, deletes, question changes (see
+``authentication.signals``) and the batch jobs. New answers arrive far too
+often during an exam for that, so they only call ``note_new_submissions``,
+which stamps a pending marker; the first report read at least
+``REPORT_SUBMISSION_DEBOUNCE`` seconds after the stamp bumps the version.
+Attempt counts therefore lag by that much at most, and a live exam causes
+one rebuild per window instead of one per answer.
+
+Stampedes: when a key is missing or past its soft TTL, one request takes a
+short ``cache.add`` lock and rebuilds; the others serve the previous payload
+(the stale copy of this version, else the last payload of any version) and
+only wait for the rebuild when there is nothing at all to show.
+
+Hit, miss and stale-serve counts are kept in the cache so the admin
+activity page can show them for all processes sharing the backend.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Max, Q, Sum
+
+from questions.models import Question, QuestionStats, Submission
+
+
+VERSION_KEY = 'reports:version'
+PENDING_KEY = 'reports:pending_since'
+REPORT_TTL = getattr(settings, 'REPORT_CACHE_TTL', 300)
+DEBOUNCE = getattr(settings, 'REPORT_SUBMISSION_DEBOUNCE', 30)
+LOCK_TIMEOUT = 30
+WAIT_STEP = 0.05
+WAIT_STEPS = 40
+
+COUNTERS = ('hits', 'misses', 'stale')
+# Flagged questions listed in the teacher report
+REVIEW_LIMIT = 20
+
+
+def report_version():
+    values = cache.get_many([VERSION_KEY, PENDING_KEY])
+    pending = values.get(PENDING_KEY)
+    # Only the reader whose delete removed the marker bumps
+    if pending is not None and time.time() - pending >= DEBOUNCE and cache.delete(PENDING_KEY):
+        invalidate_reports()
+        return cache.get(VERSION_KEY)
+    version = values.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+def note_new_submissions():
+    """Debounced invalidation for new answers; the first one since the last bump starts the window."""
+    cache.add(PENDING_KEY, time.time(), None)
+
+
+def invalidate_reports():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def _count(name, counter):
+    key = f'reports:{name}:{counter}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def cache_stats():
+    names = ('admin_activity', 'teacher_reports')
+    keys = [f'reports:{n}:{c}' for n in names for c in COUNTERS]
+    values = cache.get_many(keys)
+    return [
+        {'report': n, **{c: values.get(f'reports:{n}:{c}', 0) for c in COUNTERS}}
+        for n in names
+    ]
+
+
+def cached_report(name, build, ttl=REPORT_TTL):
+    key = f'reports:{name}:v{report_version()}'
+    latest_key = f'reports:{name}:latest'
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None and entry['fresh_until'] > now:
+        _count(name, 'hits')
+        return entry['value']
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = build()
+            # Keep it past the soft TTL so it can be served stale during the next rebuild
+            cache.set(key, {'value': value, 'fresh_until': time.time() + ttl}, ttl * 4)
+            cache.set(latest_key, value, None)
+        finally:
+            cache.delete(lock_key)
+        _count(name, 'misses')
+        return value
+
+    # Someone else is rebuilding: serve what we have
+    stale = entry['value'] if entry is not None else cache.get(latest_key)
+    if stale is not None:
+        _count(name, 'stale')
+        return stale
+    for _ in range(WAIT_STEPS):
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            _count(name, 'hits')
+            return entry['value']
+    _count(name, 'misses')
+    return build()
+
+
+def build_admin_activity():
+    return {
+        'questions_count': Question.objects.count(),
+        'submissions_count': Submission.objects.count(),
+        'created_by_teacher': list(
+            Question.objects.values('author__username').annotate(cnt=Count('id')).order_by('-cnt')
+        ),
+        'submissions_by_student': list(
+            Submission.objects.values('student__username').annotate(
+                cnt=Count('id'), total=Sum('score'), avg=Avg('score')
+            ).order_by('-cnt')
+        ),
+    }
+
+
+def build_teacher_reports():
+    return {
+        'by_student': list(
+            Submission.objects.values('student__username').annotate(
+                attempts=Count('id'), total=Sum('score'), avg=Avg('score')
+            ).order_by('-total')
+        ),
+        'by_question': list(
+            Submission.objects.values('question_id').annotate(
+                attempts=Count('id'), avg=Avg('score')
+            ).order_by('-attempts')
+        ),
+        # From the last `manage.py analyze_items` run
+        'by_subject': list(
+            QuestionStats.objects.values('question__subject_key').annotate(
+                subject=Max('question__subject'), items=Count('question'), responses=Sum('responses'),
+                alpha=Max('subject_alpha'), facility=Avg('facility'), discrimination=Avg('discrimination'),
+            ).order_by('question__subject_key')
+        ),
+        'items_to_review': [
+            {'question_id': stats.question_id, 'text': stats.question.question_text, 'responses': stats.responses,
+             'facility': stats.facility, 'discrimination': stats.discrimination, 'flags': stats.flags}
+            for stats in QuestionStats.objects.select_related('question').filter(
+                responses__gte=QuestionStats.FLAG_MIN_RESPONSES,
+            ).filter(
+                Q(facility__gte=QuestionStats.EASY) | Q(facility__lte=QuestionStats.HARD)
+                | Q(discrimination__lt=QuestionStats.WEAK)
+            ).order_by(F('discrimination').asc(nulls_last=True), 'question_id')[:REVIEW_LIMIT]
+        ],
+        'stats_computed_at': QuestionStats.objects.aggregate(at=Max('computed_at'))['at'],
+    }
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from questions.models import Question, Submission
+from .backends import invalidate_user
+from .models import CustomUser
+from .reports import invalidate_reports, note_new_submissions
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def invalidate_cached_reports(sender, created=False, **kwargs):
+    # A new answer is the frequent case during an exam; its invalidation is debounced
+    if sender is Submission and created:
+        note_new_submissions()
+    else:
+        invalidate_reports()
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Profile edits, role changes, password changes and deletes all come
+    # through here; the next request reloads the user from the database
+    invalidate_user(instance.pk)
@@ -1,3 +1,366 @@
-from django.test import TestCase
+import re
+import time
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from unittest import mock, skipUnless
+
+from online_exam_backend.metrics import registry
+from online_exam_backend import routers
+from online_exam_backend.routers import ReplicaRouter, pin_to_primary, reads_from
+from questions.grading import apply_grades
+from questions.models import Question, StudentScoreSummary, Submission
+from questions.sampling import question_count
+from . import reports, throttle
+from .backends import UsernameOrEmailBackend
+from .models import CustomUser, OutboundEmail
+
+
+# A replica that is a database of its own; a test mirror of the primary
+# cannot show which one a view read from
+HAS_REPLICA = 'replica' in settings.DATABASES and not settings.DATABASES['replica'].get('TEST', {}).get('MIRROR')
+
+
+@skipUnless(HAS_REPLICA, "needs a separate replica database: USE_SQLITE=1 and settings_test")
+class ReplicaRoutingTests(TestCase):
+    """
+    Primary and replica are two separate SQLite files here, so a row written
+    to only one of them shows which database a view read from.
+    """
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = CustomUser.objects.create_user(
+            username='router_teacher', email='router_teacher@example.com', password=None, user_type=2
+        )
+        self.student = CustomUser.objects.create_user(
+            username='router_student', email='router_student@example.com', password=None, user_type=3
+        )
+        # What replication would have copied over
+        for user in (self.teacher, self.student):
+            user.save(using='replica', force_insert=True)
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.teacher)
+
+    def test_leaderboard_reads_replica(self):
+        StudentScoreSummary.objects.using('replica').create(student=self.student, total_score=9, graded_count=1)
+        response = self.client.get(reverse('leaderboard'))
+        self.assertContains(response, 'router_student')
+
+    def test_pinned_user_reads_primary(self):
+        StudentScoreSummary.objects.using('replica').create(student=self.student, total_score=9, graded_count=1)
+        pin_to_primary(self.teacher.pk)
+        response = self.client.get(reverse('leaderboard'))
+        self.assertNotContains(response, 'router_student')
+
+    def test_writing_request_pins_user(self):
+        self.client.get(reverse('questions_list'))
+        self.assertIsNone(cache.get(f'db_pin:{self.teacher.pk}'))
+        self.client.post(reverse('add_question'), {'question_text': 'Pinned?', 'subject': 'Routing'})
+        self.assertTrue(cache.get(f'db_pin:{self.teacher.pk}'))
+
+    def test_streamed_export_reads_replica(self):
+        question = Question.objects.using('replica').create(question_text='Replica only')
+        Submission.objects.using('replica').create(question=question, student=self.student, answer_text='x')
+        response = self.client.get(reverse('export_performance_csv'))
+        self.assertIn(b'router_student', b''.join(response.streaming_content))
+
+    def test_writes_stay_on_primary(self):
+        with reads_from('replica'):
+            question = Question.objects.create(question_text='Written while reading from the replica')
+        self.assertTrue(Question.objects.using('default').filter(pk=question.pk).exists())
+        self.assertFalse(Question.objects.using('replica').filter(pk=question.pk).exists())
+
+
+class ReplicaMigrationTests(TestCase):
+    def test_replica_is_not_migrated(self):
+        with mock.patch.object(routers, 'MIGRATE_REPLICA', False):
+            self.assertIs(ReplicaRouter().allow_migrate('replica', 'questions', 'question'), False)
+            self.assertIsNone(ReplicaRouter().allow_migrate('default', 'questions', 'question'))
+
+    def test_stand_in_replica_is_migrated(self):
+        with mock.patch.object(routers, 'MIGRATE_REPLICA', True):
+            self.assertIs(ReplicaRouter().allow_migrate('replica', 'questions', 'question'), True)
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+        self.student = CustomUser.objects.create_user(
+            username='report_student', email='report_student@example.com', password=None, user_type=3
+        )
+        self.question = Question.objects.create(question_text='Explain', subject='Physics')
+
+    def build(self):
+        self.builds += 1
+        return self.builds
+
+    def report(self):
+        return reports.cached_report('teacher_reports', self.build)
+
+    def test_hits_until_the_version_changes(self):
+        self.assertEqual(self.report(), 1)
+        self.assertEqual(self.report(), 1)
+        reports.invalidate_reports()
+        self.assertEqual(self.report(), 2)
+        stats = {row['report']: row for row in reports.cache_stats()}['teacher_reports']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_grading_invalidates_at_once(self):
+        submission = Submission.objects.create(question=self.question, student=self.student, answer_text='x')
+        with mock.patch.object(reports.time, 'time', return_value=time.time() + reports.DEBOUNCE):
+            self.assertEqual(self.report(), 1)
+        apply_grades({submission.id: (5, '')})
+        self.assertEqual(self.report(), 2)
+
+    def test_new_answers_invalidate_once_per_window(self):
+        self.assertEqual(self.report(), 1)
+        start = time.time()
+        for n in range(5):
+            Submission.objects.create(question=self.question, student=self.student, answer_text=str(n))
+        # Within the window the cached payload is still served
+        self.assertEqual(self.report(), 1)
+        with mock.patch.object(reports.time, 'time', return_value=start + reports.DEBOUNCE + 1):
+            self.assertEqual(self.report(), 2)
+            self.assertEqual(self.report(), 2)
+        self.assertIsNone(cache.get(reports.PENDING_KEY))
+
+    def test_concurrent_rebuild_serves_the_previous_payload(self):
+        self.assertEqual(self.report(), 1)
+        reports.invalidate_reports()
+        # Another request holds the rebuild lock of the new version
+        cache.add(f'reports:teacher_reports:v{reports.report_version()}:lock', 1, reports.LOCK_TIMEOUT)
+        self.assertEqual(self.report(), 1)
+        self.assertEqual(self.builds, 1)
+        stats = {row['report']: row for row in reports.cache_stats()}['teacher_reports']
+        self.assertEqual(stats['stale'], 1)
+
+    def test_waits_for_the_rebuild_when_nothing_is_cached(self):
+        key = f'reports:teacher_reports:v{reports.report_version()}'
+        cache.add(f'{key}:lock', 1, reports.LOCK_TIMEOUT)
+
+        def rebuilt_meanwhile(seconds):
+            cache.set(key, {'value': 'built elsewhere', 'fresh_until': time.time() + 60})
+
+        with mock.patch.object(reports.time, 'sleep', side_effect=rebuilt_meanwhile) as sleep:
+            self.assertEqual(self.report(), 'built elsewhere')
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(self.builds, 0)
+
+
+class RegistrationTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.form = {'username': 'new_student', 'email': 'new_student@example.com',
+                     'password': 'a long passphrase', 'user_type': '3'}
+
+    def test_registration_queues_verification_mail(self):
+        response = self.client.post(reverse('register'), self.form)
+        self.assertTemplateUsed(response, 'authentication/register_done.html')
+        self.assertFalse(CustomUser.objects.get(username='new_student').is_active)
+        self.assertEqual(list(OutboundEmail.objects.values_list('to', flat=True)), ['new_student@example.com'])
+
+    def test_failed_queueing_creates_no_user(self):
+        with mock.patch('authentication.views.queue_email', side_effect=RuntimeError('outbox unavailable')):
+            response = self.client.post(reverse('register'), self.form)
+        self.assertContains(response, 'Registration failed')
+        self.assertFalse(CustomUser.objects.filter(username='new_student').exists())
+
+
+# Password hashing is not under test; keep it cheap
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class LoginThrottleTests(TestCase):
+    KEY = 'login_throttle:test'
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_allows_capacity_then_refuses(self):
+        for _ in range(5):
+            self.assertEqual(throttle.take(self.KEY, 5, 60, now=1000), 0)
+        self.assertEqual(throttle.take(self.KEY, 5, 60, now=1000), 60)
+        # Refused attempts do not push the next token further away
+        self.assertEqual(throttle.take(self.KEY, 5, 60, now=1010), 50)
+        self.assertEqual(throttle.take(self.KEY, 5, 60, now=1010), 50)
+
+    def test_bucket_refills_one_token_per_interval(self):
+        for _ in range(5):
+            throttle.take(self.KEY, 5, 60, now=1000)
+        self.assertEqual(throttle.take(self.KEY, 5, 60, now=1060), 0)
+        self.assertEqual(throttle.take(self.KEY, 5, 60, now=1060), 60)
+        self.assertEqual(throttle.take(self.KEY, 5, 60, now=1180), 0)
+        self.assertEqual(throttle.take(self.KEY, 5, 60, now=1180), 0)
+        self.assertEqual(throttle.take(self.KEY, 5, 60, now=1180), 60)
+
+    def test_idle_bucket_is_full_again(self):
+        for _ in range(5):
+            throttle.take(self.KEY, 5, 60, now=1000)
+        for _ in range(5):
+            self.assertEqual(throttle.take(self.KEY, 5, 60, now=2000), 0)
+        self.assertEqual(throttle.take(self.KEY, 5, 60, now=2000), 60)
+
+    def test_shared_address_is_not_throttled_by_default(self):
+        request = RequestFactory().post('/auth/login/', REMOTE_ADDR='203.0.113.7')
+        for n in range(100):
+            self.assertEqual(throttle.check_login(request, f'student{n}'), 0)
+
+    def test_ip_bucket_when_configured(self):
+        request = RequestFactory().post('/auth/login/', REMOTE_ADDR='203.0.113.7')
+        with mock.patch.dict(throttle.LIMITS, ip=(2, 3)):
+            self.assertEqual(throttle.check_login(request, 'a'), 0)
+            self.assertEqual(throttle.check_login(request, 'b'), 0)
+            self.assertGreater(throttle.check_login(request, 'c'), 0)
+
+    def test_client_ip_behind_proxies(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='198.51.100.9, 203.0.113.7')
+        self.assertEqual(throttle.client_ip(request), '10.0.0.1')
+        with mock.patch.object(throttle, 'PROXIES', 1):
+            # The address the proxy saw, not the one the client claimed
+            self.assertEqual(throttle.client_ip(request), '203.0.113.7')
+
+    def test_account_is_locked_after_failures_and_success_refills(self):
+        CustomUser.objects.create_user(username='locked', email='locked@example.com', password='right', user_type=3)
+        client = Client(HTTP_HOST='localhost')
+        for _ in range(5):
+            response = client.post(reverse('login'), {'username': 'locked', 'password': 'wrong'})
+            self.assertContains(response, 'Invalid credentials')
+        response = client.post(reverse('login'), {'username': 'locked', 'password': 'right'})
+        self.assertContains(response, 'Too many login attempts', status_code=429)
+        throttle.login_succeeded('locked')
+        response = client.post(reverse('login'), {'username': 'locked', 'password': 'right'})
+        self.assertRedirects(response, reverse('student_dashboard'), fetch_redirect_response=False)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class UsernameOrEmailBackendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username='ada', email='ada@example.com', password='right', user_type=3
+        )
+
+    def test_username_or_email(self):
+        self.assertEqual(authenticate(None, username='ada', password='right'), self.user)
+        self.assertEqual(authenticate(None, username='ada@example.com', password='right'), self.user)
+        self.assertIsNone(authenticate(None, username='ada', password='wrong'))
+        self.assertIsNone(authenticate(None, username='nobody', password='right'))
+
+    def test_username_wins_over_email(self):
+        other = CustomUser.objects.create_user(
+            username='ada@example.com', email='other@example.com', password='other', user_type=3
+        )
+        self.assertEqual(authenticate(None, username='ada@example.com', password='other'), other)
+        self.assertIsNone(authenticate(None, username='ada@example.com', password='right'))
+
+    def test_inactive_user_authenticates_but_has_no_session(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(authenticate(None, username='ada', password='right'), self.user)
+        self.assertIsNone(UsernameOrEmailBackend().get_user(self.user.pk))
+
+    def test_cached_user_is_refreshed_after_a_change(self):
+        backend = UsernameOrEmailBackend()
+        self.assertEqual(backend.get_user(self.user.pk).user_type, 3)
+        self.user.user_type = 2
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(backend.get_user(self.user.pk).user_type, 2)
+        with self.assertNumQueries(0):
+            backend.get_user(self.user.pk)
+
+
+class RequestMetricsTests(TestCase):
+    def test_requests_are_recorded_per_url_name(self):
+        registry.reset()
+        client = Client(HTTP_HOST='localhost')
+        client.get(reverse('login'))
+        client.get('/no/such/page/')
+        exposition = registry.render_prometheus()
+        self.assertIn('django_view_duration_seconds_count{view="login"} 1', exposition)
+        self.assertIn('django_view_duration_seconds_count{view="<unresolved>"} 1', exposition)
+
+
+class StudentFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = CustomUser.objects.create_user(
+            username='feed_student', email='feed_student@example.com', password=None, user_type=3
+        )
+        self.questions = [
+            Question.objects.create(question_text=f'Question {n}', subject='Maths', topic=f'Topic {n}')
+            for n in range(30)
+        ]
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.student)
+
+    def test_feed_pages_through_every_question_once(self):
+        first = self.client.get(reverse('student_dashboard')).context['first_page']
+        seen = list(first['ids'])
+        after = first['next']
+        while after:
+            data = self.client.get(reverse('student_feed'), {'after': after, 'per_page': 7}).json()
+            seen += [int(i) for i in re.findall(r'data-question-id="(\d+)"', data['html'])]
+            after = data['next']
+        self.assertEqual(len(first['ids']), 12)
+        self.assertEqual(sorted(seen), sorted(q.id for q in self.questions))
+
+    def test_first_page_is_shared_and_attempts_are_per_student(self):
+        Submission.objects.create(question=self.questions[-1], student=self.student, answer_text='x')
+        response = self.client.get(reverse('student_dashboard'))
+        self.assertEqual(response.context['attempted_ids'], [self.questions[-1].id])
+        other = CustomUser.objects.create_user(
+            username='feed_other', email='feed_other@example.com', password=None, user_type=3
+        )
+        self.client.force_login(other)
+        # The cards come from the cache: only the user and their attempts are read
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('student_dashboard'))
+        self.assertEqual(response.context['attempted_ids'], [])
+
+    def test_new_question_shows_on_the_first_page(self):
+        self.client.get(reverse('student_dashboard'))
+        question = Question.objects.create(question_text='Fresh question', subject='Maths')
+        first = self.client.get(reverse('student_dashboard')).context['first_page']
+        self.assertEqual(first['ids'][0], question.id)
+
+
+class TeacherDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = CustomUser.objects.create_user(
+            username='dash_teacher', email='dash_teacher@example.com', password=None, user_type=2
+        )
+        student = CustomUser.objects.create_user(
+            username='dash_student', email='dash_student@example.com', password=None, user_type=3
+        )
+        question = Question.objects.create(question_text='Explain', subject='Physics', topic='Optics')
+        Submission.objects.create(question=question, student=student, answer_text='Light bends')
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.teacher)
+
+    def test_wsgi_dashboard_polls_instead_of_streaming(self):
+        response = self.client.get(reverse('teacher_dashboard'))
+        self.assertContains(response, 'const LIVE = false')
+        # The stream cannot be served here: answered at once, not held open
+        self.assertEqual(self.client.get(reverse('grading_events')).status_code, 204)
+
+    def test_question_total_follows_the_pool_version(self):
+        self.assertEqual(self.client.get(reverse('teacher_dashboard')).context['total_questions'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(question_count(), 1)
+        Question.objects.create(question_text='Define refraction', subject='Physics')
+        self.assertEqual(self.client.get(reverse('teacher_dashboard')).context['total_questions'], 2)
+
+    def test_grading_status(self):
+        data = self.client.get(reverse('grading_status')).json()
+        self.assertEqual(data['totals'], {'submitted': 1, 'graded': 0, 'pending': 1})
+        rows = [(row['student'], row['topic'], row['score']) for row in data['rows']]
+        self.assertEqual(rows, [('dash_student', 'Optics', None)])
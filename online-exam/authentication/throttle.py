@@ -0,0 +1,92 @@
+"""
+Login rate limiting: token buckets per account and, optionally, per client IP.
+
+Every login attempt takes a token from the bucket of the username or email
+it names, and from its client address's bucket when one is configured. An
+attempt that finds a bucket empty is refused before the account is looked up or any
+password is hashed, so a flood of guesses costs a cache round trip each
+instead of a PBKDF2 hash. Buckets refill at a steady rate
+(``LOGIN_THROTTLE``: capacity, seconds per token), so a user who mistypes a
+few times is never locked out for long, and a successful login refills the
+account's bucket.
+
+The per-IP bucket is off by default (``'ip': None``). A school signs in
+from behind one NAT address, so a whole exam hall would share it and
+empty it in seconds. Enable it only where clients
+have their own addresses, with a capacity above the largest group that
+shares one. Behind reverse proxies ``REMOTE_ADDR`` is the proxy, not the
+client: set ``LOGIN_THROTTLE_PROXIES`` to the number of proxies that append
+to ``X-Forwarded-For``, or every client shares the proxy's bucket.
+
+Buckets live in the default cache and are shared by every process using it.
+Each bucket is a single integer: the time (in ms) at which it would be full
+again (the "theoretical arrival time" form of a token bucket). Taking a
+token is one atomic ``incr``, so concurrent guesses cannot all pass on the
+same reading of the bucket.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# name -> (capacity, seconds to refill one token), or None for no bucket
+LIMITS = getattr(settings, 'LOGIN_THROTTLE', {'ip': None, 'account': (5, 60)})
+# Reverse proxies in front of the app that append to X-Forwarded-For; with
+# none, REMOTE_ADDR is the client
+PROXIES = getattr(settings, 'LOGIN_THROTTLE_PROXIES', 0)
+
+
+def client_ip(request):
+    if PROXIES:
+        forwarded = [a.strip() for a in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if a.strip()]
+        if len(forwarded) >= PROXIES:
+            return forwarded[-PROXIES]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _account_key(identifier):
+    # Usernames may contain characters cache keys should not
+    digest = hashlib.sha256(identifier.strip().lower().encode()).hexdigest()[:32]
+    return f'login_throttle:account:{digest}'
+
+
+def take(key, capacity, interval, now=None):
+    """Take a token from bucket ``key``; 0 if allowed, else seconds until one is available."""
+    now = int((now if now is not None else time.time()) * 1000)
+    step = int(interval * 1000)
+    burst = capacity * step
+    ttl = math.ceil(burst / 1000) + 1
+    try:
+        full_at = cache.incr(key, step)
+    except ValueError:
+        if cache.add(key, now + step, ttl):
+            return 0
+        full_at = cache.incr(key, step)
+    if full_at - step < now:
+        # The bucket had refilled completely; count from now
+        cache.set(key, now + step, ttl)
+        return 0
+    if full_at - now > burst:
+        # Empty: give the token back so refused attempts do not extend the wait
+        cache.decr(key, step)
+        return max(1, math.ceil((full_at - burst - now) / 1000))
+    cache.touch(key, ttl)
+    return 0
+
+
+def check_login(request, identifier):
+    """Seconds the client must wait before this attempt may proceed (0 to go ahead)."""
+    if LIMITS.get('ip'):
+        wait = take(f'login_throttle:ip:{client_ip(request)}', *LIMITS['ip'])
+        if wait:
+            return wait
+    if not identifier or not LIMITS.get('account'):
+        return 0
+    return take(_account_key(identifier), *LIMITS['account'])
+
+
+def login_succeeded(identifier):
+    cache.delete(_account_key(identifier))
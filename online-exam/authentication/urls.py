@@ -1,9 +1,11 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
+from .forms import OutboxPasswordResetForm
 from .views import (
      register_view, login_view, logout_view,
-    student_dashboard, teacher_dashboard, admin_dashboard,
+    student_dashboard, student_feed, teacher_dashboard, admin_dashboard,
     admin_users, admin_create_user, admin_delete_user, admin_activity,
+    metrics,
     teacher_reports,
     dashboard_home,
     verify_email,
@@ -21,6 +23,7 @@ urlpatterns = [
     path('verify-email/<uidb64>/<token>/', verify_email, name='verify_email'),
     path('resend-verification/', resend_verification, name='resend_verification'),
     path('dashboard/student/', student_dashboard, name='student_dashboard'),
+    path('dashboard/student/feed/', student_feed, name='student_feed'),
     path('dashboard/teacher/', teacher_dashboard, name='teacher_dashboard'),
     path('dashboard/', dashboard_home, name='dashboard_home'),
     path('dashboard/admin/', admin_dashboard, name='admin_dashboard'),
@@ -29,6 +32,7 @@ urlpatterns = [
     path('admin/users/create/', admin_create_user, name='admin_create_user'),
     path('admin/users/delete/<int:id>/', admin_delete_user, name='admin_delete_user'),
     path('admin/activity/', admin_activity, name='admin_activity'),
+    path('admin/metrics/', metrics, name='metrics'),
     # Teacher reports
     path('teacher/reports/', teacher_reports, name='teacher_reports'),
 
@@ -36,6 +40,7 @@ urlpatterns = [
     path('password-reset/',
          auth_views.PasswordResetView.as_view(
              template_name='authentication/password_reset_form.html',
+             form_class=OutboxPasswordResetForm,
              email_template_name='authentication/password_reset_email.html',
              subject_template_name='authentication/password_reset_subject.txt',
              success_url='/auth/password-reset/done/'
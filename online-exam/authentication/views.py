@@ -3,14 +3,30 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from .models import CustomUser
-from django.db.models import Count, Sum, Avg
 from questions.models import Question, Submission
+from questions.pagination import paginate_keyset, page_size_from
+from questions.events import can_stream
+from questions.progress import progress_counts
+from questions.sampling import pool_version, question_count
+from .backends import find_user
+from .outbox import queue_email
+from .reports import build_admin_activity, build_teacher_reports, cache_stats, cached_report
+from .throttle import check_login, login_succeeded
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
 from django.urls import reverse
-from django.core.mail import send_mail
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.crypto import constant_time_compare
+from online_exam_backend.metrics import registry
+from online_exam_backend.routers import reads_from_replica
+
+STUDENT_FEED_PAGE_SIZE = getattr(settings, 'STUDENT_FEED_PAGE_SIZE', 12)
+GRADING_POLL_SECONDS = getattr(settings, 'GRADING_POLL_SECONDS', 10)
 
 def _send_verification_email(user, request):
     uid = urlsafe_base64_encode(force_bytes(user.pk))
@@ -27,7 +43,8 @@ def _send_verification_email(user, request):
     )
     from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'no-reply@example.com')
     if user.email:
-        send_mail(subject, message, from_email, [user.email], fail_silently=True)
+        # Delivered by `manage.py send_outbox`, not in this request
+        queue_email(user.email, subject, message, from_email=from_email)
 
 
 def register_view(request):
@@ -56,17 +73,19 @@ def register_view(request):
             return render(request, 'authentication/register.html', {'error': 'Email already registered.'})
         
         try:
-            # Create inactive user until email verified
-            user = CustomUser.objects.create_user(
-                username=username, 
-                email=email,
-                password=password, 
-                user_type=user_type,
-                is_active=False
-            )
-
-            # Send verification email
-            _send_verification_email(user, request)
+            # The user and their verification mail are saved together or not at all
+            with transaction.atomic():
+                # Create inactive user until email verified
+                user = CustomUser.objects.create_user(
+                    username=username, 
+                    email=email,
+                    password=password, 
+                    user_type=user_type,
+                    is_active=False
+                )
+
+                # Send verification email
+                _send_verification_email(user, request)
             return render(request, 'authentication/register_done.html', {'email': email})
             
         except Exception as e:
@@ -79,17 +98,14 @@ def login_view(request):
         identifier = request.POST['username']
         password = request.POST['password']
         role = request.POST.get('role')
-        # Try username first, then email fallback
+        # Refuse floods before looking anything up or hashing the password
+        wait = check_login(request, identifier)
+        if wait:
+            return render(request, 'authentication/login.html', {
+                'error': f'Too many login attempts. Try again in {wait} seconds.'
+            }, status=429)
+        # Username or email, one lookup (authentication.backends)
         user = authenticate(request, username=identifier, password=password)
-        if not user:
-            try:
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                u = User.objects.filter(email=identifier).first()
-                if u:
-                    user = authenticate(request, username=u.username, password=password)
-            except Exception:
-                user = None
         if user:
             # Block login until email verified
             if not user.is_active:
@@ -103,6 +119,7 @@ def login_view(request):
                 return render(request, 'authentication/login.html', { 'error': 'Not a student account.' })
 
             login(request, user)
+            login_succeeded(identifier)
             if user.user_type == 1:
                 return redirect('admin_dashboard')
             elif user.user_type == 2:
@@ -118,18 +135,67 @@ def logout_view(request):
     return redirect('login')
 
 
+def _attempted_ids(user, question_ids):
+    # One query for the whole page instead of one per card
+    return set(
+        Submission.objects.filter(student=user, question_id__in=question_ids)
+        .values_list('question_id', flat=True)
+        .distinct()
+    )
+
+
 @login_required
 def student_dashboard(request):
-    # Show all available questions to students directly on their dashboard
-    questions = Question.objects.all().order_by('-created_at')
-    return render(request, 'dashboards/student_dashboard.html', { 'questions': questions })
+    # The first page of the feed is rendered once and shared by all students
+    # (keyed by the question pool version, which every Question change bumps);
+    # per-student "attempted" flags are applied on top of it in the page.
+    key = f'student_feed:first_page:v{pool_version()}'
+    first_page = cache.get(key)
+    if first_page is None:
+        page = paginate_keyset(Question.objects.all(), page_size=STUDENT_FEED_PAGE_SIZE)
+        first_page = {
+            'html': render_to_string('dashboards/_question_cards.html', {'questions': page}),
+            'ids': [q.id for q in page],
+            'next': page.next_cursor,
+        }
+        cache.set(key, first_page, 300)
+    return render(request, 'dashboards/student_dashboard.html', {
+        'first_page': first_page,
+        'attempted_ids': sorted(_attempted_ids(request.user, first_page['ids'])),
+    })
+
+
+@login_required
+def student_feed(request):
+    # JSON fragment for infinite scroll: rendered cards plus the next cursor
+    page = paginate_keyset(
+        Question.objects.all(),
+        after=request.GET.get('after'),
+        page_size=page_size_from(request.GET.get('per_page'), default=STUDENT_FEED_PAGE_SIZE),
+    )
+    html = render_to_string('dashboards/_question_cards.html', {
+        'questions': page,
+        'attempted_ids': _attempted_ids(request.user, [q.id for q in page]),
+    }, request=request)
+    return JsonResponse({'html': html, 'next': page.next_cursor})
 
 
 @login_required
 def teacher_dashboard(request):
-    # Show latest submissions snapshot to teachers
+    # Latest submissions snapshot; the page then follows grading_events
+    # instead of being refreshed. Totals come from the progress counters and
+    # a question count cached per pool version rather than fresh COUNT queries.
     latest_submissions = Submission.objects.select_related('student', 'question').order_by('-submitted_at')[:10]
-    return render(request, 'dashboards/teacher_dashboard.html', { 'latest_submissions': latest_submissions })
+    counts = progress_counts()
+    return render(request, 'dashboards/teacher_dashboard.html', {
+        'latest_submissions': latest_submissions,
+        'total_questions': question_count(),
+        'pending_reviews': counts['pending'],
+        'total_submissions': counts['submitted'],
+        # Under WSGI the page polls grading_status instead (questions.events)
+        'live_stream': can_stream(request),
+        'poll_seconds': GRADING_POLL_SECONDS,
+    })
 
 
 @login_required
@@ -178,39 +244,35 @@ def admin_delete_user(request, id):
     return redirect('admin_users')
 
 
+@reads_from_replica
 @login_required
 def admin_activity(request):
     if request.user.user_type != 1:
         return redirect('home')
-    questions_count = Question.objects.count()
-    submissions_count = Submission.objects.count()
-    created_by_teacher = Question.objects.values('author__username').annotate(cnt=Count('id')).order_by('-cnt')
-    submissions_by_student = Submission.objects.values('student__username').annotate(
-        cnt=Count('id'), total=Sum('score'), avg=Avg('score')
-    ).order_by('-cnt')
-    return render(request, 'authentication/admin_activity.html', {
-        'questions_count': questions_count,
-        'submissions_count': submissions_count,
-        'created_by_teacher': created_by_teacher,
-        'submissions_by_student': submissions_by_student,
-    })
+    context = dict(cached_report('admin_activity', build_admin_activity))
+    context['cache_stats'] = cache_stats()
+    return render(request, 'authentication/admin_activity.html', context)
+
+
+def metrics(request):
+    # Prometheus text exposition of the in-process request metrics; open to
+    # admins, or to scrapers presenting METRICS_TOKEN as a bearer token.
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    bearer = request.headers.get('Authorization', '')
+    authorized = bool(token) and constant_time_compare(bearer, f'Bearer {token}')
+    if not authorized and not (request.user.is_authenticated and request.user.user_type == 1):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4')
 
 
 # Teacher performance report
+@reads_from_replica
 @login_required
 def teacher_reports(request):
     if request.user.user_type != 2:
         return redirect('home')
-    by_student = Submission.objects.values('student__username').annotate(
-        attempts=Count('id'), total=Sum('score'), avg=Avg('score')
-    ).order_by('-total')
-    by_question = Submission.objects.values('question_id').annotate(
-        attempts=Count('id'), avg=Avg('score')
-    ).order_by('-attempts')
-    return render(request, 'authentication/teacher_reports.html', {
-        'by_student': by_student,
-        'by_question': by_question,
-    })
+    return render(request, 'authentication/teacher_reports.html',
+                  cached_report('teacher_reports', build_teacher_reports))
 def dashboard_home(request):
     # logic to redirect based on user type
     if request.user.is_authenticated:
@@ -245,9 +307,7 @@ def resend_verification(request):
         user = None
         if identifier:
             try:
-                user = CustomUser.objects.filter(username=identifier).first()
-                if not user:
-                    user = CustomUser.objects.filter(email=identifier).first()
+                user = find_user(identifier)
             except Exception:
                 user = None
         if user and not user.is_active:
@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'online_exam_backend.settings')
+# Read by settings: no persistent database connections under ASGI
+os.environ.setdefault('DJANGO_ASGI', '1')
 
 application = get_asgi_application()
+
+# Collected static files are served here, compressed and cached for a year,
+# without going through Django
+from online_exam_backend.staticfiles import AsyncStaticFiles  # noqa: E402
+
+application = AsyncStaticFiles(application)
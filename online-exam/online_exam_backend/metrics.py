@@ -0,0 +1,223 @@
+"""
+In-process request metrics.
+
+``RequestMetricsMiddleware`` (see ``middleware.py``) times each request and
+records, per view name, four histograms: wall time, DB query count, DB time
+and template render time. Each histogram keeps cumulative bucket counts (the
+Prometheus convention; use ``rate()`` for windows) and a ring of time slices
+covering the last ``METRICS_WINDOW_SECONDS``, from which the exposition also
+reports rolling p50/p95/p99 gauges.
+
+Template time comes from ``TimedDjangoTemplates``, a drop-in subclass of the
+stock Django template backend that adds each top-level render to the
+current request's stats.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+
+WINDOW_SECONDS = getattr(settings, 'METRICS_WINDOW_SECONDS', 300)
+WINDOW_SLICES = 10
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'template_time', 'statements', 'keep_statements')
+
+    def __init__(self, keep_statements=0):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statements = []
+        self.keep_statements = keep_statements
+
+
+current_stats = ContextVar('request_stats', default=None)
+
+
+class RollingHistogram:
+    def __init__(self, buckets, window=WINDOW_SECONDS, slices=WINDOW_SLICES):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._slice_seconds = window / slices
+        self._slices = [[0, [0] * (len(buckets) + 1)] for _ in range(slices)]
+
+    def _index(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                return i
+        return len(self.buckets)
+
+    def _slice(self, now):
+        epoch = int(now // self._slice_seconds)
+        entry = self._slices[epoch % len(self._slices)]
+        if entry[0] != epoch:
+            entry[0] = epoch
+            entry[1] = [0] * len(entry[1])
+        return entry[1]
+
+    def observe(self, value, now=None):
+        index = self._index(value)
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        self._slice(time.time() if now is None else now)[index] += 1
+
+    def window_counts(self, now=None):
+        now = time.time() if now is None else now
+        oldest = int(now // self._slice_seconds) - len(self._slices) + 1
+        totals = [0] * (len(self.buckets) + 1)
+        for epoch, counts in self._slices:
+            if epoch >= oldest:
+                totals = [a + b for a, b in zip(totals, counts)]
+        return totals
+
+    def quantile(self, q, now=None):
+        """Upper bucket bound holding the ``q`` quantile of the rolling window."""
+        counts = self.window_counts(now)
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+# metric name -> (help text, bucket bounds)
+METRICS = {
+    'django_view_duration_seconds': ('Wall time per request', SECONDS_BUCKETS),
+    'django_view_db_queries': ('Database queries per request', QUERY_BUCKETS),
+    'django_view_db_seconds': ('Database time per request', SECONDS_BUCKETS),
+    'django_view_template_seconds': ('Template render time per request', SECONDS_BUCKETS),
+}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, duration, stats):
+        values = {
+            'django_view_duration_seconds': duration,
+            'django_view_db_queries': stats.queries,
+            'django_view_db_seconds': stats.db_time,
+            'django_view_template_seconds': stats.template_time,
+        }
+        now = time.time()
+        with self._lock:
+            histograms = self._views.get(view)
+            if histograms is None:
+                histograms = {name: RollingHistogram(buckets) for name, (_, buckets) in METRICS.items()}
+                self._views[view] = histograms
+            for name, value in values.items():
+                histograms[name].observe(value, now)
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def render_prometheus(self):
+        lines = []
+        now = time.time()
+        with self._lock:
+            views = sorted(self._views.items())
+            for name, (help_text, _) in METRICS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histograms in views:
+                    h = histograms[name]
+                    label = _escape(view)
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{view="{label}",le="+Inf"}} {h.count}')
+                    lines.append(f'{name}_sum{{view="{label}"}} {h.sum}')
+                    lines.append(f'{name}_count{{view="{label}"}} {h.count}')
+                lines.append(f'# HELP {name}_window Rolling {WINDOW_SECONDS}s quantiles (bucket upper bounds)')
+                lines.append(f'# TYPE {name}_window gauge')
+                for view, histograms in views:
+                    label = _escape(view)
+                    for q in QUANTILES:
+                        value = histograms[name].quantile(q, now)
+                        if value is not None:
+                            lines.append(f'{name}_window{{view="{label}",quantile="{q}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class QueryTimer:
+    """
+    ``connection.execute_wrapper`` hook adding each query to the current
+    request's stats. It is installed on every connection as it opens
+    (``install_query_timer``) and finds the request through ``current_stats``,
+    which follows the request into ``sync_to_async`` threads under ASGI,
+    where the connections are not the ones the middleware would see.
+    """
+
+    def __call__(self, execute, sql, params, many, context):
+        stats = current_stats.get()
+        if stats is None:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+            if len(stats.statements) < stats.keep_statements:
+                stats.statements.append(sql)
+
+
+query_timer = QueryTimer()
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """``connection_created`` receiver."""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = current_stats.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -1,5 +1,21 @@
+import logging
+import time
+from collections import Counter
 from urllib.parse import urlunsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
 from django.http import HttpResponseRedirect
+from django.middleware.gzip import GZipMiddleware
+
+from .metrics import RequestStats, current_stats, install_query_timer, registry
+from .routers import _writes, apin_to_primary, pin_to_primary, replica_configured
+
+
+logger = logging.getLogger('online_exam.metrics')
 
 
 class LocalhostRedirectMiddleware:
@@ -37,3 +53,140 @@ class LocalhostRedirectMiddleware:
             return HttpResponseRedirect(redirect_url)
 
         return self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record per-view wall time, DB query count, DB time and template render
+    time into the in-process metrics registry (served at /auth/admin/metrics/).
+
+    Query budget: when a view runs more queries than ``QUERY_BUDGET`` (or its
+    entry in ``QUERY_BUDGETS``, keyed by view name), log a warning listing the
+    most repeated statements, which is usually where an N+1 is hiding.
+    Set a budget to 0 to disable the check.
+
+    Place it first in MIDDLEWARE so the wall time covers the whole stack.
+    It works in both the WSGI and the ASGI stack; for streaming responses the
+    wall time ends when the response starts.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.default_budget = getattr(settings, 'QUERY_BUDGET', 50)
+        self.budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        # Keep a few statements past the largest budget for the warning
+        self.keep = max([self.default_budget, *self.budgets.values()]) + 20
+        connection_created.connect(install_query_timer)
+        for conn in connections.all(initialized_only=True):
+            install_query_timer(None, conn)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats(self.keep)
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self._observe(request, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats(self.keep)
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self._observe(request, time.perf_counter() - started, stats)
+        return response
+
+    def _observe(self, request, duration, stats):
+        match = getattr(request, 'resolver_match', None)
+        # The URL name, or the view's dotted path for unnamed patterns
+        view = match.view_name if match else '<unresolved>'
+        registry.observe(view, duration, stats)
+        self._check_budget(view, stats)
+
+    def _check_budget(self, view, stats):
+        budget = self.budgets.get(view, self.default_budget)
+        if not budget or stats.queries <= budget:
+            return
+        repeated = Counter(stats.statements).most_common(5)
+        logger.warning(
+            "Query budget exceeded for %s: %d queries (budget %d), %.1f ms in DB. Most repeated:\n%s",
+            view, stats.queries, budget, stats.db_time * 1000,
+            "\n".join(f"  {count}x {sql}" for sql, count in repeated),
+        )
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin users who just wrote to the primary, so the reporting views they
+    open next (``routers.reads_from_replica``) show their own changes
+    instead of a replica that has not caught up yet.
+
+    Goes after AuthenticationMiddleware. Without a replica configured it
+    removes itself from the stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        writes = []
+        token = _writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _writes.reset(token)
+        if writes and request.user.is_authenticated:
+            pin_to_primary(request.user.pk)
+        return response
+
+    async def __acall__(self, request):
+        # Sync code run from here gets a copy of the context, but the same list
+        writes = []
+        token = _writes.set(writes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _writes.reset(token)
+        if writes:
+            user = await request.auser()
+            if user.is_authenticated:
+                await apin_to_primary(user.pk)
+        return response
+
+
+class PageGZipMiddleware(GZipMiddleware):
+    """
+    Gzip rendered pages and JSON for clients that accept it (HTML shrinks
+    to about a fifth). Streaming responses are left alone: the grading and
+    exam event streams must reach the browser one event at a time, which a
+    gzip stream would hold back, and the CSV export has its own ``.csv.gz``
+    URL. Static files are compressed ahead of time (see
+    ``online_exam_backend.staticfiles``).
+    """
+
+    def process_response(self, request, response):
+        if response.streaming:
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,130 @@
+"""
+Read replica routing for the reporting views.
+
+The leaderboard, the teacher and admin reports and the CSV export only
+read, but they scan whole tables; on the primary they compete with the
+writes of an exam in progress. When a ``replica`` database is configured,
+views decorated with ``reads_from_replica`` send their reads there. Every
+other read, and every write anywhere, stays on ``default``.
+
+Read-your-writes: replicas lag a little. A user who just wrote something
+(graded an answer, submitted one) and then opens a report expects to see
+it. ``ReplicaPinMiddleware`` notes which requests wrote to the database
+and pins their user to the primary for ``REPLICA_PIN_SECONDS``; reporting
+views of a pinned user read from ``default``.
+
+The session and the signed-in user are resolved before the view switches
+to the replica, and sessions are never routed there, so a login that has
+not replicated yet cannot look like a logout.
+
+Migrations run on ``default`` only: a real replica gets its schema from
+the primary by replication and refuses writes. A stand-in that nothing
+replicates to (the SQLite copy used locally and in tests) sets
+``REPLICA_MIGRATE`` so it is migrated like the primary.
+
+Cached reports (``authentication.reports``) may be rebuilt from a replica
+a moment behind the write that invalidated them. They are cached for a
+few minutes anyway, so this adds a lag of seconds to one that is already
+minutes.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+REPLICA = getattr(settings, 'REPLICA_DATABASE', 'replica')
+PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+MIGRATE_REPLICA = getattr(settings, 'REPLICA_MIGRATE', False)
+
+# Alias reads are sent to inside a reporting view (None: default routing)
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+# Per-request list the router appends to when something is written
+_writes = contextvars.ContextVar('request_writes', default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f'db_pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    cache.set(_pin_key(user_id), True, PIN_SECONDS)
+
+
+async def apin_to_primary(user_id):
+    await cache.aset(_pin_key(user_id), True, PIN_SECONDS)
+
+
+def replica_for(request):
+    """The alias reporting reads for ``request`` should use, or ``None`` for the primary."""
+    if not replica_configured():
+        return None
+    user = request.user
+    if user.is_authenticated and cache.get(_pin_key(user.pk)):
+        return None
+    return REPLICA
+
+
+@contextmanager
+def reads_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def _iterate_reading_from(alias, chunks):
+    # Streaming responses run their queries after the view has returned
+    chunks = iter(chunks)
+    while True:
+        with reads_from(alias):
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+        yield chunk
+
+
+def reads_from_replica(view):
+    """Send the reads of ``view`` (and of its streamed body) to the replica, unless pinned."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = replica_for(request)
+        if alias is None:
+            return view(request, *args, **kwargs)
+        with reads_from(alias):
+            response = view(request, *args, **kwargs)
+        if response.streaming:
+            response.streaming_content = _iterate_reading_from(alias, response.streaming_content)
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is not None and model._meta.app_label != 'sessions':
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None and not writes:
+            writes.append(model._meta.label)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA:
+            return MIGRATE_REPLICA
+        return None
@@ -43,11 +43,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'online_exam_backend.middleware.RequestMetricsMiddleware',
+    'online_exam_backend.middleware.PageGZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'online_exam_backend.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,7 +59,8 @@ ROOT_URLCONF = 'online_exam_backend.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Stock DjangoTemplates plus render timing for RequestMetricsMiddleware
+        'BACKEND': 'online_exam_backend.metrics.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,6 +81,16 @@ WSGI_APPLICATION = 'online_exam_backend.wsgi.application'
 
 USE_SQLITE = os.environ.get('USE_SQLITE', '0') == '1'
 
+# Under WSGI, connections are kept open between requests (DB_CONN_MAX_AGE
+# seconds) and checked before reuse, so a restarted database costs one failed
+# ping rather than a failed request. Under ASGI (asgi.py sets DJANGO_ASGI)
+# each request runs its queries in its own thread, so persistent connections
+# pile up; there the default is 0. DB_POOL=1 switches PostgreSQL to psycopg's
+# connection pool instead (psycopg[pool]), which suits either.
+SERVING_ASGI = os.environ.get('DJANGO_ASGI', '0') == '1'
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '0' if SERVING_ASGI else '60'))
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+
 if USE_SQLITE:
     DATABASES = {
         'default': {
@@ -84,6 +98,15 @@ if USE_SQLITE:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    # A second file standing in for a read replica (it is not replicated, so
+    # it is migrated like the primary). Set SQLITE_REPLICA_PATH to route a
+    # local server's reports to a copy; settings_test always adds one.
+    if os.environ.get('SQLITE_REPLICA_PATH'):
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['SQLITE_REPLICA_PATH'],
+        }
+        REPLICA_MIGRATE = True
 else:
     DATABASES = {
         'default': {
@@ -95,6 +118,84 @@ else:
             'PORT': '5432',
         }
     }
+    if DB_POOL:
+        DATABASES['default']['OPTIONS'] = {'pool': True}
+    # A streaming replica of the primary; reporting views read from it
+    # (online_exam_backend.routers). Tests use the primary in its place.
+    if os.environ.get('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.environ['DB_REPLICA_HOST'],
+            'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+
+for _db in DATABASES.values():
+    # The pool manages connection lifetime itself
+    _db['CONN_MAX_AGE'] = 0 if DB_POOL and not USE_SQLITE else DB_CONN_MAX_AGE
+    _db['CONN_HEALTH_CHECKS'] = True
+
+DATABASE_ROUTERS = ['online_exam_backend.routers.ReplicaRouter']
+# Seconds a user who wrote something reads reports from the primary
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND picks locmem (default, per process), file or redis; use a
+# shared backend in production so invalidations reach every worker.
+
+_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'online-exam'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', _CACHE_BACKENDS[CACHE_BACKEND][1]),
+    }
+}
+
+# Seconds a cached report payload counts as fresh (authentication.reports)
+REPORT_CACHE_TTL = 300
+# New answers invalidate the cached reports at most once per this many seconds
+REPORT_SUBMISSION_DEBOUNCE = 30
+
+
+# Submission ingestion: 'direct' writes each answer as it arrives; 'spool'
+# appends answers to a local write-behind queue that
+# `manage.py flush_submission_spool --loop` moves into the database in batches.
+SUBMISSION_INGEST_MODE = os.environ.get('SUBMISSION_INGEST_MODE', 'direct')
+SUBMISSION_SPOOL_PATH = os.environ.get('SUBMISSION_SPOOL_PATH', str(BASE_DIR / 'submission_spool.sqlite3'))
+
+# Exam autosave: drafts go to the cache and a local spool that
+# `manage.py flush_exam_drafts --loop` writes to the database every
+# EXAM_DRAFT_FLUSH_INTERVAL seconds, keeping only the latest draft per answer.
+EXAM_DRAFT_SPOOL_PATH = os.environ.get('EXAM_DRAFT_SPOOL_PATH', str(BASE_DIR / 'draft_spool.sqlite3'))
+EXAM_DRAFT_FLUSH_INTERVAL = 10
+
+# Adaptive tests (questions.adaptive): at most CAT_MAX_ITEMS questions, ending
+# early once the ability estimate's standard error is below CAT_TARGET_SE.
+# Item parameters come from `manage.py calibrate_items` (questions.irt);
+# CAT_IRT_MODEL = '2pl' drops the guessing parameter.
+CAT_IRT_MODEL = '3pl'
+CAT_MAX_ITEMS = 20
+CAT_TARGET_SE = 0.3
+
+
+# Outgoing mail is queued in the OutboundEmail table and delivered by
+# `manage.py send_outbox --loop` (authentication.outbox), one connection per
+# batch. Failed sends retry after OUTBOX_BACKOFF seconds, doubling up to
+# OUTBOX_MAX_BACKOFF, until OUTBOX_MAX_ATTEMPTS. Set EMAIL_BACKEND to the
+# console or file backend to watch the queue without a mail server.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', str(BASE_DIR / 'sent_emails'))
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF = 30
+OUTBOX_MAX_BACKOFF = 3600
 
 
 # Password validation
@@ -135,6 +236,17 @@ STATIC_URL = 'static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# `manage.py collectstatic` writes content-hashed copies of every asset and
+# their gzip/brotli versions here; wsgi.py and asgi.py serve them with
+# far-future immutable caching (online_exam_backend.staticfiles)
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'online_exam_backend.staticfiles.CompressedManifestStorage'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -142,8 +254,36 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'authentication.CustomUser'
 
+# Username or email in one lookup, one password hash per attempt; the
+# signed-in user is then resolved from the cache (USER_CACHE_TTL seconds,
+# invalidated on every save or delete of the user)
+AUTHENTICATION_BACKENDS = ['authentication.backends.UsernameOrEmailBackend']
+USER_CACHE_TTL = 3600
+
+# Sessions are read from the cache and written through to the database, so
+# a warm request touches neither the session nor the user table
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Login attempts allowed per account and per client IP (authentication.throttle):
+# (bucket capacity, seconds to refill one attempt), or None for no bucket. The
+# IP bucket is off: a classroom behind one NAT address would share it.
+LOGIN_THROTTLE = {'ip': None, 'account': (5, 60)}
+# Number of reverse proxies in front of the app that append to X-Forwarded-For.
+# 0 (the default) takes REMOTE_ADDR as the client; behind a proxy that is the
+# proxy's address, so every client would share one IP bucket.
+LOGIN_THROTTLE_PROXIES = int(os.environ.get('LOGIN_THROTTLE_PROXIES', '0'))
+
 # Authentication redirects
 # Ensure login-required views redirect to your login URL instead of the default '/accounts/login/'
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = '/auth/dashboard/student/'
 
+# Request metrics (online_exam_backend.middleware.RequestMetricsMiddleware).
+# Views running more queries than their budget log a warning with the most
+# repeated SQL; QUERY_BUDGETS overrides the default per view name.
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', '50'))
+QUERY_BUDGETS = {}
+METRICS_WINDOW_SECONDS = 300
+# Lets a Prometheus scraper read /auth/admin/metrics/ with
+# "Authorization: Bearer <token>" instead of an admin session.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
@@ -0,0 +1,33 @@
+"""
+Settings for the test suite:
+
+    USE_SQLITE=1 python manage.py test --settings=online_exam_backend.settings_test
+
+With SQLite the primary and a stand-in replica are two files in the temp
+directory, so they really are two databases and the replica routing tests
+run. With PostgreSQL the replica, if configured, mirrors the primary.
+"""
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, DB_CONN_MAX_AGE, STORAGES, USE_SQLITE
+
+
+# Copies, so importing this module never changes the settings it extends
+DATABASES = {alias: dict(db) for alias, db in DATABASES.items()}
+STORAGES = dict(STORAGES)
+
+if USE_SQLITE:
+    DATABASES['default']['TEST'] = {'NAME': os.path.join(tempfile.gettempdir(), 'online_exam_test_primary.sqlite3')}
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_REPLICA_PATH', str(BASE_DIR / 'replica.sqlite3')),  # noqa: F405
+        'TEST': {'NAME': os.path.join(tempfile.gettempdir(), 'online_exam_test_replica.sqlite3')},
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    }
+    REPLICA_MIGRATE = True
+
+# Hashed names need collectstatic to have run; tests render plain ones
+STORAGES['staticfiles'] = {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
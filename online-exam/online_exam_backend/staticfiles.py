@@ -0,0 +1,239 @@
+"""
+Static assets: fingerprinted, pre-compressed, cached for a year.
+
+``manage.py collectstatic`` copies ``static/`` into ``STATIC_ROOT`` through
+``CompressedManifestStorage``:
+
+* every file also gets a copy whose name carries a hash of its content
+  (``css/base.3f9a1c2b7d4e.css``), recorded in ``staticfiles.json``.
+  ``{% static %}`` renders the hashed name, so an edited file gets a new
+  URL and a cached copy can never be stale;
+* text assets are compressed once, at build time, to ``.gz`` (gzip level 9)
+  and, when the ``brotli`` package is installed, ``.br`` (quality 11). A
+  copy is only kept when it is meaningfully smaller.
+
+``StaticFiles`` (WSGI) and ``AsyncStaticFiles`` (ASGI) wrap the Django
+application in ``wsgi.py`` and ``asgi.py`` and serve ``STATIC_URL`` from
+``STATIC_ROOT`` without entering Django. They index the directory once at
+startup, so a request is one dict lookup, then a file read. They send the
+brotli or gzip copy when the client accepts it. Hashed names are sent with
+``Cache-Control: public, max-age=<STATIC_MAX_AGE>, immutable``: the browser
+never asks for them again. Unhashed names are only cached for
+``STATIC_UNHASHED_MAX_AGE`` seconds. ETags answer revalidations with 304.
+
+The index is built when the process starts, so run ``collectstatic`` before
+restarting the app servers. With ``DEBUG`` off, pages need it to have run:
+a name missing from the manifest is hashed from its collected copy
+(``manifest_strict = False``), and one with no collected copy fails the
+page. With ``DEBUG`` on, names are rendered plain and ``runserver`` serves
+them from ``static/`` as usual.
+"""
+import asyncio
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+MAX_AGE = getattr(settings, 'STATIC_MAX_AGE', 365 * 24 * 3600)
+UNHASHED_MAX_AGE = getattr(settings, 'STATIC_UNHASHED_MAX_AGE', 300)
+COMPRESSIBLE = ('.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.xml', '.html', '.ico', '.ttf', '.otf')
+# Smaller files are not worth a second request-time decision
+MIN_COMPRESS_SIZE = 256
+# A compressed copy must save at least this fraction to be kept
+MIN_SAVING = 0.05
+BLOCK_SIZE = 64 * 1024
+
+# Preference order when the client accepts several
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    # Names missing from the manifest are hashed from the collected file
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            if name.endswith(COMPRESSIBLE) and self.exists(name):
+                self._compress(name)
+
+    def _compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                self._save(name + suffix, ContentFile(compressed))
+
+
+def _accepted(header):
+    """Content codings with a non-zero q in an ``Accept-Encoding`` header."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFile:
+    def __init__(self, path, content_type, cache_control, variants):
+        self.path = path
+        self.content_type = content_type
+        self.cache_control = cache_control
+        # Content coding -> (path, size, etag); '' is the file itself
+        self.variants = variants
+
+    def select(self, accept_encoding):
+        if len(self.variants) > 1 and accept_encoding:
+            accepted = _accepted(accept_encoding)
+            for coding, _ in ENCODINGS:
+                if coding in self.variants and (coding in accepted or '*' in accepted):
+                    return coding
+        return ''
+
+    def response(self, method, accept_encoding='', if_none_match=''):
+        """``(status, headers, path or None)`` for a request with these headers."""
+        if method not in ('GET', 'HEAD'):
+            return '405 Method Not Allowed', [('Allow', 'GET, HEAD'), ('Content-Length', '0')], None
+        coding = self.select(accept_encoding)
+        path, size, etag = self.variants[coding]
+        headers = [('Cache-Control', self.cache_control), ('ETag', etag)]
+        if len(self.variants) > 1:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if if_none_match and (if_none_match.strip() == '*' or etag in if_none_match):
+            return '304 Not Modified', headers, None
+        headers += [('Content-Type', self.content_type), ('Content-Length', str(size))]
+        if coding:
+            headers.append(('Content-Encoding', coding))
+        return '200 OK', headers, path if method == 'GET' else None
+
+
+def _etag(stat, suffix):
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}{suffix}"'
+
+
+def build_index(root=None, prefix=None):
+    """Map URL path to ``StaticFile`` for everything collected into ``root``."""
+    root = root or settings.STATIC_ROOT
+    prefix = '/' + (prefix or settings.STATIC_URL).strip('/') + '/'
+    if not root or not os.path.isdir(root):
+        return {}
+    storage = CompressedManifestStorage(location=root)
+    hashed = set(storage.hashed_files.values())
+    index = {}
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if name == storage.manifest_name or name.endswith(tuple(s for _, s in ENCODINGS)):
+                continue
+            stat = os.stat(path)
+            variants = {'': (path, stat.st_size, _etag(stat, ''))}
+            for coding, suffix in ENCODINGS:
+                if os.path.exists(path + suffix):
+                    compressed = os.stat(path + suffix)
+                    variants[coding] = (path + suffix, compressed.st_size, _etag(compressed, suffix))
+            content_type, _ = mimetypes.guess_type(name)
+            content_type = content_type or 'application/octet-stream'
+            if content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml'):
+                content_type += '; charset=utf-8'
+            if name in hashed:
+                cache_control = f'public, max-age={MAX_AGE}, immutable'
+            else:
+                cache_control = f'public, max-age={UNHASHED_MAX_AGE}'
+            index[posixpath.join(prefix, name)] = StaticFile(path, content_type, cache_control, variants)
+    return index
+
+
+def _read_blocks(path):
+    with open(path, 'rb') as f:
+        while block := f.read(BLOCK_SIZE):
+            yield block
+
+
+class StaticFiles:
+    """WSGI wrapper serving collected static files; everything else goes to ``app``."""
+
+    def __init__(self, app, root=None, prefix=None):
+        self.app = app
+        self.index = build_index(root, prefix)
+
+    def __call__(self, environ, start_response):
+        entry = self.index.get(environ.get('PATH_INFO', ''))
+        if entry is None:
+            return self.app(environ, start_response)
+        status, headers, path = entry.response(
+            environ.get('REQUEST_METHOD', 'GET'),
+            environ.get('HTTP_ACCEPT_ENCODING', ''),
+            environ.get('HTTP_IF_NONE_MATCH', ''),
+        )
+        start_response(status, headers)
+        if path is None:
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(open(path, 'rb'), BLOCK_SIZE)
+        return _read_blocks(path)
+
+
+class AsyncStaticFiles:
+    """ASGI counterpart of ``StaticFiles``."""
+
+    def __init__(self, app, root=None, prefix=None):
+        self.app = app
+        self.index = build_index(root, prefix)
+
+    async def __call__(self, scope, receive, send):
+        entry = self.index.get(scope['path']) if scope['type'] == 'http' else None
+        if entry is None:
+            return await self.app(scope, receive, send)
+        request_headers = dict(scope.get('headers') or ())
+        status, headers, path = entry.response(
+            scope['method'],
+            request_headers.get(b'accept-encoding', b'').decode('latin-1'),
+            request_headers.get(b'if-none-match', b'').decode('latin-1'),
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split()[0]),
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+        })
+        if path is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        f = await asyncio.to_thread(open, path, 'rb')
+        try:
+            while True:
+                block = await asyncio.to_thread(f.read, BLOCK_SIZE)
+                more = len(block) == BLOCK_SIZE
+                await send({'type': 'http.response.body', 'body': block, 'more_body': more})
+                if not more:
+                    break
+        finally:
+            f.close()
@@ -0,0 +1,137 @@
+import gzip
+import json
+import os
+import tempfile
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from .staticfiles import AsyncStaticFiles, CompressedManifestStorage, StaticFiles, brotli
+
+
+class StaticFilesTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.root = directory.name
+        storages = {**settings.STORAGES, 'staticfiles': {
+            'BACKEND': 'online_exam_backend.staticfiles.CompressedManifestStorage',
+        }}
+        with override_settings(STATIC_ROOT=cls.root, STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.root, 'staticfiles.json')) as f:
+            cls.manifest = json.load(f)['paths']
+        with open(os.path.join(settings.BASE_DIR, 'static', 'css', 'base.css'), 'rb') as f:
+            cls.css = f.read()
+
+    def setUp(self):
+        self.app_calls = []
+        self.static = StaticFiles(self.app, root=self.root, prefix='/static/')
+
+    def app(self, environ, start_response):
+        self.app_calls.append(environ['PATH_INFO'])
+        start_response('200 OK', [])
+        return [b'from django']
+
+    def get(self, path, method='GET', **headers):
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': method}
+        environ.update({f'HTTP_{name}': value for name, value in headers.items()})
+        started = {}
+
+        def start_response(status, response_headers):
+            started['status'] = status
+            started['headers'] = dict(response_headers)
+
+        body = b''.join(self.static(environ, start_response))
+        return started['status'], started['headers'], body
+
+    def test_manifest_and_compressed_copies(self):
+        hashed = self.manifest['css/base.css']
+        self.assertRegex(hashed, r'^css/base\.[0-9a-f]{12}\.css$')
+        for name in ('css/base.css', hashed):
+            self.assertTrue(os.path.exists(os.path.join(self.root, name + '.gz')))
+            self.assertEqual(os.path.exists(os.path.join(self.root, name + '.br')), brotli is not None)
+        # Images are already compressed
+        image = self.manifest['images/test_placeholder.png']
+        self.assertFalse(os.path.exists(os.path.join(self.root, image + '.gz')))
+        storage = CompressedManifestStorage(location=self.root, base_url='/static/')
+        self.assertEqual(storage.url('css/base.css'), f'/static/{hashed}')
+
+    def check_encodings(self, cases):
+        path = '/static/' + self.manifest['css/base.css']
+        for accept, coding, decode in cases:
+            with self.subTest(accept=accept):
+                status, headers, body = self.get(path, ACCEPT_ENCODING=accept)
+                self.assertEqual(status, '200 OK')
+                self.assertEqual(headers.get('Content-Encoding'), coding)
+                self.assertEqual(headers['Vary'], 'Accept-Encoding')
+                self.assertEqual(headers['Content-Length'], str(len(body)))
+                self.assertEqual(decode(body), self.css)
+
+    def test_gzip_when_accepted(self):
+        self.check_encodings([
+            ('gzip', 'gzip', gzip.decompress),
+            ('br;q=0, gzip;q=0.5', 'gzip', gzip.decompress),
+            ('identity', None, bytes),
+            ('', None, bytes),
+        ])
+
+    @skipUnless(brotli, "needs the brotli package")
+    def test_brotli_preferred(self):
+        self.check_encodings([
+            ('gzip, deflate, br', 'br', brotli.decompress),
+            ('*', 'br', brotli.decompress),
+        ])
+
+    def test_cache_lifetimes(self):
+        _, headers, _ = self.get('/static/' + self.manifest['css/base.css'])
+        self.assertEqual(headers['Cache-Control'], f'public, max-age={365 * 24 * 3600}, immutable')
+        self.assertEqual(headers['Content-Type'], 'text/css; charset=utf-8')
+        _, headers, _ = self.get('/static/css/base.css')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=300')
+
+    def test_etag_revalidation(self):
+        path = '/static/' + self.manifest['css/base.css']
+        _, headers, _ = self.get(path, ACCEPT_ENCODING='gzip')
+        status, not_modified, body = self.get(path, ACCEPT_ENCODING='gzip', IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+        self.assertEqual(not_modified['ETag'], headers['ETag'])
+        self.assertNotIn('Content-Length', not_modified)
+        # Each encoding is a different representation with its own tag
+        status, _, _ = self.get(path, IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual(status, '200 OK')
+
+    def test_methods_and_fallthrough(self):
+        path = '/static/' + self.manifest['css/base.css']
+        status, headers, body = self.get(path, method='HEAD')
+        self.assertEqual((status, body), ('200 OK', b''))
+        self.assertEqual(headers['Content-Length'], str(len(self.css)))
+        self.assertEqual(self.get(path, method='POST')[0], '405 Method Not Allowed')
+        self.assertEqual(self.get('/static/missing.css')[2], b'from django')
+        self.assertEqual(self.get('/questions/')[2], b'from django')
+        self.assertEqual(self.app_calls, ['/static/missing.css', '/questions/'])
+
+    def test_asgi_serves_the_same_files(self):
+        async def app(scope, receive, send):
+            raise AssertionError('static request reached the application')
+
+        static = AsyncStaticFiles(app, root=self.root, prefix='/static/')
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/static/' + self.manifest['css/base.css'],
+            'headers': [(b'accept-encoding', b'gzip')],
+        }
+        async_to_sync(static)(scope, None, send)
+        headers = dict(messages[0]['headers'])
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(headers[b'content-encoding'], b'gzip')
+        self.assertEqual(gzip.decompress(b''.join(m['body'] for m in messages[1:])), self.css)
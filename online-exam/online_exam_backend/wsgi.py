@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'online_exam_backend.settings')
 
 application = get_wsgi_application()
+
+# Collected static files are served here, compressed and cached for a year,
+# without going through Django
+from online_exam_backend.staticfiles import StaticFiles  # noqa: E402
+
+application = StaticFiles(application)
@@ -0,0 +1,193 @@
+"""
+Computerized adaptive tests.
+
+An adaptive test asks one question at a time. Each question is the one
+that tells the most about the student at their current ability estimate:
+after right answers the questions get harder, after wrong ones easier. A
+test reaches a given precision with far fewer questions than a fixed
+random paper.
+
+Item parameters come from ``ItemParameters`` (``questions.irt``). Questions
+not calibrated yet use defaults from their difficulty label. Only objective
+questions are used, so each answer is scored as soon as it is submitted
+(``questions.autograde``).
+
+Picking the next question does not scan the bank. Per subject, the pool
+holds one list of question ids for each point of a fixed ability grid
+(``BUCKETS``), sorted by information at that point. The lists are built
+once per pool in process memory, as ``questions.sampling`` does. Picking
+finds the nearest grid point by bisection and walks the head of its list
+past the questions already asked. That costs O(log buckets + questions
+asked) per answer, however large the bank is. One of the ``EXPOSURE_TOP``
+best unasked questions is chosen at random, so the most informative ones
+are not shown to everyone.
+
+After each answer the ability estimate is the posterior mean (EAP) under a
+standard normal prior, and its standard error the posterior standard
+deviation. The test stops after ``CAT_MAX_ITEMS`` questions, or once the
+standard error is below ``CAT_TARGET_SE`` (after at least
+``CAT_MIN_ITEMS``).
+
+Pools are rebuilt when the question pool version changes (a question was
+added, edited or deleted), when a calibration bumps the parameter version,
+or after ``QUESTION_POOL_TTL`` seconds. The subject comes from the query
+string, so at most ``QUESTION_POOL_CACHE_SIZE`` pools are kept, least
+recently used first out (``questions.sampling.PoolCache``).
+"""
+import bisect
+import math
+import random
+from array import array
+
+import numpy as np
+from django.conf import settings
+
+from .ingest import new_nonce
+from .irt import LABEL_DIFFICULTY, NODES, WEIGHTS, guessing, params_version
+from .models import Question
+from .sampling import MAX_DRAW, PoolCache, pool_version
+
+
+MAX_ITEMS = getattr(settings, 'CAT_MAX_ITEMS', 20)
+MIN_ITEMS = getattr(settings, 'CAT_MIN_ITEMS', 5)
+TARGET_SE = getattr(settings, 'CAT_TARGET_SE', 0.3)
+EXPOSURE_TOP = getattr(settings, 'CAT_EXPOSURE_TOP', 3)
+
+# Ability points the pools are sorted for: -3 to 3 in steps of 0.25
+BUCKETS = [k / 4 for k in range(-12, 13)]
+
+_EAP_NODES = NODES.tolist()
+_EAP_LOG_WEIGHTS = [math.log(w) for w in WEIGHTS.tolist()]
+
+
+class ItemPool:
+    def __init__(self, ids, a, b, c):
+        self.params = {qid: (a[i], b[i], c[i]) for i, qid in enumerate(ids)}
+        # by_bucket[k]: ids by information at BUCKETS[k], most informative first
+        self.by_bucket = []
+        if ids:
+            info = information(np.array(BUCKETS)[:, None], np.array(a), np.array(b), np.array(c))
+            ids = np.array(ids, dtype=np.int64)
+            for order in np.argsort(-info, axis=1, kind='stable'):
+                self.by_bucket.append(array('q', ids[order].tolist()))
+
+    def __len__(self):
+        return len(self.params)
+
+
+def probability(theta, a, b, c):
+    return c + (1 - c) / (1 + math.exp(-a * (theta - b)))
+
+
+def information(theta, a, b, c):
+    """Fisher information of items at ``theta``; works on floats and NumPy arrays alike."""
+    p = c + (1 - c) / (1 + np.exp(-a * (theta - b)))
+    return a * a * (1 - p) / p * ((p - c) / (1 - c)) ** 2
+
+
+def _load_pool(subject):
+    qs = Question.objects.filter(question_type__in=Question.OBJECTIVE_TYPES).exclude(answer_key='')
+    if subject:
+        qs = qs.filter(subject_key=subject)
+    rows = qs.order_by('id').values_list(
+        'id', 'question_type', 'choices', 'difficulty', 'irt__a', 'irt__b', 'irt__c'
+    )
+    ids, a, b, c = [], [], [], []
+    for qid, kind, choices, difficulty, qa, qb, qc in rows.iterator(chunk_size=10000):
+        if qa is None:
+            qa, qb, qc = 1.0, LABEL_DIFFICULTY.get(difficulty, 0.0), guessing(kind, choices)
+        ids.append(qid)
+        a.append(qa)
+        b.append(qb)
+        c.append(qc)
+    return ItemPool(ids, a, b, c)
+
+
+_pools = PoolCache(_load_pool)
+
+
+def get_pool(subject):
+    return _pools.get(subject, (pool_version(), params_version()))
+
+
+def nearest_bucket(theta):
+    k = bisect.bisect_left(BUCKETS, theta)
+    if k == len(BUCKETS) or (k > 0 and theta - BUCKETS[k - 1] <= BUCKETS[k] - theta):
+        return k - 1
+    return k
+
+
+def next_question(pool, theta, asked, rng=random):
+    """A question id among the most informative at ``theta`` not in ``asked``, or ``None``."""
+    if not pool.by_bucket:
+        return None
+    candidates = []
+    for qid in pool.by_bucket[nearest_bucket(theta)]:
+        if qid not in asked:
+            candidates.append(qid)
+            if len(candidates) == EXPOSURE_TOP:
+                break
+    return rng.choice(candidates) if candidates else None
+
+
+def estimate_ability(responses):
+    """EAP ability and its standard error from ``(a, b, c, correct)`` tuples."""
+    log_post = list(_EAP_LOG_WEIGHTS)
+    for a, b, c, correct in responses:
+        for q, theta in enumerate(_EAP_NODES):
+            p = min(max(probability(theta, a, b, c), 1e-9), 1 - 1e-9)
+            log_post[q] += math.log(p if correct else 1 - p)
+    top = max(log_post)
+    post = [math.exp(v - top) for v in log_post]
+    total = sum(post)
+    theta = sum(x * w for x, w in zip(_EAP_NODES, post)) / total
+    variance = sum((x - theta) ** 2 * w for x, w in zip(_EAP_NODES, post)) / total
+    return theta, math.sqrt(variance)
+
+
+def new_test(subject='', length=None):
+    """Session state of a fresh test; ``subject`` limits the pool, ``length`` caps the questions."""
+    try:
+        length = int(length or MAX_ITEMS)
+    except ValueError:
+        length = MAX_ITEMS
+    return {
+        'subject': Question.normalize_key(subject),
+        'length': max(1, min(length, MAX_DRAW)),
+        # One [question id, a, b, c, correct] per question asked; correct is
+        # None until answered, or if the answer could not be scored
+        'asked': [],
+        'current': None,
+        'nonce': '',
+        'theta': 0.0,
+        'se': 1.0,
+        'done': False,
+    }
+
+
+def advance(state):
+    """Choose the next question into ``state['current']``, or mark the test done."""
+    if state['done'] or state['current'] is not None:
+        return
+    asked = {row[0] for row in state['asked']}
+    pool = get_pool(state['subject'])
+    qid = None if len(asked) >= state['length'] else next_question(pool, state['theta'], asked)
+    if qid is None:
+        state['done'] = True
+        return
+    # Parameters as of now, so a recalibration mid-test cannot change a past answer's meaning
+    state['asked'].append([qid, *pool.params[qid], None])
+    state['current'] = qid
+    state['nonce'] = new_nonce()
+
+
+def record_answer(state, correct):
+    """Record whether the current question was answered correctly (``None``: not scored)."""
+    row = state['asked'][-1]
+    row[4] = correct
+    scored = [tuple(r[1:]) for r in state['asked'] if r[4] is not None]
+    if correct is not None:
+        state['theta'], state['se'] = estimate_ability(scored)
+    state['current'] = None
+    if len(state['asked']) >= state['length'] or (len(scored) >= MIN_ITEMS and state['se'] <= TARGET_SE):
+        state['done'] = True
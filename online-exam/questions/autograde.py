@@ -0,0 +1,213 @@
+"""
+Automatic grading of objective questions.
+
+Multiple choice and true/false answers must equal the correct option,
+numerical answers must be within ``tolerance`` of the key, and short answer /
+fill-in-the-blank answers must equal one of the accepted answers (compared
+whitespace-collapsed and case-folded) or, with ``match_regex``, fully match
+the pattern. A correct answer scores the question's ``points``, anything
+else 0. Essay and matching questions are left for a teacher.
+
+Submissions are graded as they are accepted (see ``questions.ingest``) and
+can be re-graded in bulk with the ``autograde_submissions`` command, which
+runs ``grade_id_range`` over chunks of ids in a process pool.
+"""
+import math
+import re
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .leaderboard import record_grades
+from .models import Question, Submission
+from .progress import publish_graded
+
+
+AnswerKey = namedtuple('AnswerKey', 'question_type choices answer_key tolerance match_regex points')
+
+KEY_FIELDS = ('id', 'question_type', 'choices', 'answer_key', 'tolerance', 'match_regex', 'points')
+GRADE_FIELDS = ['graded', 'score', 'feedback', 'graded_at', 'auto_graded']
+# Ids per UPDATE; stays under SQLite's bound-parameter limit
+UPDATE_BATCH = 900
+
+FEEDBACK = {True: 'Auto-graded: correct.', False: 'Auto-graded: incorrect.'}
+
+
+def answer_key_for(question):
+    if not question.is_objective:
+        return None
+    return AnswerKey(
+        question.question_type, tuple(question.choices or ()), question.answer_key,
+        question.tolerance, question.match_regex, question.points,
+    )
+
+
+def load_answer_keys(question_ids=None):
+    """Map question id to ``AnswerKey`` for every gradable question (or those in ``question_ids``)."""
+    qs = Question.objects.filter(question_type__in=Question.OBJECTIVE_TYPES).exclude(answer_key='')
+    if question_ids is not None:
+        qs = qs.filter(id__in=question_ids)
+    return {q.id: answer_key_for(q) for q in qs.only(*KEY_FIELDS)}
+
+
+def normalize_answer(text):
+    return ' '.join((text or '').split()).casefold()
+
+
+def parse_number(text):
+    try:
+        value = float((text or '').strip().replace(',', ''))
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+@lru_cache(maxsize=1024)
+def _pattern(source):
+    return re.compile(source, re.IGNORECASE)
+
+
+def is_correct(key, answer_text):
+    kind = key.question_type
+    if kind in ('multiple_choice', 'true_false'):
+        return normalize_answer(answer_text) == normalize_answer(key.answer_key)
+    if kind == 'numerical':
+        expected = parse_number(key.answer_key)
+        given = parse_number(answer_text)
+        if expected is None or given is None:
+            return False
+        # Small relative slack so 0.1 + 0.2 style rounding never fails a right answer
+        return abs(given - expected) <= key.tolerance + 1e-9 * max(1.0, abs(expected))
+    if key.match_regex:
+        return any(
+            _pattern(line.strip()).fullmatch((answer_text or '').strip())
+            for line in key.answer_key.splitlines() if line.strip()
+        )
+    answer = normalize_answer(answer_text)
+    return any(answer == normalize_answer(line) for line in key.answer_key.splitlines() if line.strip())
+
+
+def autograde(submission, key, now=None):
+    """Score ``submission`` in place against ``key``; the caller saves it."""
+    correct = is_correct(key, submission.answer_text)
+    submission.graded = True
+    submission.auto_graded = True
+    submission.score = key.points if correct else 0
+    submission.feedback = FEEDBACK[correct]
+    submission.graded_at = now or timezone.now()
+    return correct
+
+
+def grade_id_range(start, stop, include_manual=False, keys=None):
+    """
+    Re-grade objective submissions with ``start <= id < stop``.
+
+    Rows whose score and status would not change are skipped. The rest share
+    only a few distinct ``(score, feedback)`` values, so they are written as
+    one ``UPDATE ... WHERE id IN`` per value (``bulk_update`` would build a
+    ``CASE`` branch per row and field, which dominates the run time), with
+    the leaderboard deltas applied in the same transaction. Returns
+    ``(scanned, updated)``.
+    """
+    keys = _worker_keys() if keys is None else keys
+    qs = Submission.objects.filter(
+        id__gte=start, id__lt=stop, question__question_type__in=Question.OBJECTIVE_TYPES,
+    )
+    if not include_manual:
+        qs = qs.filter(Q(graded=False) | Q(auto_graded=True))
+    rows = list(qs.only('id', 'student_id', 'question_id', 'answer_text', *GRADE_FIELDS))
+    now = timezone.now()
+    groups, changes = defaultdict(list), []
+    for sub in rows:
+        key = keys.get(sub.question_id)
+        if key is None:
+            continue
+        before = (sub.graded, sub.score, sub.auto_graded)
+        previous_score = sub.score
+        autograde(sub, key, now)
+        if before == (True, sub.score, True):
+            continue
+        groups[sub.score, sub.feedback].append(sub.id)
+        changes.append((sub, before[0], previous_score))
+    if changes:
+        with transaction.atomic():
+            for (score, feedback), ids in groups.items():
+                for i in range(0, len(ids), UPDATE_BATCH):
+                    Submission.objects.filter(id__in=ids[i:i + UPDATE_BATCH]).update(
+                        graded=True, auto_graded=True, score=score, feedback=feedback, graded_at=now,
+                    )
+            record_grades(changes)
+            publish_graded(changes)
+    return len(rows), len(changes)
+
+
+_keys = None
+
+
+def init_worker():
+    """Process pool initializer: set Django up (spawn) and load the answer keys once."""
+    import django
+    django.setup()
+    global _keys
+    _keys = load_answer_keys()
+
+
+def _worker_keys():
+    global _keys
+    if _keys is None:
+        _keys = load_answer_keys()
+    return _keys
+
+
+def answer_fields_from_post(data):
+    """
+    Read the answer key from the add/edit question form. Returns
+    ``(fields, error)`` where ``fields`` holds the ``Question`` attributes.
+    """
+    kind = data.get('question_type') or 'essay'
+    if kind not in dict(Question.TYPE_CHOICES):
+        return None, 'Unknown question type.'
+    fields = {
+        'question_type': kind, 'choices': [], 'answer_key': '',
+        'tolerance': 0, 'match_regex': False,
+    }
+    points = (data.get('points') or '1').strip()
+    if not points.isdigit() or int(points) < 1:
+        return None, 'Marks must be a positive whole number.'
+    fields['points'] = int(points)
+
+    if kind == 'multiple_choice':
+        options = [(data.get(f'option{i}') or '').strip() for i in range(1, 5)]
+        correct = data.get('correct_answer') or ''
+        if not correct.isdigit() or not 1 <= int(correct) <= len(options) or not options[int(correct) - 1]:
+            return None, 'The correct answer must be one of the filled-in options.'
+        fields['choices'] = [o for o in options if o]
+        fields['answer_key'] = options[int(correct) - 1]
+    elif kind == 'true_false':
+        fields['choices'] = ['True', 'False']
+        fields['answer_key'] = 'False' if data.get('tf_answer') == 'false' else 'True'
+    elif kind == 'numerical':
+        expected = parse_number(data.get('numerical_answer'))
+        margin = parse_number(data.get('error_margin') or '0')
+        if expected is None:
+            return None, 'Numerical questions need a numeric correct answer.'
+        if margin is None or margin < 0:
+            return None, 'The error margin must be a non-negative number.'
+        fields['answer_key'] = repr(expected)
+        fields['tolerance'] = margin
+    elif kind in ('short_answer', 'fill_blanks'):
+        raw = data.get('short_answer') if kind == 'short_answer' else data.get('blank_answer')
+        separator = '\n' if kind == 'short_answer' else ';'
+        answers = [a.strip() for a in (raw or '').split(separator) if a.strip()]
+        fields['match_regex'] = kind == 'short_answer' and bool(data.get('match_regex'))
+        if fields['match_regex']:
+            for pattern in answers:
+                try:
+                    re.compile(pattern)
+                except re.error as exc:
+                    return None, f'Invalid pattern {pattern!r}: {exc}'
+        fields['answer_key'] = '\n'.join(answers)
+    return fields, None
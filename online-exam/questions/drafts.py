@@ -0,0 +1,186 @@
+"""
+Autosaved exam answers.
+
+The exam page posts changed answers every few seconds. At 10k students
+that is about 1000 writes a second, most of them overwritten moments later,
+so an autosave never writes to the main database itself:
+
+* the latest draft of each (attempt, question) is set in the cache, which
+  every web process shares, so a student who reloads or switches machines
+  gets their answers back;
+* the same draft is upserted into a local SQLite spool (WAL) keyed on
+  (attempt, question), so repeated saves between flushes collapse to one row;
+* ``flush_exam_drafts --loop`` moves the spool into ``ExamDraft`` every
+  ``EXAM_DRAFT_FLUSH_INTERVAL`` seconds with one batched upsert, which writes
+  only the last draft from each window. The upsert keeps the newer draft when
+  two hosts spooled the same answer.
+
+On final submit the drafts fill in whatever the form did not post and are
+turned into submissions; the drafts are then dropped. Each web host has its
+own spool file, so run one flusher per host, as for ``questions.ingest``.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import ExamAttempt, ExamDraft, Question
+
+
+DRAFT_SPOOL_PATH = getattr(
+    settings, 'EXAM_DRAFT_SPOOL_PATH', os.path.join(settings.BASE_DIR, 'draft_spool.sqlite3')
+)
+FLUSH_INTERVAL = getattr(settings, 'EXAM_DRAFT_FLUSH_INTERVAL', 10)
+# Drafts stay in the cache this long past the attempt's deadline
+CACHE_EXTRA = 3600
+# Longest answer kept in a draft, as a guard against runaway posts
+MAX_DRAFT_LENGTH = 20000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS drafts (
+    attempt_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    answer_text TEXT NOT NULL,
+    saved_at TEXT NOT NULL,
+    PRIMARY KEY (attempt_id, question_id)
+) WITHOUT ROWID
+"""
+
+
+def _cache_key(attempt_id, question_id):
+    return f'exam_draft:{attempt_id}:{question_id}'
+
+
+class DraftSpool:
+    def __init__(self, path=DRAFT_SPOOL_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # A draft is superseded within seconds and also sits in the cache,
+            # so skip the per-commit fsync the submission spool pays for
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def put_many(self, rows):
+        """Upsert ``(attempt_id, question_id, answer_text, saved_at)`` rows in one commit."""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO drafts (attempt_id, question_id, answer_text, saved_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (attempt_id, question_id) DO UPDATE SET '
+                'answer_text = excluded.answer_text, saved_at = excluded.saved_at '
+                'WHERE excluded.saved_at >= drafts.saved_at',
+                [(a, q, text, saved_at.astimezone(dt_timezone.utc).isoformat()) for a, q, text, saved_at in rows],
+            )
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def pending(self):
+        return self._connection().execute('SELECT COUNT(*) FROM drafts').fetchone()[0]
+
+    def discard(self, attempt_id):
+        self._connection().execute('DELETE FROM drafts WHERE attempt_id = ?', (attempt_id,))
+
+    def flush(self, batch_size=1000):
+        """Write one batch of drafts to ``ExamDraft``; returns the number of spool rows handled."""
+        conn = self._connection()
+        rows = conn.execute(
+            'SELECT attempt_id, question_id, answer_text, saved_at FROM drafts '
+            'ORDER BY attempt_id, question_id LIMIT ?',
+            (batch_size,),
+        ).fetchall()
+        if not rows:
+            return 0
+        # Drafts of submitted or deleted attempts have nowhere to go
+        live = set(
+            ExamAttempt.objects.filter(
+                id__in={r[0] for r in rows}, submitted_at__isnull=True
+            ).values_list('id', flat=True)
+        )
+        questions = set(Question.objects.filter(id__in={r[1] for r in rows}).values_list('id', flat=True))
+        ops = connection.ops
+        table = ops.quote_name(ExamDraft._meta.db_table)
+        sql = (
+            f'INSERT INTO {table} (attempt_id, question_id, answer_text, saved_at) VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT (attempt_id, question_id) DO UPDATE SET '
+            f'answer_text = excluded.answer_text, saved_at = excluded.saved_at '
+            f'WHERE {table}.saved_at < excluded.saved_at'
+        )
+        params = [
+            (a, q, text, ops.adapt_datetimefield_value(datetime.fromisoformat(saved_at)))
+            for a, q, text, saved_at in rows
+            if a in live and q in questions
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        # Rows re-saved while we were writing keep their newer saved_at and stay queued
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(
+            'DELETE FROM drafts WHERE attempt_id = ? AND question_id = ? AND saved_at = ?',
+            [(a, q, saved_at) for a, q, _, saved_at in rows],
+        )
+        conn.execute('COMMIT')
+        return len(rows)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_spool = None
+
+
+def get_draft_spool():
+    global _spool
+    if _spool is None:
+        _spool = DraftSpool()
+    return _spool
+
+
+def save_drafts(attempt_id, deadline, answers, now):
+    """Record ``{question_id: answer_text}`` as the latest drafts of an attempt."""
+    timeout = max(0, int((deadline - now).total_seconds())) + CACHE_EXTRA
+    answers = {qid: text[:MAX_DRAFT_LENGTH] for qid, text in answers.items()}
+    cache.set_many(
+        {_cache_key(attempt_id, qid): text for qid, text in answers.items()}, timeout
+    )
+    get_draft_spool().put_many([(attempt_id, qid, text, now) for qid, text in answers.items()])
+
+
+def load_drafts(attempt_id, question_ids):
+    """``{question_id: answer_text}`` with the newest known draft of each question."""
+    found = cache.get_many([_cache_key(attempt_id, qid) for qid in question_ids])
+    drafts = {
+        qid: found[_cache_key(attempt_id, qid)]
+        for qid in question_ids if _cache_key(attempt_id, qid) in found
+    }
+    # The cache may have been evicted or restarted: fall back to the flushed copies
+    missing = [qid for qid in question_ids if qid not in drafts]
+    if missing:
+        drafts.update(
+            ExamDraft.objects.filter(attempt_id=attempt_id, question_id__in=missing)
+            .values_list('question_id', 'answer_text')
+        )
+    return drafts
+
+
+def discard_drafts(attempt_id, question_ids):
+    cache.delete_many([_cache_key(attempt_id, qid) for qid in question_ids])
+    get_draft_spool().discard(attempt_id)
+    ExamDraft.objects.filter(attempt_id=attempt_id).delete()
@@ -0,0 +1,147 @@
+"""
+Near-duplicate questions.
+
+``Question.fill_keys`` stores a MinHash signature of the question text
+(``questions.similarity``); its 16 LSH band buckets are kept in
+``QuestionBand``, indexed on ``bucket``. Checking a new text looks up its
+own 16 buckets, which returns only the questions sharing at least one band,
+and compares their full signatures. The cost follows the number of
+candidates, not the size of the bank.
+
+Band rows are refreshed on ``post_save`` (``questions.signals``); code that
+bypasses it (``bulk_create`` in the importer) calls ``index_questions``.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Question, QuestionBand
+from .similarity import band_hashes, estimate, similar_pairs, unpack
+
+
+# Low enough that one changed word in a 15-word stem (true similarity ~0.75)
+# is still caught despite the estimate's spread with 64 hashes
+THRESHOLD = getattr(settings, 'QUESTION_DUPLICATE_THRESHOLD', 0.6)
+# Candidates compared per text; bounds the work for texts in a huge cluster
+MAX_CANDIDATES = 500
+# Buckets per lookup query; stays under SQLite's bound-parameter limit
+LOOKUP_BATCH = 900
+
+
+def index_questions(questions):
+    """Replace the band rows of ``questions`` (which must have ``minhash`` set)."""
+    questions = [q for q in questions if q.pk]
+    if not questions:
+        return
+    rows = [
+        (q.pk, band, bucket)
+        for q in questions if q.minhash
+        for band, bucket in band_hashes(q.minhash)
+    ]
+    table = connection.ops.quote_name(QuestionBand._meta.db_table)
+    # 16 rows per question: a plain executemany skips the ORM's per-value
+    # preparation, which made bulk_create the slowest step of an import
+    sql = f'INSERT INTO {table} (question_id, band, bucket) VALUES (%s, %s, %s)'
+    with transaction.atomic():
+        QuestionBand.objects.filter(question_id__in=[q.pk for q in questions]).delete()
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+
+def index_question(question):
+    index_questions([question])
+
+
+def _matching(signatures, threshold, exclude=()):
+    """
+    For each ``key -> packed signature``, the indexed questions scoring at
+    least ``threshold``: ``{key: [(question_id, similarity), ...]}``.
+    """
+    wanted = {}
+    for key, data in signatures.items():
+        for _, bucket in band_hashes(data):
+            wanted.setdefault(bucket, []).append(key)
+    buckets = list(wanted)
+    hits = {}
+    for i in range(0, len(buckets), LOOKUP_BATCH):
+        rows = QuestionBand.objects.filter(bucket__in=buckets[i:i + LOOKUP_BATCH]).exclude(
+            question_id__in=exclude
+        ).values_list('question_id', 'bucket')
+        for question_id, bucket in rows:
+            for key in wanted[bucket]:
+                candidates = hits.setdefault(key, set())
+                if len(candidates) < MAX_CANDIDATES:
+                    candidates.add(question_id)
+    if not hits:
+        return {}
+    candidate_ids = list(set().union(*hits.values()))
+    stored = {}
+    for i in range(0, len(candidate_ids), LOOKUP_BATCH):
+        stored.update(
+            Question.objects.filter(id__in=candidate_ids[i:i + LOOKUP_BATCH]).values_list('id', 'minhash')
+        )
+    result = {}
+    for key, ids in hits.items():
+        mine = unpack(signatures[key])
+        scored = [
+            (qid, estimate(mine, unpack(stored[qid])))
+            for qid in ids if stored.get(qid)
+        ]
+        scored = [m for m in scored if m[1] >= threshold]
+        if scored:
+            result[key] = sorted(scored, key=lambda m: -m[1])
+    return result
+
+
+def find_similar(text, exclude_id=None, threshold=THRESHOLD, limit=5):
+    """Up to ``limit`` ``(question, similarity)`` pairs for existing questions like ``text``."""
+    data = Question.fingerprint(text)
+    if not data:
+        return []
+    exclude = [exclude_id] if exclude_id else []
+    matches = _matching({0: data}, threshold, exclude).get(0, [])[:limit]
+    questions = Question.objects.select_related('author').in_bulk([qid for qid, _ in matches])
+    return [(questions[qid], score) for qid, score in matches if qid in questions]
+
+
+def find_similar_many(signatures, threshold=THRESHOLD):
+    """Batch form of ``find_similar`` over ``{key: packed signature}``, one band query in total."""
+    return _matching({k: v for k, v in signatures.items() if v}, threshold)
+
+
+def backfill(batch_size=1000):
+    """Fingerprint and index questions that have no signature yet; returns the count."""
+    done = 0
+    while True:
+        batch = list(Question.objects.filter(minhash__isnull=True).order_by('id')[:batch_size])
+        if not batch:
+            return done
+        for q in batch:
+            q.minhash = Question.fingerprint(q.question_text)
+        with transaction.atomic():
+            Question.objects.bulk_update(batch, ['minhash'])
+            index_questions(batch)
+        done += len(batch)
+
+
+def duplicate_groups(threshold=THRESHOLD, min_size=2):
+    """Groups of question ids linked by near-duplicate pairs, largest first."""
+    items = Question.objects.exclude(minhash=None).values_list('id', 'minhash').iterator(chunk_size=5000)
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b, _ in similar_pairs(items, threshold):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    groups = {}
+    for x in parent:
+        groups.setdefault(find(x), []).append(x)
+    result = [sorted(g) for g in groups.values() if len(g) >= min_size]
+    result.sort(key=lambda g: (-len(g), g[0]))
+    return result
@@ -0,0 +1,217 @@
+"""
+Publish/subscribe for live pages (server-sent events).
+
+Streams are async views served by the ASGI app, so an idle connection costs
+a suspended coroutine rather than a worker thread. Under WSGI (runserver,
+``wsgi.py``) Django reads an async streaming body to the end before sending
+any of it, so a stream would never deliver and would hold a worker thread
+for good: there the stream views answer 204, which tells ``EventSource``
+not to reconnect, and the pages poll instead (``can_stream``). Each process keeps one
+``Hub``: streams subscribe to named channels (``exam:<id>``,
+``attempt:<id>``) and get their own bounded queue. ``publish`` may be
+called from any thread, including sync views and signal handlers, and hands
+events to the subscribers' event loop.
+
+How events reach other processes is up to the backend (``EVENTS_BACKEND``):
+
+* ``LocalBackend`` delivers in-process only; enough for a single ASGI
+  worker and for development.
+* ``CacheBackend`` (default) appends each event to a numbered log in the
+  cache. Each process runs one polling task that reads the positions of all
+  channels it has subscribers for in one ``get_many``, however many streams
+  and channels are open, and fans new entries out locally. With a shared
+  cache (Redis) every process sees every event within
+  ``EVENTS_POLL_INTERVAL`` seconds.
+"""
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.module_loading import import_string
+
+
+BACKEND = getattr(settings, 'EVENTS_BACKEND', 'questions.events.CacheBackend')
+POLL_INTERVAL = getattr(settings, 'EVENTS_POLL_INTERVAL', 1.0)
+# Events kept in the cache log; a poller that falls further behind skips ahead
+EVENT_TTL = 300
+MAX_BATCH = 200
+# Events a slow stream may have pending before the oldest are dropped
+MAX_PENDING = 100
+
+
+def sse(event, data):
+    """One server-sent event frame."""
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"), default=str)}\n\n'
+
+
+def can_stream(request):
+    """Whether ``request`` came through the ASGI app, which can hold a stream open."""
+    return isinstance(request, ASGIRequest)
+
+
+class Subscription:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if self.queue.qsize() >= MAX_PENDING:
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """The next event, or ``None`` if nothing arrives within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Hub:
+    def __init__(self, backend_class):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self.backend = backend_class(self)
+
+    def publish(self, channel, event):
+        self.backend.publish(channel, event)
+
+    def deliver(self, channel, event, loop=None):
+        """Queue ``event`` for this process's subscribers (only those on ``loop`` if given)."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            if loop is None or subscription.loop is loop:
+                subscription.put(event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    @asynccontextmanager
+    async def subscribe(self, *channels):
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(loop)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        for channel in channels:
+            await self.backend.listen(channel, loop)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                for channel in channels:
+                    subscribers = self._subscribers[channel]
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+            for channel in channels:
+                self.backend.unlisten(channel, loop)
+
+
+class LocalBackend:
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, channel, event):
+        self.hub.deliver(channel, event)
+
+    async def listen(self, channel, loop):
+        pass
+
+    def unlisten(self, channel, loop):
+        pass
+
+
+class CacheBackend:
+    def __init__(self, hub):
+        self.hub = hub
+        self._lock = threading.Lock()
+        # loop -> {channel: [subscriptions, last sequence number seen]}; each
+        # event loop (an ASGI worker has one) runs a single poller for all of
+        # its channels, so the cache sees one read per interval per process
+        # however many streams and channels are open
+        self._channels = {}
+        self._pollers = {}
+
+    @staticmethod
+    def _seq_key(channel):
+        return f'events:{channel}:seq'
+
+    def publish(self, channel, event):
+        key = self._seq_key(channel)
+        try:
+            seq = cache.incr(key)
+        except ValueError:
+            cache.add(key, 0, None)
+            seq = cache.incr(key)
+        cache.set(f'events:{channel}:{seq}', event, EVENT_TTL)
+
+    async def listen(self, channel, loop):
+        with self._lock:
+            channels = self._channels.setdefault(loop, {})
+            entry = channels.get(channel)
+            if entry is not None:
+                entry[0] += 1
+                return
+            entry = channels[channel] = [1, None]
+            if loop not in self._pollers:
+                self._pollers[loop] = loop.create_task(self._poll(loop))
+        # Start from the current position: events published from here on are delivered
+        seq = await cache.aget(self._seq_key(channel)) or 0
+        if entry[1] is None:
+            entry[1] = seq
+
+    def unlisten(self, channel, loop):
+        with self._lock:
+            channels = self._channels[loop]
+            channels[channel][0] -= 1
+            if channels[channel][0] == 0:
+                del channels[channel]
+            if not channels:
+                del self._channels[loop]
+                self._pollers.pop(loop).cancel()
+
+    async def _poll(self, loop):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            with self._lock:
+                watched = [(c, e) for c, e in self._channels.get(loop, {}).items() if e[1] is not None]
+            if not watched:
+                continue
+            seqs = await cache.aget_many([self._seq_key(c) for c, _ in watched])
+            wanted = {}
+            for channel, entry in watched:
+                seq = seqs.get(self._seq_key(channel), 0)
+                if seq > entry[1]:
+                    first = max(entry[1] + 1, seq - MAX_BATCH + 1)
+                    wanted[channel] = [f'events:{channel}:{n}' for n in range(first, seq + 1)]
+                    entry[1] = seq
+            if not wanted:
+                continue
+            found = await cache.aget_many([k for keys in wanted.values() for k in keys])
+            for channel, keys in wanted.items():
+                for k in keys:
+                    if k in found:
+                        self.hub.deliver(channel, found[k], loop)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = Hub(import_string(BACKEND))
+    return _hub
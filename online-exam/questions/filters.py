@@ -0,0 +1,58 @@
+"""
+Query-string filters over submissions, shared by the performance export and
+the grading list.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Question, Submission
+from .plagiarism import flagged_filter
+
+
+TRUE_VALUES = ('1', 'true', 'yes')
+FALSE_VALUES = ('0', 'false', 'no')
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _date(value):
+    # parse_date returns None for malformed input but raises on impossible
+    # dates (2020-13-45); either way the filter is ignored
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def filtered_submissions(params, qs=None):
+    """
+    Apply the filters from ``params``: ``from``/``to`` (YYYY-MM-DD, inclusive,
+    on ``submitted_at``), ``subject``, ``question`` (id), ``graded``
+    (``1`` for graded only, ``0`` for ungraded only) and ``flagged=1`` for
+    answers involved in a plagiarism flag.
+    """
+    qs = Submission.objects.all() if qs is None else qs
+    start = _date(params.get('from'))
+    end = _date(params.get('to'))
+    subject = Question.normalize_key(params.get('subject'))
+    question = params.get('question') or ''
+    graded = params.get('graded') or ''
+    if start:
+        qs = qs.filter(submitted_at__gte=_day_start(start))
+    if end:
+        qs = qs.filter(submitted_at__lt=_day_start(end + timedelta(days=1)))
+    if subject:
+        qs = qs.filter(question__subject_key=subject)
+    if question.isdigit():
+        qs = qs.filter(question_id=int(question))
+    if graded in TRUE_VALUES:
+        qs = qs.filter(graded=True)
+    elif graded in FALSE_VALUES:
+        qs = qs.filter(graded=False)
+    if params.get('flagged') in TRUE_VALUES:
+        qs = qs.filter(flagged_filter())
+    return qs
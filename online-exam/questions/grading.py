@@ -0,0 +1,68 @@
+"""
+Batch grading.
+
+``apply_grades`` takes the scores a teacher entered for a page of submissions
+and writes them with one ``bulk_update`` inside one transaction, all stamped
+with the same ``graded_at``. ``bulk_update`` skips ``post_save``, so the
+leaderboard summaries and the report cache are updated here directly.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from authentication.reports import invalidate_reports
+from .leaderboard import record_grades
+from .models import Submission
+from .progress import publish_graded
+
+
+GRADE_FIELDS = ['graded', 'score', 'feedback', 'graded_at', 'auto_graded']
+BATCH_SIZE = 500
+
+
+def parse_grades(data, ids):
+    """
+    Read ``score_<id>`` / ``feedback_<id>`` pairs from POST ``data`` for the
+    submission ``ids`` shown on the page. Rows with a blank score are left
+    alone. Returns ``(grades, errors)`` where ``grades`` maps id to
+    ``(score, feedback)`` and ``errors`` maps id to a message.
+    """
+    grades, errors = {}, {}
+    for sub_id in ids:
+        raw = (data.get(f'score_{sub_id}') or '').strip()
+        if not raw:
+            continue
+        try:
+            score = int(raw)
+        except ValueError:
+            errors[sub_id] = 'Score must be a whole number.'
+            continue
+        if score < 0:
+            errors[sub_id] = 'Score cannot be negative.'
+            continue
+        grades[sub_id] = (score, data.get(f'feedback_{sub_id}', '').strip())
+    return grades, errors
+
+
+def apply_grades(grades, graded_at=None):
+    """Grade every submission in ``grades`` (id -> (score, feedback)); returns the count."""
+    if not grades:
+        return 0
+    graded_at = graded_at or timezone.now()
+    with transaction.atomic():
+        submissions = list(
+            Submission.objects.select_for_update().filter(id__in=grades).only(
+                'id', 'student_id', *GRADE_FIELDS
+            )
+        )
+        changes = []
+        for sub in submissions:
+            changes.append((sub, sub.graded, sub.score))
+            sub.score, sub.feedback = grades[sub.id]
+            sub.graded = True
+            sub.auto_graded = False
+            sub.graded_at = graded_at
+        Submission.objects.bulk_update(submissions, GRADE_FIELDS, batch_size=BATCH_SIZE)
+        record_grades(changes)
+        publish_graded(changes)
+    invalidate_reports()
+    return len(submissions)
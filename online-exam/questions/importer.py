@@ -0,0 +1,168 @@
+"""
+Bulk question import from CSV or JSON Lines.
+
+Rows are read lazily from the file, validated, de-duplicated by
+``Question.content_hash`` (against the file itself and the existing bank) and
+written with ``bulk_create`` in batches, each batch in its own transaction so
+a failure part-way through keeps the batches already committed. Every
+rejected row is recorded in the report with its line number, and rows that
+are close to (but not exactly) an existing question are imported but listed
+as near-duplicates (``questions.duplicates``).
+
+CSV files need a header row; both formats use the keys ``question_text``,
+``subject``, ``topic`` and ``difficulty``. A file that stops being readable
+(not UTF-8, or broken CSV quoting) ends the import with ``report.fatal``
+set; the rows read before that point are imported as usual.
+"""
+import csv
+import json
+import time
+
+from django.db import transaction
+
+from authentication.reports import invalidate_reports
+from .duplicates import find_similar_many, index_questions
+from .models import Question
+from .sampling import bump_pool_version
+from .search import get_backend
+
+
+DIFFICULTIES = {key for key, _ in Question.DIFFICULTY_CHOICES}
+MAX_LENGTHS = {
+    'subject': Question._meta.get_field('subject').max_length,
+    'topic': Question._meta.get_field('topic').max_length,
+}
+
+
+class ImportReport:
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.duplicates = 0
+        self.errors = []
+        self.near_duplicates = []
+        self.elapsed = 0.0
+        # Why the import stopped before the end of the file, if it did
+        self.fatal = None
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+    @property
+    def rows_per_second(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (
+            f"{self.total} rows: {self.created} created, {self.duplicates} duplicates, "
+            f"{len(self.errors)} errors, {len(self.near_duplicates)} near-duplicates "
+            f"in {self.elapsed:.2f}s ({self.rows_per_second:.0f} rows/s)"
+        )
+
+
+def detect_format(filename):
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_rows(lines, fmt):
+    """Yield ``(line_number, row_or_None, error)`` from an iterable of text lines."""
+    if fmt == 'jsonl':
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, None, f"invalid JSON: {exc}"
+                continue
+            if not isinstance(row, dict):
+                yield number, None, "expected a JSON object"
+                continue
+            yield number, row, None
+    else:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # Header is line 1, so data rows start at 2
+            yield reader.line_num, row, None
+
+
+def build_question(row, author=None):
+    """Return ``(question, error)`` for one input row."""
+    text = str(row.get('question_text') or '').strip()
+    if not text:
+        return None, "question_text is required"
+    values = {}
+    for field in ('subject', 'topic'):
+        value = str(row.get(field) or '').strip()
+        if len(value) > MAX_LENGTHS[field]:
+            return None, f"{field} is longer than {MAX_LENGTHS[field]} characters"
+        values[field] = value
+    difficulty = str(row.get('difficulty') or 'easy').strip().lower()
+    if difficulty not in DIFFICULTIES:
+        return None, f"difficulty must be one of {', '.join(sorted(DIFFICULTIES))}"
+    question = Question(question_text=text, difficulty=difficulty, author=author, **values)
+    question.fill_keys()
+    return question, None
+
+
+def _flush(batch, report, dry_run):
+    """``batch`` is a list of ``(line, question)`` pairs."""
+    hashes = [q.content_hash for _, q in batch]
+    existing = set(
+        Question.objects.filter(content_hash__in=hashes).values_list('content_hash', flat=True)
+    )
+    fresh = [(line, q) for line, q in batch if q.content_hash not in existing]
+    report.duplicates += len(batch) - len(fresh)
+    if not fresh:
+        return
+    similar = find_similar_many({line: q.minhash for line, q in fresh})
+    for line in sorted(similar):
+        question_id, score = similar[line][0]
+        report.near_duplicates.append((line, question_id, score))
+    if dry_run:
+        return
+    with transaction.atomic():
+        created = Question.objects.bulk_create([q for _, q in fresh])
+        # bulk_create skips post_save, so feed the indexes directly
+        get_backend().index_questions(created)
+        index_questions(created)
+    report.created += len(created)
+
+
+def import_questions(lines, fmt='csv', author=None, batch_size=500, dry_run=False):
+    report = ImportReport()
+    started = time.perf_counter()
+    seen = set()
+    batch = []
+    try:
+        for line, row, error in read_rows(lines, fmt):
+            report.total += 1
+            if error:
+                report.add_error(line, error)
+                continue
+            question, error = build_question(row, author=author)
+            if error:
+                report.add_error(line, error)
+                continue
+            if question.content_hash in seen:
+                report.duplicates += 1
+                continue
+            seen.add(question.content_hash)
+            batch.append((line, question))
+            if len(batch) >= batch_size:
+                _flush(batch, report, dry_run)
+                batch = []
+    except UnicodeDecodeError:
+        report.fatal = f"The file is not UTF-8 text; stopped after {report.total} rows. Save it as UTF-8 and retry."
+    except csv.Error as exc:
+        report.fatal = f"The CSV could not be read after {report.total} rows: {exc}"
+    if batch:
+        _flush(batch, report, dry_run)
+    if report.created:
+        bump_pool_version()
+        invalidate_reports()
+    report.elapsed = time.perf_counter() - started
+    return report
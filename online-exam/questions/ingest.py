@@ -0,0 +1,200 @@
+"""
+Write-behind ingestion of submissions.
+
+With ``SUBMISSION_INGEST_MODE = 'spool'`` the answer view appends each
+submission to a local SQLite file in WAL mode (cheap, local, durable) and
+returns; the ``flush_submission_spool`` worker moves spooled rows into the main
+database with ``bulk_create`` and only then deletes them from the spool.
+
+Delivery is at-least-once: a crash between the insert and the delete makes
+the next flush insert the same rows again, and the
+``(student, question, client_nonce)`` unique constraint drops the repeats.
+Each web host has its own spool file, so run one flusher per host.
+
+Either way, answers to objective questions are scored against the answer key
+on the way in (``questions.autograde``) and counted on the leaderboard.
+"""
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from authentication.reports import note_new_submissions
+from .autograde import answer_key_for, autograde, load_answer_keys
+from .leaderboard import record_grade, record_grades
+from .models import Question, Submission
+from .plagiarism import fingerprint
+from .progress import publish_new
+
+
+INGEST_MODE = getattr(settings, 'SUBMISSION_INGEST_MODE', 'direct')
+SPOOL_PATH = getattr(
+    settings, 'SUBMISSION_SPOOL_PATH', os.path.join(settings.BASE_DIR, 'submission_spool.sqlite3')
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    client_nonce TEXT NOT NULL,
+    answer_text TEXT NOT NULL,
+    submitted_at TEXT NOT NULL
+)
+"""
+
+
+def new_nonce():
+    return uuid.uuid4().hex
+
+
+class SubmissionSpool:
+    def __init__(self, path=SPOOL_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # FULL fsyncs the WAL on every commit so an accepted answer
+            # survives a power cut, not just a process crash
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, student_id, question_id, answer_text, client_nonce='', submitted_at=None):
+        submitted_at = submitted_at or timezone.now()
+        self._connection().execute(
+            'INSERT INTO spool (student_id, question_id, client_nonce, answer_text, submitted_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (student_id, question_id, client_nonce or new_nonce(), answer_text,
+             submitted_at.astimezone(dt_timezone.utc).isoformat()),
+        )
+
+    def enqueue_many(self, rows):
+        """Append ``(student_id, question_id, answer_text, client_nonce)`` tuples in one commit."""
+        now = timezone.now().astimezone(dt_timezone.utc).isoformat()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO spool (student_id, question_id, client_nonce, answer_text, submitted_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(s, q, n or new_nonce(), a, now) for s, q, a, n in rows],
+            )
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def pending(self):
+        return self._connection().execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+
+    def peek(self, limit):
+        return self._connection().execute(
+            'SELECT id, student_id, question_id, client_nonce, answer_text, submitted_at '
+            'FROM spool ORDER BY id LIMIT ?',
+            (limit,),
+        ).fetchall()
+
+    def ack(self, last_id):
+        self._connection().execute('DELETE FROM spool WHERE id <= ?', (last_id,))
+
+    def flush(self, batch_size=1000):
+        """Move one batch into the main database; returns the number of spool rows handled."""
+        rows = self.peek(batch_size)
+        if not rows:
+            return 0
+        # Drop answers whose question or student was deleted while spooled;
+        # a foreign key failure would otherwise wedge the whole batch.
+        question_types = dict(
+            Question.objects.filter(id__in={r[2] for r in rows}).values_list('id', 'question_type')
+        )
+        question_ids = set(question_types)
+        student_ids = set(
+            get_user_model().objects.filter(id__in={r[1] for r in rows}).values_list('id', flat=True)
+        )
+        rows_to_insert = [r for r in rows if r[1] in student_ids and r[2] in question_ids]
+        keys = load_answer_keys(question_ids)
+        submissions = {}
+        for _, student_id, question_id, nonce, answer, submitted_at in rows_to_insert:
+            sub = Submission(
+                student_id=student_id,
+                question_id=question_id,
+                client_nonce=nonce,
+                answer_text=answer,
+                submitted_at=datetime.fromisoformat(submitted_at),
+                minhash=fingerprint(answer, question_types[question_id]),
+            )
+            if question_id in keys:
+                autograde(sub, keys[question_id])
+            # A form resent before the first copy was flushed is spooled
+            # twice; the unique constraint keeps one, so count one
+            submissions.setdefault((student_id, question_id, nonce), sub)
+        with transaction.atomic():
+            # Rows already delivered by an earlier, interrupted flush must not
+            # be counted on the leaderboard twice
+            delivered = set(
+                Submission.objects.filter(
+                    client_nonce__in={key[2] for key in submissions}
+                ).values_list('student_id', 'question_id', 'client_nonce')
+            )
+            fresh = [sub for key, sub in submissions.items() if key not in delivered]
+            Submission.objects.bulk_create(fresh, ignore_conflicts=True)
+            # Only rows this flush inserted are counted and announced
+            record_grades([(s, False, None) for s in fresh if s.graded])
+            publish_new(fresh)
+        # bulk_create skips the post_save that normally notes new answers
+        note_new_submissions()
+        # Only forget rows once the main database has committed them
+        self.ack(rows[-1][0])
+        return len(rows)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_spool = None
+
+
+def get_spool():
+    global _spool
+    if _spool is None:
+        _spool = SubmissionSpool()
+    return _spool
+
+
+def accept_submission(student, question, answer_text, client_nonce=''):
+    """Record an answer, either directly or through the spool, per ``SUBMISSION_INGEST_MODE``."""
+    if INGEST_MODE == 'spool':
+        get_spool().enqueue(student.pk, question.pk, answer_text, client_nonce)
+        return
+    submission = Submission(
+        question=question, student=student, answer_text=answer_text,
+        minhash=fingerprint(answer_text, question.question_type),
+    )
+    key = answer_key_for(question)
+    if key:
+        autograde(submission, key)
+    submission.client_nonce = client_nonce
+    try:
+        with transaction.atomic():
+            submission.save()
+            if submission.graded:
+                record_grade(submission, False, None)
+    except IntegrityError:
+        # A resent form: the nonce constraint kept the first copy
+        if not client_nonce:
+            raise
@@ -0,0 +1,237 @@
+"""
+Item response theory (IRT) parameters for adaptive tests.
+
+Under the three-parameter logistic model (3PL) a student of ability
+``theta`` answers a question correctly with probability
+
+    P(theta) = c + (1 - c) / (1 + exp(-a (theta - b)))
+
+where ``b`` is the question's difficulty on the ability scale, ``a`` its
+discrimination (how sharply P rises around ``b``) and ``c`` the chance of
+guessing right. ``c`` is not estimated. It is fixed by the question type:
+one over the number of options for multiple choice, 0.5 for true/false and
+0 otherwise. Estimating it takes far more answers than a question in this
+bank usually has. With ``CAT_IRT_MODEL = '2pl'`` it is 0 throughout.
+
+``manage.py calibrate_items`` estimates ``a`` and ``b`` from every graded
+answer. It uses each student's latest answer per question, counted correct
+when it scored at least half marks. The method is marginal maximum
+likelihood with the Bock-Aitkin EM algorithm: abilities are integrated out
+over a fixed grid of quadrature nodes under a standard normal prior.
+
+* The E-step computes each student's posterior weight at every node, then
+  the expected number of answers and of correct answers per question and
+  node.
+* The M-step takes Fisher scoring steps for all questions at once.
+
+Each step is a couple of ``bincount`` passes over the answer arrays per
+node. There is no Python loop over answers or questions.
+
+Abilities are per student and subject, so a student strong in one subject
+and weak in another is not forced onto one scale. Weak normal priors keep
+estimates finite for questions everyone gets right (or wrong): ``a`` is
+pulled towards 1, and ``b`` towards the question's easy / medium / hard
+label. Questions with fewer than ``IRT_MIN_RESPONSES`` answers get no
+``ItemParameters`` row; adaptive tests use their label defaults instead.
+"""
+import time
+from contextlib import nullcontext
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from online_exam_backend.routers import REPLICA, reads_from, replica_configured
+from .item_analysis import FETCH_SIZE, latest_answers, load_responses
+from .models import ItemParameters, Question
+
+
+MODEL = getattr(settings, 'CAT_IRT_MODEL', '3pl')
+MIN_RESPONSES = getattr(settings, 'IRT_MIN_RESPONSES', 20)
+PARAMS_VERSION_KEY = 'irt:params_version'
+BATCH_SIZE = 1000
+
+# Difficulty assumed from the label until a question is calibrated
+LABEL_DIFFICULTY = {'easy': -1.0, 'medium': 0.0, 'hard': 1.0}
+
+# Quadrature nodes and standard normal weights for the ability integral
+NODES = np.linspace(-4.0, 4.0, 31)
+WEIGHTS = np.exp(-NODES ** 2 / 2)
+WEIGHTS /= WEIGHTS.sum()
+
+# Priors: a ~ N(1, 1), intercept ~ N(-b of the label, 2)
+A_PRIOR_SD = 1.0
+INTERCEPT_PRIOR_SD = 2.0
+A_RANGE = (0.05, 4.0)
+INTERCEPT_LIMIT = 15.0
+MAX_STEP = 1.0
+M_STEPS = 2
+MAX_ITERATIONS = 200
+TOLERANCE = 1e-3
+EPS = 1e-9
+
+
+def params_version():
+    version = cache.get(PARAMS_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(PARAMS_VERSION_KEY, version, None)
+    return version
+
+
+def bump_params_version():
+    try:
+        cache.incr(PARAMS_VERSION_KEY)
+    except ValueError:
+        cache.set(PARAMS_VERSION_KEY, 2, None)
+
+
+def guessing(question_type, choices):
+    """The fixed ``c`` of a question: the chance of a blind guess being right."""
+    if MODEL == '2pl':
+        return 0.0
+    if question_type == 'true_false':
+        return 0.5
+    if question_type == 'multiple_choice' and len(choices or ()) >= 2:
+        return 1.0 / len(choices)
+    return 0.0
+
+
+def _probability(theta, a, d, c):
+    return np.clip(c + (1 - c) / (1 + np.exp(-(a * theta + d))), EPS, 1 - EPS)
+
+
+def _fisher_step(n, r, a, d, c, d_prior):
+    """One penalized Fisher scoring step for every item's slope ``a`` and intercept ``d``."""
+    x = NODES[:, None]
+    s = 1 / (1 + np.exp(-(a * x + d)))
+    p = np.clip(c + (1 - c) * s, EPS, 1 - EPS)
+    slope = (1 - c) * s * (1 - s)
+    spread = p * (1 - p)
+    score = (r - n * p) * slope / spread
+    weight = n * slope ** 2 / spread
+    grad_a = (score * x).sum(axis=0) - (a - 1) / A_PRIOR_SD ** 2
+    grad_d = score.sum(axis=0) - (d - d_prior) / INTERCEPT_PRIOR_SD ** 2
+    info_aa = (weight * x * x).sum(axis=0) + 1 / A_PRIOR_SD ** 2
+    info_ad = (weight * x).sum(axis=0)
+    info_dd = weight.sum(axis=0) + 1 / INTERCEPT_PRIOR_SD ** 2
+    det = info_aa * info_dd - info_ad ** 2
+    step_a = np.clip((info_dd * grad_a - info_ad * grad_d) / det, -MAX_STEP, MAX_STEP)
+    step_d = np.clip((info_aa * grad_d - info_ad * grad_a) / det, -MAX_STEP, MAX_STEP)
+    return np.clip(a + step_a, *A_RANGE), np.clip(d + step_d, -INTERCEPT_LIMIT, INTERCEPT_LIMIT)
+
+
+def estimate(person, col, correct, prior_b, c, max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE):
+    """
+    EM estimates of ``a`` and ``b`` for every item.
+
+    ``person`` (dense index), ``col`` (item index) and ``correct`` (bool)
+    are parallel arrays with one answer per person and item. ``prior_b``
+    and ``c`` are per item. Returns ``a``, ``b`` and ``responses`` per item,
+    the iterations run and the marginal log-likelihood of the last E-step.
+    """
+    n_items = len(prior_b)
+    n_persons = int(person.max()) + 1 if len(person) else 0
+    a = np.ones(n_items)
+    d_prior = -np.asarray(prior_b, dtype=np.float64)
+    d = d_prior.copy()
+    # Index into [P(wrong) per item, P(right) per item], so one gather per node serves both
+    outcome = col + correct.astype(np.int64) * n_items
+    log_likelihood = 0.0
+
+    for iteration in range(1, max_iterations + 1):
+        p = _probability(NODES[:, None], a, d, c)
+        log_p = np.log(np.concatenate((1 - p, p), axis=1))
+
+        # E-step: each person's log-likelihood at each node, then posterior weights
+        ll = np.empty((len(NODES), n_persons))
+        for q in range(len(NODES)):
+            ll[q] = np.bincount(person, log_p[q, outcome], n_persons)
+        top = ll.max(axis=0) if n_persons else np.zeros(0)
+        posterior = np.exp(ll - top) * WEIGHTS[:, None]
+        total = posterior.sum(axis=0)
+        log_likelihood = float(np.sum(top + np.log(total)))
+        posterior /= total
+
+        # Expected answers (n) and correct answers (r) per node and item
+        n = np.empty((len(NODES), n_items))
+        r = np.empty((len(NODES), n_items))
+        for q in range(len(NODES)):
+            counts = np.bincount(outcome, posterior[q, person], 2 * n_items)
+            r[q] = counts[n_items:]
+            n[q] = counts[:n_items] + r[q]
+
+        # M-step
+        new_a, new_d = a, d
+        for _ in range(M_STEPS):
+            new_a, new_d = _fisher_step(n, r, new_a, new_d, c, d_prior)
+        change = max(np.abs(new_a - a).max(), np.abs(new_d - d).max()) if n_items else 0.0
+        a, d = new_a, new_d
+        if change < tolerance:
+            break
+
+    return {
+        'a': a,
+        'b': -d / a,
+        'responses': np.bincount(col, minlength=n_items),
+        'iterations': iteration,
+        'log_likelihood': log_likelihood,
+    }
+
+
+def calibrate_items(fetch_size=FETCH_SIZE):
+    """Recalibrate ``ItemParameters`` from all graded answers; returns a summary with timings."""
+    started = time.perf_counter()
+    with reads_from(REPLICA) if replica_configured() else nullcontext():
+        items = list(Question.objects.order_by('id').values_list(
+            'id', 'subject_key', 'points', 'difficulty', 'question_type', 'choices'
+        ))
+        ids, students, questions, scores = load_responses(fetch_size)
+    loaded = time.perf_counter()
+
+    item_ids = np.array([item[0] for item in items], dtype=np.int64)
+    item_subjects = np.unique([item[1] for item in items] or [''], return_inverse=True)[1][:len(items)]
+    item_points = np.array([item[2] for item in items], dtype=np.int64)
+    prior_b = np.array([LABEL_DIFFICULTY.get(item[3], 0.0) for item in items])
+    c = np.array([guessing(item[4], item[5]) for item in items])
+
+    student, col, _, normalized = latest_answers(ids, students, questions, scores, item_ids, item_points)
+    n_subjects = int(item_subjects.max()) + 1 if len(items) else 0
+    # One ability per student and subject
+    person = np.unique(student * n_subjects + item_subjects[col], return_inverse=True)[1]
+    result = estimate(person, col, normalized >= 0.5, prior_b, c)
+    estimated = time.perf_counter()
+
+    now = timezone.now()
+    with transaction.atomic():
+        alive = set(Question.objects.values_list('id', flat=True))
+        rows = [
+            ItemParameters(
+                question_id=int(item_ids[i]),
+                a=float(result['a'][i]),
+                b=float(result['b'][i]),
+                c=float(c[i]),
+                responses=int(result['responses'][i]),
+                calibrated_at=now,
+            )
+            for i in np.flatnonzero(result['responses'] >= MIN_RESPONSES)
+            if int(item_ids[i]) in alive
+        ]
+        ItemParameters.objects.all().delete()
+        ItemParameters.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    # Adaptive test pools rebuild with the new parameters
+    bump_params_version()
+
+    return {
+        'submissions': len(ids),
+        'answers': len(col),
+        'abilities': int(person.max()) + 1 if len(person) else 0,
+        'questions': len(rows),
+        'iterations': result['iterations'],
+        'log_likelihood': result['log_likelihood'],
+        'load_seconds': loaded - started,
+        'estimate_seconds': estimated - loaded,
+        'write_seconds': time.perf_counter() - estimated,
+    }
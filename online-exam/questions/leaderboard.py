@@ -0,0 +1,127 @@
+"""
+Incremental maintenance of ``StudentScoreSummary``.
+
+Grading and deleting submissions adjust one summary row in place instead of
+re-aggregating ``Submission``. ``live_aggregate()`` is the ground truth the
+``rebuild_leaderboard`` command rebuilds from and verifies against.
+"""
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Sum
+from django.db.models.functions import Coalesce
+
+from .models import StudentScoreSummary, Submission
+
+
+def _apply(student_id, score_delta, count_delta, graded_at=None, create=True):
+    with transaction.atomic():
+        rows = StudentScoreSummary.objects.select_for_update()
+        if create:
+            summary, _ = rows.get_or_create(student_id=student_id)
+        else:
+            # Removals never create rows: when a student is deleted the
+            # cascade may already have dropped their summary.
+            summary = rows.filter(student_id=student_id).first()
+            if summary is None:
+                return
+        summary.total_score += score_delta
+        summary.graded_count += count_delta
+        summary.avg_score = summary.total_score / summary.graded_count if summary.graded_count else 0.0
+        if graded_at and (summary.last_graded_at is None or graded_at > summary.last_graded_at):
+            summary.last_graded_at = graded_at
+        summary.save()
+
+
+def record_grade(submission, was_graded, previous_score):
+    """Account for ``submission`` having just been graded (or re-graded)."""
+    previous = (previous_score or 0) if was_graded else 0
+    _apply(
+        submission.student_id,
+        score_delta=(submission.score or 0) - previous,
+        count_delta=0 if was_graded else 1,
+        graded_at=submission.graded_at,
+    )
+
+
+def record_grades(changes):
+    """
+    Batch form of ``record_grade`` for ``(submission, was_graded, previous_score)``
+    tuples: deltas are summed per student so each summary row is locked and
+    written once.
+    """
+    deltas = {}
+    for submission, was_graded, previous_score in changes:
+        previous = (previous_score or 0) if was_graded else 0
+        score, count, graded_at = deltas.get(submission.student_id, (0, 0, None))
+        if submission.graded_at and (graded_at is None or submission.graded_at > graded_at):
+            graded_at = submission.graded_at
+        deltas[submission.student_id] = (
+            score + (submission.score or 0) - previous,
+            count + (0 if was_graded else 1),
+            graded_at,
+        )
+    for student_id in sorted(deltas):
+        # Sorted so concurrent batches lock summary rows in the same order
+        score, count, graded_at = deltas[student_id]
+        _apply(student_id, score_delta=score, count_delta=count, graded_at=graded_at)
+
+
+def record_removal(submission):
+    """Take a deleted graded submission back out of its student's totals."""
+    if not submission.graded:
+        return
+    _apply(submission.student_id, score_delta=-(submission.score or 0), count_delta=-1, create=False)
+
+
+def live_aggregate():
+    return (
+        Submission.objects.filter(graded=True)
+        .values('student_id')
+        .annotate(
+            total=Coalesce(Sum('score'), 0),
+            count=Count('id'),
+            avg=Coalesce(Avg('score'), 0.0),
+            last=Max('graded_at'),
+        )
+        .order_by('student_id')
+    )
+
+
+def rebuild_summaries(batch_size=1000):
+    """Replace every summary row with a fresh aggregate; returns rows written."""
+    written = 0
+    with transaction.atomic():
+        StudentScoreSummary.objects.all().delete()
+        batch = []
+        for row in live_aggregate().iterator(chunk_size=batch_size):
+            batch.append(StudentScoreSummary(
+                student_id=row['student_id'],
+                total_score=row['total'],
+                graded_count=row['count'],
+                avg_score=row['avg'],
+                last_graded_at=row['last'],
+            ))
+            if len(batch) >= batch_size:
+                StudentScoreSummary.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            StudentScoreSummary.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def verify_summaries():
+    """Return ``(student_id, expected, actual)`` tuples for rows that disagree."""
+    stored = {
+        s.student_id: (s.total_score, s.graded_count)
+        for s in StudentScoreSummary.objects.filter(graded_count__gt=0).iterator()
+    }
+    mismatches = []
+    for row in live_aggregate().iterator():
+        expected = (row['total'], row['count'])
+        actual = stored.pop(row['student_id'], None)
+        if actual != expected:
+            mismatches.append((row['student_id'], expected, actual))
+    for student_id, actual in stored.items():
+        mismatches.append((student_id, None, actual))
+    return mismatches
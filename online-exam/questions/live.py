@@ -0,0 +1,92 @@
+"""
+Live channel for an exam sitting.
+
+The exam page opens one server-sent event stream per attempt
+(``exam_events``). It carries:
+
+* ``time``: the remaining seconds, on connect and every ``TIME_SYNC``
+  seconds, so the page's local countdown stays in line with the server
+  without polling (it doubles as the keep-alive);
+* ``broadcast``: teacher announcements to everyone sitting the exam; the
+  last few are kept in the cache and replayed on connect;
+* ``end``: the attempt was submitted (maybe from another tab) or its time
+  is up, after which the stream closes.
+
+Events travel through ``questions.events``, so the stream itself never
+queries the database after the attempt is loaded. Served without a
+streaming server (WSGI), the page polls ``exam_status`` every ``TIME_SYNC``
+seconds instead, which carries the same time, announcements and end.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+from .events import get_hub, sse
+
+
+TIME_SYNC = 15
+BROADCAST_HISTORY = 20
+BROADCAST_TTL = 24 * 3600
+
+
+def exam_channel(exam_id):
+    return f'exam:{exam_id}'
+
+
+def attempt_channel(attempt_id):
+    return f'attempt:{attempt_id}'
+
+
+def attempt_status(attempt, now=None):
+    now = now or timezone.now()
+    return {
+        'attempt': attempt.id,
+        'remaining_seconds': attempt.remaining_seconds(now),
+        'deadline': attempt.deadline.isoformat(),
+        'submitted': attempt.submitted_at is not None,
+    }
+
+
+def recent_broadcasts(exam_id):
+    return cache.get(f'exam_broadcasts:{exam_id}', [])
+
+
+async def arecent_broadcasts(exam_id):
+    return await cache.aget(f'exam_broadcasts:{exam_id}', [])
+
+
+def broadcast(exam_id, message, sender):
+    """Send ``message`` to every open stream of the exam and keep it for late joiners."""
+    event = {'type': 'broadcast', 'message': message, 'sender': sender, 'sent_at': timezone.now().isoformat()}
+    key = f'exam_broadcasts:{exam_id}'
+    # Teachers send a handful of these per exam; a lost race only drops
+    # a message from the replay, not from the live streams
+    cache.set(key, (recent_broadcasts(exam_id) + [event])[-BROADCAST_HISTORY:], BROADCAST_TTL)
+    get_hub().publish(exam_channel(exam_id), event)
+
+
+def attempt_ended(attempt_id):
+    get_hub().publish(attempt_channel(attempt_id), {'type': 'end', 'reason': 'submitted'})
+
+
+async def exam_stream(attempt, grace):
+    """Server-sent events for ``attempt`` until it is submitted or ``grace`` seconds past its deadline."""
+    hub = get_hub()
+    # Subscribe before reading the replay so nothing sent in between is missed;
+    # the page drops the odd announcement it gets twice
+    async with hub.subscribe(exam_channel(attempt.exam_id), attempt_channel(attempt.id)) as subscription:
+        replay = await arecent_broadcasts(attempt.exam_id)
+        yield sse('time', attempt_status(attempt))
+        for event in replay:
+            yield sse('broadcast', event)
+        while True:
+            event = await subscription.get(timeout=TIME_SYNC)
+            now = timezone.now()
+            if event is not None:
+                yield sse(event['type'], event)
+                if event['type'] == 'end':
+                    return
+            elif (now - attempt.deadline).total_seconds() > grace:
+                yield sse('end', {'type': 'end', 'reason': 'time'})
+                return
+            else:
+                yield sse('time', attempt_status(attempt, now))
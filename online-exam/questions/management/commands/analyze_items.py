@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from questions.item_analysis import FETCH_SIZE, analyze, compute_question_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute item statistics (facility, discrimination, variance, subject alpha) "
+        "from all graded answers into QuestionStats. --synthetic N times the analysis "
+        "on N generated answers instead, without touching the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fetch-size', type=int, default=FETCH_SIZE)
+        parser.add_argument('--synthetic', type=int, default=0, metavar='N')
+        parser.add_argument('--students', type=int, default=200_000, help='With --synthetic.')
+        parser.add_argument('--questions', type=int, default=5_000, help='With --synthetic.')
+        parser.add_argument('--subjects', type=int, default=20, help='With --synthetic.')
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            return self._synthetic(options)
+        summary = compute_question_stats(fetch_size=options['fetch_size'])
+        self.stdout.write(
+            f"{summary['submissions']} graded submissions ({summary['answers']} latest answers) "
+            f"-> stats for {summary['questions']} questions; load {summary['load_seconds']:.2f}s, "
+            f"analyze {summary['analyze_seconds']:.2f}s, write {summary['write_seconds']:.2f}s"
+        )
+        for subject, alpha in sorted(summary['alpha'].items()):
+            shown = f"{alpha:.3f}" if alpha is not None else "-"
+            self.stdout.write(f"  alpha {subject or '(no subject)'}: {shown}")
+
+    def _synthetic(self, options):
+        # Dichotomous answers from a one-parameter logistic model, so the
+        # statistics have known signs: positive discrimination and alpha
+        rng = np.random.default_rng(0)
+        n, n_students, n_items = options['synthetic'], options['students'], options['questions']
+        ability = rng.normal(size=n_students)
+        difficulty = rng.normal(size=n_items)
+        students = rng.integers(0, n_students, n)
+        questions = rng.integers(0, n_items, n)
+        p = 1 / (1 + np.exp(difficulty[questions] - ability[students]))
+        scores = (rng.random(n) < p).astype(np.float64)
+        item_subjects = rng.integers(0, options['subjects'], n_items)
+        started = time.perf_counter()
+        result = analyze(
+            np.arange(n), students, questions, scores,
+            np.arange(n_items), item_subjects, np.ones(n_items, dtype=np.int64),
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"analyzed {n} answers ({result['answers']} latest) over {n_items} questions "
+            f"in {elapsed:.2f}s; median facility {np.nanmedian(result['facility']):.3f}, "
+            f"median discrimination {np.nanmedian(result['discrimination']):.3f}, "
+            f"alpha {np.nanmin(result['alpha']):.3f}-{np.nanmax(result['alpha']):.3f}"
+        )
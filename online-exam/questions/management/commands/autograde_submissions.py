@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max, Min
+
+from authentication.reports import invalidate_reports
+from questions.autograde import grade_id_range, init_worker, load_answer_keys
+from questions.models import Submission
+
+
+class Command(BaseCommand):
+    help = "Re-grade submissions to objective questions against the current answer keys."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                            help='Worker processes (1 grades in this process).')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Submission ids per task.')
+        parser.add_argument('--include-manual', action='store_true',
+                            help='Also overwrite scores a teacher entered by hand.')
+
+    def handle(self, *args, **options):
+        bounds = Submission.objects.aggregate(lo=Min('id'), hi=Max('id'))
+        if bounds['lo'] is None:
+            self.stdout.write("No submissions.")
+            return
+        chunk = max(1, options['chunk_size'])
+        starts = list(range(bounds['lo'], bounds['hi'] + 1, chunk))
+        stops = [start + chunk for start in starts]
+        include_manual = options['include_manual']
+        workers = max(1, options['workers'])
+
+        started = time.perf_counter()
+        scanned = updated = 0
+        if workers == 1:
+            keys = load_answer_keys()
+            results = (grade_id_range(a, b, include_manual, keys) for a, b in zip(starts, stops))
+            scanned, updated = self._drain(results, len(starts), started)
+        else:
+            # Children must open their own connections rather than share ours
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                results = pool.map(grade_id_range, starts, stops, repeat(include_manual))
+                scanned, updated = self._drain(results, len(starts), started)
+        elapsed = time.perf_counter() - started
+        if updated:
+            invalidate_reports()
+        self.stdout.write(
+            f"Scanned {scanned} objective submissions, updated {updated} in {elapsed:.2f}s "
+            f"({scanned / elapsed if elapsed else 0:.0f} rows/s scanned, "
+            f"{updated / elapsed if elapsed else 0:.0f} rows/s written) "
+            f"using {workers} worker(s) over {len(starts)} chunks."
+        )
+
+    def _drain(self, results, chunks, started):
+        scanned = updated = 0
+        step = max(1, chunks // 10)
+        for done, (s, u) in enumerate(results, start=1):
+            scanned += s
+            updated += u
+            if done % step == 0 and done < chunks:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{done}/{chunks} chunks, {scanned} scanned ({scanned / elapsed:.0f} rows/s)")
+        return scanned, updated
@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from questions.importer import import_questions
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure import throughput (rows/s) on a synthetic CSV or JSONL file. "
+        "Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50_000)
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--batch-sizes', default='100,500,2000')
+        parser.add_argument('--duplicate-ratio', type=float, default=0.05)
+        parser.add_argument('--error-ratio', type=float, default=0.01)
+
+    def handle(self, *args, **options):
+        data = self._generate(options)
+        for batch_size in [int(b) for b in options['batch_sizes'].split(',')]:
+            with transaction.atomic():
+                report = import_questions(io.StringIO(data), fmt=options['format'], batch_size=batch_size)
+                transaction.set_rollback(True)
+            self.stdout.write(f"batch_size={batch_size:<6} {report.summary()}")
+
+    def _generate(self, options):
+        rng = random.Random(7)
+        out = io.StringIO()
+        writer = csv.writer(out) if options['format'] == 'csv' else None
+        if writer:
+            writer.writerow(['question_text', 'subject', 'topic', 'difficulty'])
+        for i in range(options['rows']):
+            n = i
+            if i and rng.random() < options['duplicate_ratio']:
+                n = rng.randrange(i)
+            difficulty = rng.choice(['easy', 'medium', 'hard'])
+            if rng.random() < options['error_ratio']:
+                difficulty = 'impossible'
+            row = [f"Imported question {n}: derive result {n * 7}", 'Algebra', f"Topic {n % 40}", difficulty]
+            if writer:
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(dict(zip(['question_text', 'subject', 'topic', 'difficulty'], row))) + '\n')
+        return out.getvalue()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, transaction
+
+from questions.ingest import SubmissionSpool, new_nonce
+from questions.models import Question, Submission
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare answer ingestion throughput: one INSERT per answer (current path) "
+        "against spool enqueue plus batched flush. Creates and removes its own rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--answers', type=int, default=5000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        students = [
+            User.objects.create_user(
+                username=f'bench_ingest_{i}', email=f'bench_ingest_{i}@example.com', password=None, user_type=3
+            )
+            for i in range(50)
+        ]
+        question = Question.objects.create(question_text='bench_ingest question')
+        try:
+            answers = [(students[i % len(students)].pk, question.pk, f'answer {i}') for i in range(options['answers'])]
+            direct = self._direct(answers, options['threads'])
+            Submission.objects.filter(question=question).delete()
+            accept, flush = self._spool(answers, options['threads'], options['batch_size'])
+            flushed = Submission.objects.filter(question=question).count()
+        finally:
+            Submission.objects.filter(question=question).delete()
+            question.delete()
+            User.objects.filter(pk__in=[s.pk for s in students]).delete()
+
+        n = options['answers']
+        self.stdout.write(f"direct INSERT per answer:  {n / direct:10.0f} answers/s ({direct:.2f}s)")
+        self.stdout.write(f"spool enqueue (request):   {n / accept:10.0f} answers/s ({accept:.2f}s)")
+        self.stdout.write(f"spool flush (worker):      {n / flush:10.0f} answers/s ({flush:.2f}s)")
+        self.stdout.write(f"rows in database after flush: {flushed}")
+
+    def _direct(self, answers, threads):
+        def work(item):
+            student_id, question_id, text = item
+            try:
+                with transaction.atomic():
+                    Submission.objects.create(
+                        student_id=student_id, question_id=question_id, answer_text=text, client_nonce=new_nonce()
+                    )
+            finally:
+                close_old_connections()
+        return self._timed(work, answers, threads if connection.vendor != 'sqlite' else 1)
+
+    def _spool(self, answers, threads, batch_size):
+        path = os.path.join(tempfile.mkdtemp(), 'bench_spool.sqlite3')
+        spool = SubmissionSpool(path)
+
+        def work(item):
+            student_id, question_id, text = item
+            spool.enqueue(student_id, question_id, text, new_nonce())
+        accept = self._timed(work, answers, threads)
+
+        started = time.perf_counter()
+        while spool.flush(batch_size=batch_size):
+            pass
+        flush = time.perf_counter() - started
+        spool.close()
+        return accept, flush
+
+    @staticmethod
+    def _timed(work, items, threads):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(work, items))
+        return time.perf_counter() - started
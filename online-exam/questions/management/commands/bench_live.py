@@ -0,0 +1,138 @@
+import asyncio
+import statistics
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.test import AsyncClient, override_settings
+from django.utils import timezone
+
+from questions.events import get_hub
+from questions.live import broadcast
+from questions.models import Exam, ExamAttempt, ExamQuestion, Question
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the async exam endpoints through the ASGI handler: hold many idle event "
+        "streams open, fan a teacher broadcast out to all of them, and time autosave and "
+        "status requests meanwhile. Creates and removes its own users and exam."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000, help='Students, each holding one open stream.')
+        parser.add_argument('--requests', type=int, default=2000, help='Autosave and status requests to time.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+
+    def handle(self, *args, **options):
+        question_ids = list(Question.objects.order_by('id').values_list('id', flat=True)[:5])
+        if not question_ids:
+            raise CommandError("Needs at least one question in the bank.")
+        User = get_user_model()
+        User.objects.bulk_create([
+            User(username=f'bench_live_{i}', email=f'bench_live_{i}@example.com', user_type=3)
+            for i in range(options['students'])
+        ])
+        students = list(User.objects.filter(username__startswith='bench_live_').order_by('id'))
+        exam = Exam.objects.create(title='bench_live exam', time_limit_minutes=120)
+        ExamQuestion.objects.bulk_create([
+            ExamQuestion(exam=exam, question_id=qid, position=n) for n, qid in enumerate(question_ids, start=1)
+        ])
+        now = timezone.now()
+        ExamAttempt.objects.bulk_create([
+            ExamAttempt(exam=exam, student=s, started_at=now, deadline=now + timezone.timedelta(hours=2))
+            for s in students
+        ])
+        attempts = dict(ExamAttempt.objects.filter(exam=exam).values_list('student_id', 'id'))
+        try:
+            # The test client always sends Host: testserver
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                asyncio.run(self._run(exam, students, attempts, question_ids, options))
+        finally:
+            exam.delete()
+            User.objects.filter(username__startswith='bench_live_').delete()
+
+    async def _run(self, exam, students, attempts, question_ids, options):
+        threads_before = threading.active_count()
+        clients = []
+        for student in students:
+            client = AsyncClient()
+            await client.aforce_login(student)
+            clients.append((client, attempts[student.pk]))
+
+        async def read(response, inbox):
+            async for frame in response.streaming_content:
+                inbox.put_nowait(frame)
+
+        started = time.perf_counter()
+        readers, inboxes = [], []
+        for client, attempt_id in clients:
+            response = await client.get(f'/questions/exams/attempt/{attempt_id}/events/')
+            inbox = asyncio.Queue()
+            readers.append(asyncio.create_task(read(response, inbox)))
+            inboxes.append(inbox)
+            await inbox.get()  # the initial time event
+        opened = time.perf_counter() - started
+        self.stdout.write(
+            f"opened {len(readers)} event streams in {opened:.2f}s; "
+            f"{get_hub().subscriber_count()} channel subscriptions, "
+            f"{threading.active_count()} threads (was {threads_before})"
+        )
+
+        # Fan-out: one broadcast reaches every open stream
+        sent = time.perf_counter()
+        await sync_to_async(broadcast)(exam.id, 'bench_live announcement', 'bench')
+
+        async def announcement(inbox):
+            while b'bench_live announcement' not in await inbox.get():
+                pass
+
+        waiting = [asyncio.ensure_future(announcement(inbox)) for inbox in inboxes]
+        done, pending = await asyncio.wait(waiting, timeout=30)
+        fanout = time.perf_counter() - sent
+        for task in pending:
+            task.cancel()
+        self.stdout.write(f"broadcast reached {len(done)}/{len(readers)} streams in {fanout:.2f}s")
+
+        # Request latency with the streams still open
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        latencies = {'autosave': [], 'status': []}
+
+        async def one(n):
+            client, attempt_id = clients[n % len(clients)]
+            kind = 'autosave' if n % 2 == 0 else 'status'
+            async with semaphore:
+                t0 = time.perf_counter()
+                if kind == 'autosave':
+                    response = await client.post(
+                        f'/questions/exams/attempt/{attempt_id}/autosave/',
+                        {f'answer_{question_ids[n % len(question_ids)]}': f'draft {n}'},
+                    )
+                else:
+                    response = await client.get(f'/questions/exams/attempt/{attempt_id}/status/')
+                latencies[kind].append(time.perf_counter() - t0)
+                if response.status_code != 200:
+                    raise CommandError(f"{kind} returned {response.status_code}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{options['requests']} requests at concurrency {options['concurrency']}: "
+            f"{options['requests'] / elapsed:.0f} req/s"
+        )
+        for kind, values in latencies.items():
+            values.sort()
+            self.stdout.write(
+                f"  {kind:8s} p50 {statistics.median(values) * 1000:6.1f} ms  "
+                f"p95 {values[int(len(values) * 0.95)] * 1000:6.1f} ms"
+            )
+
+        # Cancelling the readers is what a client disconnect does under ASGI
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        self.stdout.write(f"closed; {get_hub().subscriber_count()} channel subscriptions left")
@@ -0,0 +1,86 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from online_exam_backend.staticfiles import build_index
+
+
+BROWSER_ENCODINGS = 'gzip, deflate, br'
+ASSET_URL = re.compile(r'(?:href|src)="(/%s[^"]+)"' % re.escape(settings.STATIC_URL.strip('/') + '/'))
+
+
+class Command(BaseCommand):
+    help = (
+        "Bytes transferred per page view: uncompressed pages re-downloading uncompressed assets, "
+        "against gzipped pages with pre-compressed, immutable assets (first and repeat view). "
+        "Run collectstatic first. Creates and removes its own users. CDN assets are not counted."
+    )
+
+    def handle(self, *args, **options):
+        index = build_index()
+        if not index:
+            raise CommandError(f"Nothing collected in {settings.STATIC_ROOT}; run `manage.py collectstatic` first.")
+        User = get_user_model()
+        student = User.objects.create_user(
+            username='bench_bytes_student', email='bench_bytes_student@example.com', password=None, user_type=3
+        )
+        teacher = User.objects.create_user(
+            username='bench_bytes_teacher', email='bench_bytes_teacher@example.com', password=None, user_type=2
+        )
+        pages = [
+            (None, reverse('login')),
+            (student, reverse('student_dashboard')),
+            (student, reverse('questions_list')),
+            (student, reverse('mock_test')),
+            (teacher, reverse('teacher_dashboard')),
+            (teacher, reverse('submissions_list')),
+            (teacher, reverse('teacher_reports')),
+        ]
+        totals = [0, 0, 0]
+        try:
+            # Hashed asset URLs are rendered with DEBUG off
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost']):
+                self.stdout.write(f"{'page':32s} {'before':>8s} {'first':>8s} {'repeat':>8s}")
+                for user, url in pages:
+                    row = self._page(index, user, url)
+                    self.stdout.write(f"{url:32s} {row[0]:8d} {row[1]:8d} {row[2]:8d}")
+                    for n, value in enumerate(row):
+                        totals[n] += value
+        finally:
+            student.delete()
+            teacher.delete()
+        before, first, repeat = (t / len(pages) for t in totals)
+        self.stdout.write(
+            f"{'mean bytes per view':32s} {before:8.0f} {first:8.0f} {repeat:8.0f} "
+            f"(repeat views {100 * (1 - repeat / before):.0f}% smaller)"
+        )
+
+    def _page(self, index, user, url):
+        client = Client(HTTP_HOST='localhost')
+        if user is not None:
+            client.force_login(user)
+        plain = client.get(url)
+        compressed = client.get(url, HTTP_ACCEPT_ENCODING=BROWSER_ENCODINGS)
+        assert plain.status_code == compressed.status_code == 200, url
+        assets_plain = assets_compressed = 0
+        for asset in set(ASSET_URL.findall(plain.content.decode())):
+            entry = index.get(asset)
+            if entry is None:
+                self.stderr.write(f"{url} links {asset}, which does not exist")
+                continue
+            assets_plain += entry.variants[''][1]
+            _, headers, _ = entry.response('GET', BROWSER_ENCODINGS)
+            assets_compressed += int(dict(headers)['Content-Length'])
+            if 'immutable' not in dict(headers)['Cache-Control']:
+                self.stderr.write(f"{asset} is not fingerprinted; it will be revalidated")
+        # Before: no compression and no cache headers, so every view fetches everything.
+        # After: the first view fetches compressed assets; later ones only the page.
+        return (
+            len(plain.content) + assets_plain,
+            len(compressed.content) + assets_compressed,
+            len(compressed.content),
+        )
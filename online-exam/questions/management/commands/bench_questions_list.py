@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from questions.models import Question
+from questions.pagination import paginate_keyset
+from questions.views import questions_list
+
+
+SUBJECTS = ['Algebra', 'Geometry', 'Physics', 'Chemistry', 'Biology', 'History', 'Python', 'Databases']
+TOPICS = ['Basics', 'Intermediate', 'Advanced', 'Revision', 'Practice', 'Theory']
+DIFFICULTIES = [key for key, _ in Question.DIFFICULTY_CHOICES]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic question bank and report p50/p95 latency of questions_list "
+        "per filter combination. Runs inside a transaction that is rolled back unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded rows instead of rolling back.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._seed(options['rows'], options['batch_size'])
+            self._analyze()
+            self._run(options['iterations'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def _seed(self, rows, batch_size):
+        rng = random.Random(42)
+        started = time.perf_counter()
+        batch = []
+        for i in range(rows):
+            q = Question(
+                question_text=f"Benchmark question {i}: explain concept {rng.randint(0, 10_000)}",
+                subject=rng.choice(SUBJECTS),
+                topic=rng.choice(TOPICS),
+                difficulty=rng.choice(DIFFICULTIES),
+            )
+            q.fill_keys()
+            batch.append(q)
+            if len(batch) >= batch_size:
+                Question.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Question.objects.bulk_create(batch)
+        self.stdout.write(f"Seeded {rows} questions in {time.perf_counter() - started:.1f}s")
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(Question._meta.db_table)}")
+
+    def _run(self, iterations):
+        factory = RequestFactory()
+        combos = [
+            {},
+            {'subject': 'algebra'},
+            {'topic': 'ADVANCED'},
+            {'difficulty': 'hard'},
+            {'subject': 'Physics', 'topic': 'theory'},
+            {'subject': 'Physics', 'difficulty': 'medium'},
+            {'topic': 'Basics', 'difficulty': 'easy'},
+            {'subject': 'Python', 'topic': 'Practice', 'difficulty': 'hard'},
+        ]
+        self.stdout.write(f"{'filters':<50} {'p50 ms':>8} {'p95 ms':>8} {'deep p50':>9}")
+        for params in combos:
+            first = self._time(factory, params, iterations)
+            # Follow next cursors ten pages deep to show latency does not grow with depth
+            deep_params = dict(params)
+            for _ in range(10):
+                page = self._page(deep_params)
+                if not page.has_next:
+                    break
+                deep_params['after'] = page.next_cursor
+            deep = self._time(factory, deep_params, iterations)
+            label = ', '.join(f"{k}={v}" for k, v in params.items()) or '(none)'
+            self.stdout.write(
+                f"{label:<50} {self._pct(first, 50):8.2f} {self._pct(first, 95):8.2f} {self._pct(deep, 50):9.2f}"
+            )
+
+    def _page(self, params):
+        qs = Question.objects.all()
+        if params.get('subject'):
+            qs = qs.filter(subject_key=Question.normalize_key(params['subject']))
+        if params.get('topic'):
+            qs = qs.filter(topic_key=Question.normalize_key(params['topic']))
+        if params.get('difficulty'):
+            qs = qs.filter(difficulty=params['difficulty'])
+        return paginate_keyset(qs, after=params.get('after'))
+
+    def _time(self, factory, params, iterations):
+        samples = []
+        for _ in range(iterations):
+            request = factory.get('/questions/', params)
+            request.user = AnonymousUser()
+            started = time.perf_counter()
+            questions_list(request)
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    @staticmethod
+    def _pct(samples, pct):
+        if len(samples) < 2:
+            return samples[0] if samples else 0.0
+        return statistics.quantiles(samples, n=100)[pct - 1]
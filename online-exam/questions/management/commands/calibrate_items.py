@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from questions.irt import FETCH_SIZE, calibrate_items, estimate
+
+
+class Command(BaseCommand):
+    help = (
+        "Calibrate IRT item parameters (discrimination, difficulty) from all graded answers "
+        "into ItemParameters, for adaptive tests. --synthetic N instead calibrates N answers "
+        "generated from known parameters and reports how well they are recovered, without "
+        "touching the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fetch-size', type=int, default=FETCH_SIZE)
+        parser.add_argument('--synthetic', type=int, default=0, metavar='N')
+        parser.add_argument('--students', type=int, default=20_000, help='With --synthetic.')
+        parser.add_argument('--questions', type=int, default=500, help='With --synthetic.')
+        parser.add_argument('--guessing', type=float, default=0.0, help='With --synthetic: c of every item.')
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            return self._synthetic(options)
+        summary = calibrate_items(fetch_size=options['fetch_size'])
+        self.stdout.write(
+            f"{summary['submissions']} graded submissions ({summary['answers']} latest answers, "
+            f"{summary['abilities']} student/subject abilities) -> parameters for "
+            f"{summary['questions']} questions after {summary['iterations']} EM iterations "
+            f"(log-likelihood {summary['log_likelihood']:.1f}); load {summary['load_seconds']:.2f}s, "
+            f"estimate {summary['estimate_seconds']:.2f}s, write {summary['write_seconds']:.2f}s"
+        )
+
+    def _synthetic(self, options):
+        rng = np.random.default_rng(0)
+        n, n_students, n_items = options['synthetic'], options['students'], options['questions']
+        c = np.full(n_items, options['guessing'])
+        ability = rng.normal(size=n_students)
+        a = rng.lognormal(0.0, 0.3, n_items)
+        b = rng.normal(size=n_items)
+        # Distinct (student, item) pairs, as calibration expects one answer per pair
+        pairs = np.unique(rng.integers(0, n_students * n_items, n))
+        students, items = pairs // n_items, pairs % n_items
+        p = c[items] + (1 - c[items]) / (1 + np.exp(-a[items] * (ability[students] - b[items])))
+        correct = rng.random(len(pairs)) < p
+        started = time.perf_counter()
+        result = estimate(students, items, correct, np.zeros(n_items), c)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"calibrated {len(pairs)} answers over {n_items} questions in {elapsed:.2f}s "
+            f"({result['iterations']} EM iterations)"
+        )
+        for name, true, fitted in (('a', a, result['a']), ('b', b, result['b'])):
+            self.stdout.write(
+                f"  {name}: correlation with the true values {np.corrcoef(true, fitted)[0, 1]:.3f}, "
+                f"RMSE {np.sqrt(np.mean((true - fitted) ** 2)):.3f}"
+            )
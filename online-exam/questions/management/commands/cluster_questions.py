@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from questions.duplicates import THRESHOLD, backfill, duplicate_groups
+from questions.models import Question
+
+
+class Command(BaseCommand):
+    help = "Group near-duplicate questions in the bank and report each group."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                            help='Minimum estimated similarity to link two questions (0-1).')
+        parser.add_argument('--min-size', type=int, default=2, help='Smallest group to report.')
+        parser.add_argument('--limit', type=int, default=50, help='Groups to print (largest first).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        indexed = backfill()
+        if indexed:
+            self.stdout.write(f"Fingerprinted {indexed} questions without a signature.")
+
+        groups = duplicate_groups(threshold=options['threshold'], min_size=options['min_size'])
+        elapsed = time.perf_counter() - started
+        shown = groups[:options['limit']]
+        questions = Question.objects.select_related('author').in_bulk(
+            [qid for group in shown for qid in group]
+        )
+        for number, group in enumerate(shown, start=1):
+            self.stdout.write(f"Group {number} ({len(group)} questions):")
+            for qid in group:
+                q = questions.get(qid)
+                if q is None:
+                    continue
+                author = q.author.username if q.author else '-'
+                text = ' '.join(q.question_text.split())
+                self.stdout.write(f"  #{qid} [{q.subject or '-'}] by {author}: {text[:100]}")
+        redundant = sum(len(g) - 1 for g in groups)
+        self.stdout.write(
+            f"{len(groups)} duplicate groups covering {redundant + len(groups)} questions "
+            f"({redundant} redundant) in {elapsed:.2f}s."
+        )
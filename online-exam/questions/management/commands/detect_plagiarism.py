@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from questions.plagiarism import THRESHOLD, backfill_signatures, candidate_questions, flag_question
+
+
+class Command(BaseCommand):
+    help = "Fingerprint answers that lack a signature and flag near-identical answers per question."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--question', type=int, action='append', dest='questions',
+                            help='Only this question id (repeatable).')
+        parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                            help='Minimum estimated similarity to flag (0-1).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        signed = backfill_signatures(batch_size=options['batch_size'])
+        if signed:
+            self.stdout.write(f"Fingerprinted {signed} submissions in {time.perf_counter() - started:.2f}s.")
+
+        detect_started = time.perf_counter()
+        answers = flags = 0
+        for question_id in options['questions'] or candidate_questions():
+            n, f = flag_question(question_id, threshold=options['threshold'])
+            answers += n
+            flags += f
+            if f:
+                self.stdout.write(f"question {question_id}: {f} flagged pairs among {n} answers")
+        elapsed = time.perf_counter() - detect_started
+        self.stdout.write(
+            f"Compared {answers} answers in {elapsed:.2f}s "
+            f"({answers / elapsed if elapsed else 0:.0f} answers/s); {flags} pairs flagged."
+        )
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from questions.drafts import FLUSH_INTERVAL, get_draft_spool
+
+
+class Command(BaseCommand):
+    help = "Write autosaved exam drafts from the local spool to the database (use --loop to run as a worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Keep flushing instead of exiting when empty.')
+        parser.add_argument('--interval', type=float, default=FLUSH_INTERVAL,
+                            help='Seconds between flushes; saves within one interval collapse to the last.')
+
+    def handle(self, *args, **options):
+        spool = get_draft_spool()
+        total = 0
+        while True:
+            started = time.monotonic()
+            flushed = 0
+            while True:
+                moved = spool.flush(batch_size=options['batch_size'])
+                if not moved:
+                    break
+                flushed += moved
+            total += flushed
+            if flushed:
+                self.stdout.write(f"flushed {flushed} drafts (total {total})")
+            if not options['loop']:
+                break
+            time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
+        self.stdout.write(f"Draft spool empty; {total} drafts flushed.")
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from questions.ingest import get_spool
+
+
+class Command(BaseCommand):
+    help = "Move spooled submissions into the database in bulk batches (use --loop to run as a worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the spool instead of exiting when empty.')
+        parser.add_argument('--interval', type=float, default=0.5, help='Seconds to sleep when the spool is empty.')
+
+    def handle(self, *args, **options):
+        spool = get_spool()
+        total = 0
+        while True:
+            moved = spool.flush(batch_size=options['batch_size'])
+            total += moved
+            if moved:
+                self.stdout.write(f"flushed {moved} (total {total}, pending {spool.pending()})")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(f"Spool empty; {total} submissions flushed.")
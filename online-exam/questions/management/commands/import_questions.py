@@ -0,0 +1,49 @@
+import csv
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from questions.importer import detect_format, import_questions
+
+
+class Command(BaseCommand):
+    help = "Import questions from a CSV (with header) or JSON Lines file using batched bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--author', help='Username to record as the author of imported questions.')
+        parser.add_argument('--report', help='Write rejected rows (line, error) to this CSV file.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and de-duplicate without writing.')
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            try:
+                author = get_user_model().objects.get(username=options['author'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user named {options['author']!r}.")
+        fmt = options['format'] or detect_format(options['path'])
+
+        with open(options['path'], newline='', encoding='utf-8-sig') as fh:
+            report = import_questions(
+                fh, fmt=fmt, author=author,
+                batch_size=options['batch_size'], dry_run=options['dry_run'],
+            )
+
+        if options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as out:
+                writer = csv.writer(out)
+                writer.writerow(['line', 'error'])
+                writer.writerows(report.errors)
+        else:
+            for line, message in report.errors[:20]:
+                self.stderr.write(f"line {line}: {message}")
+            if len(report.errors) > 20:
+                self.stderr.write(f"... {len(report.errors) - 20} more; use --report to save them all")
+        for line, question_id, score in report.near_duplicates[:20]:
+            self.stdout.write(f"line {line}: {score:.0%} similar to question {question_id}")
+        self.stdout.write(report.summary())
+        if report.fatal:
+            raise CommandError(report.fatal)
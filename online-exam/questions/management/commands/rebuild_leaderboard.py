@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from questions.leaderboard import rebuild_summaries, verify_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild StudentScoreSummary from graded submissions and verify it against the live aggregate."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify-only', action='store_true', help='Compare without rebuilding.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            written = rebuild_summaries(batch_size=options['batch_size'])
+            self.stdout.write(f"Rebuilt {written} summary rows.")
+        mismatches = verify_summaries()
+        if mismatches:
+            for student_id, expected, actual in mismatches[:20]:
+                self.stderr.write(f"student {student_id}: expected (total, count)={expected}, stored={actual}")
+            raise CommandError(f"{len(mismatches)} summary rows disagree with the live aggregate.")
+        self.stdout.write(self.style.SUCCESS("Leaderboard summaries match the live aggregate."))
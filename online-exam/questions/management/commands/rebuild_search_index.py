@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from questions.search import get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the question full-text index from the Question table. Needed on SQLite after "
+        "writes that skip signals (bulk_create, raw SQL); PostgreSQL's GIN index needs no rebuild."
+    )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if not backend.needs_sync:
+            self.stdout.write(f"{type(backend).__name__} indexes automatically; nothing to do.")
+            return
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
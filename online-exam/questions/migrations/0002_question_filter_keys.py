@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_filter_keys(apps, schema_editor):
+    Question = apps.get_model('questions', 'Question')
+    batch = []
+    for q in Question.objects.only('id', 'subject', 'topic').iterator(chunk_size=2000):
+        q.subject_key = (q.subject or '').strip().casefold()
+        q.topic_key = (q.topic or '').strip().casefold()
+        batch.append(q)
+        if len(batch) >= 2000:
+            Question.objects.bulk_update(batch, ['subject_key', 'topic_key'])
+            batch = []
+    if batch:
+        Question.objects.bulk_update(batch, ['subject_key', 'topic_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='subject_key',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='topic_key',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_filter_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-created_at', '-id'], name='question_browse_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['subject_key', 'topic_key', 'difficulty', '-created_at', '-id'], name='question_subject_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['topic_key', 'difficulty', '-created_at', '-id'], name='question_topic_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['difficulty', '-created_at', '-id'], name='question_difficulty_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'questions_question_fts'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        # Must match the expression SearchVector('question_text', config='english') compiles to
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS question_text_search_idx ON questions_question "
+            "USING gin (to_tsvector('english'::regconfig, COALESCE(question_text, '')))"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "question_text, tokenize='porter unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, question_text) SELECT id, question_text FROM questions_question"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS question_text_search_idx")
+    elif vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0002_question_filter_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Sum
+
+
+def populate_summaries(apps, schema_editor):
+    Submission = apps.get_model('questions', 'Submission')
+    StudentScoreSummary = apps.get_model('questions', 'StudentScoreSummary')
+    rows = Submission.objects.filter(graded=True).values('student_id').annotate(
+        total=Sum('score'), count=Count('id'), avg=Avg('score'), last=Max('graded_at')
+    ).order_by('student_id')
+    StudentScoreSummary.objects.bulk_create(
+        (
+            StudentScoreSummary(
+                student_id=r['student_id'],
+                total_score=r['total'] or 0,
+                graded_count=r['count'],
+                avg_score=r['avg'] or 0.0,
+                last_graded_at=r['last'],
+            )
+            for r in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('questions', '0003_question_text_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentScoreSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_score', models.IntegerField(default=0)),
+                ('graded_count', models.IntegerField(default=0)),
+                ('avg_score', models.FloatField(default=0.0)),
+                ('last_graded_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_score', 'student'], name='score_summary_rank_idx')],
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:03
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_content_hash(apps, schema_editor):
+    Question = apps.get_model('questions', 'Question')
+    batch = []
+    for q in Question.objects.only('id', 'question_text').iterator(chunk_size=2000):
+        normalized = ' '.join((q.question_text or '').split()).casefold()
+        q.content_hash = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        batch.append(q)
+        if len(batch) >= 2000:
+            Question.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        Question.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0004_student_score_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0008_submission_grading_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='answer_key',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='choices',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='match_regex',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='points',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='question_type',
+            field=models.CharField(choices=[('essay', 'Essay'), ('multiple_choice', 'Multiple Choice'), ('true_false', 'True/False'), ('short_answer', 'Short Answer'), ('fill_blanks', 'Fill in the Blanks'), ('matching', 'Matching'), ('numerical', 'Numerical')], default='essay', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='tolerance',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='auto_graded',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:23
+
+import hashlib
+import random
+import re
+import struct
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# A frozen copy of questions.similarity as of this migration (classic
+# MinHash over word pairs, as Question.fingerprint uses), so the backfill
+# does not depend on application code that may change or move later.
+NUM_PERM = 64
+BANDS = 16
+BAND_BYTES = NUM_PERM // BANDS * 4
+_MASK64 = (1 << 64) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.getrandbits(64) | 1, _rng.getrandbits(64)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r'\w+')
+
+
+def text_signature(text):
+    tokens = _WORD.findall((text or '').casefold())
+    if len(tokens) < 4:
+        return b''
+    hashes = [zlib.crc32(' '.join(tokens[i:i + 2]).encode('utf-8')) for i in range(len(tokens) - 1)]
+    hashes = list(set(hashes))
+    values = [min([((a * h + b) & _MASK64) >> 32 for h in hashes]) for a, b in _PERMUTATIONS]
+    return struct.pack(f'<{NUM_PERM}I', *values)
+
+
+def band_hashes(data):
+    data = bytes(data)
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(bytes([band]) + data[band * BAND_BYTES:(band + 1) * BAND_BYTES], digest_size=8).digest(),
+            'little', signed=True,
+        ))
+        for band in range(BANDS)
+    ]
+
+
+def backfill_fingerprints(apps, schema_editor):
+    Question = apps.get_model('questions', 'Question')
+    QuestionBand = apps.get_model('questions', 'QuestionBand')
+    batch = []
+
+    def flush():
+        Question.objects.bulk_update(batch, ['minhash'])
+        QuestionBand.objects.bulk_create([
+            QuestionBand(question_id=q.id, band=band, bucket=bucket)
+            for q in batch if q.minhash
+            for band, bucket in band_hashes(q.minhash)
+        ])
+
+    for q in Question.objects.only('id', 'question_text').iterator(chunk_size=1000):
+        q.minhash = text_signature(q.question_text)
+        batch.append(q)
+        if len(batch) >= 1000:
+            flush()
+            batch = []
+    if batch:
+        flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0010_plagiarism_flags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='minhash',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='QuestionBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='question_band_bucket_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0013_exam_drafts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='questions.question')),
+                ('responses', models.PositiveIntegerField()),
+                ('facility', models.FloatField()),
+                ('discrimination', models.FloatField(blank=True, null=True)),
+                ('score_variance', models.FloatField()),
+                ('subject_alpha', models.FloatField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0014_question_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemParameters',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='irt', serialize=False, to='questions.question')),
+                ('a', models.FloatField()),
+                ('b', models.FloatField()),
+                ('c', models.FloatField(default=0)),
+                ('responses', models.PositiveIntegerField()),
+                ('calibrated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
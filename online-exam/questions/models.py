@@ -1,5 +1,10 @@
+import hashlib
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+from .similarity import text_signature
 
 class Question(models.Model):
     DIFFICULTY_CHOICES = (
@@ -11,7 +16,37 @@ class Question(models.Model):
     question_text = models.TextField()
     subject = models.CharField(max_length=100, blank=True)
     topic = models.CharField(max_length=100, blank=True)
+    # Case-folded copies of subject/topic so case-insensitive filters are plain
+    # equality lookups that can use the composite indexes below.
+    subject_key = models.CharField(max_length=100, blank=True, editable=False)
+    topic_key = models.CharField(max_length=100, blank=True, editable=False)
+    TYPE_CHOICES = (
+        ("essay", "Essay"),
+        ("multiple_choice", "Multiple Choice"),
+        ("true_false", "True/False"),
+        ("short_answer", "Short Answer"),
+        ("fill_blanks", "Fill in the Blanks"),
+        ("matching", "Matching"),
+        ("numerical", "Numerical"),
+    )
+    # Types with an answer key that ``questions.autograde`` can score
+    OBJECTIVE_TYPES = ("multiple_choice", "true_false", "short_answer", "fill_blanks", "numerical")
+
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default="easy")
+    question_type = models.CharField(max_length=20, choices=TYPE_CHOICES, default="essay")
+    # Answer key: the options for choice questions, the correct option text or
+    # number, or accepted answers one per line (a pattern when match_regex)
+    choices = models.JSONField(default=list, blank=True)
+    answer_key = models.TextField(blank=True)
+    tolerance = models.FloatField(default=0)
+    match_regex = models.BooleanField(default=False)
+    points = models.PositiveIntegerField(default=1)
+    # sha256 of the whitespace-collapsed, case-folded question text, used to
+    # skip exact duplicates on import
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+    # Packed MinHash signature of the text for near-duplicate checks; its LSH
+    # buckets are indexed in QuestionBand (see questions.duplicates)
+    minhash = models.BinaryField(null=True, blank=True, editable=False)
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -22,6 +57,76 @@ class Question(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="question_browse_idx"),
+            models.Index(
+                fields=["subject_key", "topic_key", "difficulty", "-created_at", "-id"],
+                name="question_subject_idx",
+            ),
+            models.Index(
+                fields=["topic_key", "difficulty", "-created_at", "-id"],
+                name="question_topic_idx",
+            ),
+            models.Index(fields=["difficulty", "-created_at", "-id"], name="question_difficulty_idx"),
+        ]
+
+    @property
+    def is_objective(self):
+        return self.question_type in self.OBJECTIVE_TYPES and bool(self.answer_key)
+
+    @staticmethod
+    def normalize_key(value):
+        return (value or "").strip().casefold()
+
+    @staticmethod
+    def hash_text(text):
+        normalized = " ".join((text or "").split()).casefold()
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def fingerprint(text):
+        # Word pairs and classic MinHash rather than the answer defaults:
+        # question stems are short
+        return text_signature(text, min_words=4, size=2, exact=True)
+
+    def fill_keys(self):
+        """Refresh the derived columns (filter keys, content hash, fingerprint).
+
+        ``save()`` calls this; code that bypasses it (``bulk_create``,
+        ``bulk_update``) must call it itself.
+        """
+        self.subject_key = self.normalize_key(self.subject)
+        self.topic_key = self.normalize_key(self.topic)
+        self.content_hash = self.hash_text(self.question_text)
+        self.minhash = self.fingerprint(self.question_text)
+
+    def save(self, *args, **kwargs):
+        self.fill_keys()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if "subject" in update_fields:
+                update_fields.add("subject_key")
+            if "topic" in update_fields:
+                update_fields.add("topic_key")
+            if "question_text" in update_fields:
+                update_fields.update(("content_hash", "minhash"))
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
+
+class QuestionBand(models.Model):
+    """One LSH bucket of a question's MinHash signature."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bucket'], name='question_band_bucket_idx'),
+        ]
+
 
 class Submission(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='submissions')
@@ -30,5 +135,185 @@ class Submission(models.Model):
     graded = models.BooleanField(default=False)
     score = models.IntegerField(null=True, blank=True)
     feedback = models.TextField(blank=True)
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add so spooled submissions keep the time
+    # they were accepted, not the time they were flushed
+    submitted_at = models.DateTimeField(default=timezone.now)
     graded_at = models.DateTimeField(null=True, blank=True)
+    # Set when the score came from the answer key rather than a teacher;
+    # batch re-grading leaves teacher scores alone
+    auto_graded = models.BooleanField(default=False)
+    # Packed MinHash signature of answer_text (see questions.similarity);
+    # empty when too short to compare, NULL when not computed yet
+    minhash = models.BinaryField(null=True, blank=True, editable=False)
+    # Random token sent with the answer form; a resent or re-flushed answer
+    # carries the same nonce and is dropped by the constraint below
+    client_nonce = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        indexes = [
+            # "Already attempted?" lookups for a page of questions
+            models.Index(fields=['student', 'question'], name='submission_student_q_idx'),
+            # Keyset pages of the grading list, unfiltered and by status/question
+            models.Index(fields=['-submitted_at', '-id'], name='submission_recent_idx'),
+            models.Index(fields=['graded', '-submitted_at', '-id'], name='submission_graded_idx'),
+            models.Index(fields=['question', '-submitted_at', '-id'], name='submission_question_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'question', 'client_nonce'],
+                condition=~models.Q(client_nonce=''),
+                name='submission_nonce_unique',
+            ),
+        ]
+
+
+class Exam(models.Model):
+    """An ordered paper of questions with a time limit and an optional window."""
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='authored_exams',
+    )
+    time_limit_minutes = models.PositiveIntegerField(default=60)
+    opens_at = models.DateTimeField(null=True, blank=True)
+    closes_at = models.DateTimeField(null=True, blank=True)
+    questions = models.ManyToManyField(Question, through='ExamQuestion', related_name='exams')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class ExamQuestion(models.Model):
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='items')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['exam', 'question'], name='exam_question_unique'),
+            models.UniqueConstraint(fields=['exam', 'position'], name='exam_position_unique'),
+        ]
+
+
+class ExamAttempt(models.Model):
+    """One student's sitting of an exam; answers become Submissions on submit."""
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='attempts')
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='exam_attempts')
+    started_at = models.DateTimeField(default=timezone.now)
+    # started_at + time limit, cut short by the exam's closing time
+    deadline = models.DateTimeField()
+    submitted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['exam', 'student'], name='exam_attempt_unique'),
+        ]
+
+    def remaining_seconds(self, now=None):
+        now = now or timezone.now()
+        return max(0, int((self.deadline - now).total_seconds()))
+
+
+class ExamDraft(models.Model):
+    """Latest autosaved answer per attempt and question (see ``questions.drafts``)."""
+    attempt = models.ForeignKey(ExamAttempt, on_delete=models.CASCADE, related_name='drafts')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    answer_text = models.TextField()
+    saved_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['attempt', 'question'], name='exam_draft_unique'),
+        ]
+
+
+class StudentScoreSummary(models.Model):
+    """
+    Per-student running totals over graded submissions, kept current by
+    ``questions.leaderboard`` so the leaderboard reads an index instead of
+    aggregating the whole Submission table.
+    """
+    student = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score_summary',
+    )
+    total_score = models.IntegerField(default=0)
+    graded_count = models.IntegerField(default=0)
+    avg_score = models.FloatField(default=0.0)
+    last_graded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_score', 'student'], name='score_summary_rank_idx'),
+        ]
+
+
+class PlagiarismFlag(models.Model):
+    """A pair of answers to the same question whose text is suspiciously similar."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='plagiarism_flags')
+    first = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='+')
+    second = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='+')
+    similarity = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['first', 'second'], name='plagiarism_pair_unique'),
+        ]
+
+
+class QuestionStats(models.Model):
+    """
+    Item analysis of a question over its graded answers, recomputed in bulk
+    by ``manage.py analyze_items`` (see ``questions.item_analysis``).
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    responses = models.PositiveIntegerField()
+    # Mean score as a fraction of the maximum (1.0: everyone got full marks)
+    facility = models.FloatField()
+    # Point-biserial (item-rest) correlation; NULL with too few responses
+    discrimination = models.FloatField(null=True, blank=True)
+    score_variance = models.FloatField()
+    # Cronbach's alpha of the question's subject, repeated on each of its rows
+    subject_alpha = models.FloatField(null=True, blank=True)
+    computed_at = models.DateTimeField()
+
+    # Thresholds for the "check this question" flags shown to teachers
+    EASY = 0.9
+    HARD = 0.2
+    WEAK = 0.2
+    FLAG_MIN_RESPONSES = 10
+
+    @property
+    def flags(self):
+        flags = []
+        if self.responses < self.FLAG_MIN_RESPONSES:
+            return flags
+        if self.facility >= self.EASY:
+            flags.append('too easy')
+        elif self.facility <= self.HARD:
+            flags.append('too hard')
+        if self.discrimination is not None and self.discrimination < self.WEAK:
+            flags.append('weak discrimination')
+        return flags
+
+
+class ItemParameters(models.Model):
+    """
+    IRT parameters of a question, calibrated in bulk by ``manage.py
+    calibrate_items`` (see ``questions.irt``) and used to choose questions
+    in adaptive tests (``questions.adaptive``).
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='irt')
+    # Discrimination, difficulty (on the ability scale) and guessing chance
+    a = models.FloatField()
+    b = models.FloatField()
+    c = models.FloatField(default=0)
+    responses = models.PositiveIntegerField()
+    calibrated_at = models.DateTimeField()
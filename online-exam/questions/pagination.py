@@ -0,0 +1,146 @@
+"""
+Keyset (cursor) pagination over ``(created_at, id)`` (or another timestamp
+field), newest first.
+
+Offset pagination makes the database walk and discard every row before the
+requested page, so deep pages get slower as the bank grows. A keyset cursor
+instead remembers the last row seen and asks for rows strictly "after" it,
+which the ``(-created_at, -id)`` indexes on ``Question`` (and the
+``submitted_at`` ones on ``Submission``) answer with a range scan no matter
+how far the user has paged.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = getattr(settings, 'QUESTIONS_PAGE_SIZE', 25)
+MAX_PAGE_SIZE = getattr(settings, 'QUESTIONS_MAX_PAGE_SIZE', 100)
+
+
+def encode_cursor(obj, field='created_at'):
+    raw = f"{getattr(obj, field).isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, pk)`` for a cursor, or ``None`` if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def page_size_from(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+def paginate_keyset(qs, after=None, before=None, page_size=DEFAULT_PAGE_SIZE, field='created_at'):
+    """
+    Fetch one page of ``qs`` ordered by ``(-<field>, -id)``.
+
+    ``after`` continues past a ``next_cursor``; ``before`` walks back from a
+    ``prev_cursor``. Only ``page_size + 1`` rows are read; the extra row tells
+    us whether another page exists without a ``COUNT(*)``.
+    """
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key and not after_key:
+        value, pk = before_key
+        rows = list(
+            qs.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+            .order_by(field, 'id')[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        if not rows:
+            return KeysetPage([])
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], field),
+            prev_cursor=encode_cursor(rows[0], field) if has_more else None,
+        )
+
+    if after_key:
+        value, pk = after_key
+        qs = qs.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+    rows = list(qs.order_by(f'-{field}', '-id')[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not rows:
+        return KeysetPage([])
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], field) if has_more else None,
+        prev_cursor=encode_cursor(rows[0], field) if after_key else None,
+    )
+
+
+class OffsetPage:
+    """
+    Numbered page for result sets with their own ordering (e.g. search rank),
+    where a ``(created_at, id)`` cursor does not apply. Exposes the same
+    ``has_next``/``has_previous`` names as ``KeysetPage``.
+    """
+
+    def __init__(self, items, number, has_next):
+        self.items = items
+        self.number = number
+        self.has_next = has_next
+        self.has_previous = number > 1
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def next_page_number(self):
+        return self.number + 1
+
+    @property
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def page_number_from(value):
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
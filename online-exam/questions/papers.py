@@ -0,0 +1,165 @@
+"""
+Precomputed exam papers.
+
+Starting an exam serves the whole paper at once, and a class of thousands
+starts at the same minute. The paper is the same for everyone, so it is
+built once per exam version: the ordered questions (without answer keys)
+serialized to JSON, the rendered HTML of the question list, and the window
+and ids the start/submit views need. Serving a start then costs a version
+lookup in the cache plus the attempt row, never a Question query.
+
+Each exam has its own version counter in the cache
+(``exam_paper:<id>:version``); editing the exam, its question list or any
+question on it bumps the counter (``questions.signals``), so old snapshots
+become unreachable without being deleted. Every process also keeps the last
+snapshot it used per exam and reuses it while the version is unchanged,
+which skips unpickling the snapshot on each request.
+
+Only one request rebuilds a missing snapshot (``cache.add`` lock); the others
+wait briefly for it, as in ``authentication.reports``. Unlike reports, a stale
+paper is never served: the new one may differ in questions.
+"""
+import json
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template.loader import render_to_string
+
+from .models import Exam, ExamQuestion
+
+
+PAPER_TTL = getattr(settings, 'EXAM_PAPER_TTL', 24 * 3600)
+LOCK_TIMEOUT = 30
+WAIT_STEP = 0.05
+WAIT_STEPS = 40
+
+_papers = {}
+_papers_lock = threading.Lock()
+
+
+def _version_key(exam_id):
+    return f'exam_paper:{exam_id}:version'
+
+
+def paper_version(exam_id):
+    key = _version_key(exam_id)
+    version = cache.get(key)
+    if version is None:
+        version = 1
+        cache.add(key, version, None)
+    return version
+
+
+def invalidate_paper(exam_id):
+    key = _version_key(exam_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def invalidate_papers_with(question_id):
+    """Invalidate every exam that includes ``question_id``."""
+    for exam_id in ExamQuestion.objects.filter(question_id=question_id).values_list('exam_id', flat=True):
+        invalidate_paper(exam_id)
+
+
+def build_paper(exam_id):
+    """The snapshot dict for ``exam_id``, or ``None`` if there is no such exam."""
+    exam = Exam.objects.filter(id=exam_id).first()
+    if exam is None:
+        return None
+    items = ExamQuestion.objects.filter(exam=exam).select_related('question').order_by('position')
+    questions = [
+        {
+            'id': item.question_id,
+            'number': number,
+            'text': item.question.question_text,
+            'type': item.question.question_type,
+            'choices': item.question.choices or [],
+            'points': item.question.points,
+            'subject': item.question.subject,
+        }
+        for number, item in enumerate(items, start=1)
+    ]
+    info = {
+        'id': exam.id,
+        'title': exam.title,
+        'description': exam.description,
+        'time_limit_minutes': exam.time_limit_minutes,
+        'opens_at': exam.opens_at,
+        'closes_at': exam.closes_at,
+        'total_points': sum(q['points'] for q in questions),
+    }
+    return {
+        'exam': info,
+        'question_ids': [q['id'] for q in questions],
+        'json': json.dumps({'exam': info, 'questions': questions}, cls=DjangoJSONEncoder),
+        'html': render_to_string('questions/_exam_paper.html', {'questions': questions}),
+    }
+
+
+def get_paper(exam_id):
+    """The current snapshot of ``exam_id`` (see ``build_paper``)."""
+    version = paper_version(exam_id)
+    local = _papers.get(exam_id)
+    if local is not None and local[0] == version:
+        return local[1]
+
+    key = f'exam_paper:{exam_id}:v{version}'
+    paper = cache.get(key)
+    if paper is None:
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, LOCK_TIMEOUT):
+            try:
+                paper = build_paper(exam_id)
+                if paper is not None:
+                    cache.set(key, paper, PAPER_TTL)
+            finally:
+                cache.delete(lock_key)
+        else:
+            for _ in range(WAIT_STEPS):
+                time.sleep(WAIT_STEP)
+                paper = cache.get(key)
+                if paper is not None:
+                    break
+            else:
+                paper = build_paper(exam_id)
+    if paper is not None:
+        with _papers_lock:
+            _papers[exam_id] = (version, paper)
+    return paper
+
+
+async def aget_paper(exam_id):
+    """``get_paper`` for async views: the common case is one cache read on the event loop."""
+    version = await cache.aget(_version_key(exam_id))
+    local = _papers.get(exam_id)
+    if version is not None and local is not None and local[0] == version:
+        return local[1]
+    return await sync_to_async(get_paper)(exam_id)
+
+
+def window_error(paper, now):
+    """Why the exam in ``paper`` cannot be started at ``now``, or ``None``."""
+    info = paper['exam']
+    if info['opens_at'] and now < info['opens_at']:
+        return 'This exam has not opened yet.'
+    if info['closes_at'] and now >= info['closes_at']:
+        return 'This exam is closed.'
+    if not paper['question_ids']:
+        return 'This exam has no questions yet.'
+    return None
+
+
+def attempt_deadline(paper, started_at):
+    info = paper['exam']
+    deadline = started_at + timedelta(minutes=info['time_limit_minutes'])
+    if info['closes_at']:
+        deadline = min(deadline, info['closes_at'])
+    return deadline
@@ -0,0 +1,111 @@
+"""
+Copied-answer detection.
+
+Each submission's ``answer_text`` is fingerprinted with a MinHash signature
+(``questions.similarity``) when it is accepted. ``detect_plagiarism`` then
+fills in any missing signatures and, one question at a time, buckets the
+signatures with LSH to find pairs at or above the similarity threshold,
+replacing that question's ``PlagiarismFlag`` rows. Work per question is
+linear in its number of answers rather than quadratic. A student's own
+answers (a resubmission, or an edit) are never paired with each other.
+
+Objective questions are skipped: matching correct answers are expected there.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .models import PlagiarismFlag, Question, Submission
+from .similarity import similar_pairs, text_signature
+
+
+THRESHOLD = getattr(settings, 'PLAGIARISM_THRESHOLD', 0.7)
+# Shorter answers share too many phrases by chance to be worth comparing
+MIN_WORDS = 8
+
+
+def fingerprint(answer_text, question_type):
+    if question_type in Question.OBJECTIVE_TYPES:
+        return b''
+    return text_signature(answer_text, MIN_WORDS)
+
+
+def backfill_signatures(batch_size=1000):
+    """Compute signatures for submissions that have none; returns the count."""
+    table = connection.ops.quote_name(Submission._meta.db_table)
+    sql = f'UPDATE {table} SET {connection.ops.quote_name("minhash")} = %s WHERE id = %s'
+    done = 0
+    while True:
+        rows = list(
+            Submission.objects.filter(minhash__isnull=True)
+            .order_by('id')
+            .values_list('id', 'answer_text', 'question__question_type')[:batch_size]
+        )
+        if not rows:
+            return done
+        # One prepared statement for the batch; bulk_update would build a
+        # CASE branch per row for what is a plain per-row value
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, [(fingerprint(text, kind), pk) for pk, text, kind in rows])
+        done += len(rows)
+
+
+def candidate_questions():
+    """Ids of non-objective questions with fingerprinted answers from at least two students."""
+    return list(
+        Submission.objects.exclude(question__question_type__in=Question.OBJECTIVE_TYPES)
+        .exclude(minhash=None)
+        .values('question_id')
+        .annotate(n=Count('student_id', distinct=True))
+        .filter(n__gte=2)
+        .order_by('question_id')
+        .values_list('question_id', flat=True)
+    )
+
+
+def flag_question(question_id, threshold=THRESHOLD):
+    """Re-run detection for one question; returns ``(answers, flags)``."""
+    rows = (
+        Submission.objects.filter(question_id=question_id)
+        .exclude(minhash=None)
+        .values_list('id', 'student_id', 'minhash')
+    )
+    items, owner = [], {}
+    for pk, student_id, minhash in rows.iterator(chunk_size=2000):
+        items.append((pk, minhash))
+        owner[pk] = student_id
+    flags = [
+        PlagiarismFlag(question_id=question_id, first_id=a, second_id=b, similarity=score)
+        for a, b, score in similar_pairs(items, threshold)
+        if owner[a] != owner[b]
+    ]
+    with transaction.atomic():
+        PlagiarismFlag.objects.filter(question_id=question_id).delete()
+        PlagiarismFlag.objects.bulk_create(flags, batch_size=1000)
+    return len(items), len(flags)
+
+
+def flags_for(submission_ids):
+    """Map each id in ``submission_ids`` to ``[(other_id, similarity), ...]``, most similar first."""
+    result = defaultdict(list)
+    flags = PlagiarismFlag.objects.filter(
+        Q(first_id__in=submission_ids) | Q(second_id__in=submission_ids)
+    ).values_list('first_id', 'second_id', 'similarity')
+    wanted = set(submission_ids)
+    for first, second, score in flags:
+        if first in wanted:
+            result[first].append((second, score))
+        if second in wanted:
+            result[second].append((first, score))
+    for matches in result.values():
+        matches.sort(key=lambda m: -m[1])
+    return result
+
+
+def flagged_filter():
+    """``Q`` matching submissions that are part of at least one flagged pair."""
+    return Q(Exists(PlagiarismFlag.objects.filter(first=OuterRef('pk')))) | Q(
+        Exists(PlagiarismFlag.objects.filter(second=OuterRef('pk')))
+    )
@@ -0,0 +1,176 @@
+"""
+Live grading progress for teachers.
+
+Instead of re-running the dashboard query on every refresh, teachers keep
+one event stream open (``grading_events``) and get what changed:
+
+* ``submitted``: the newest rows (at most ``LATEST`` per event) and the
+  running totals;
+* ``graded``: new scores for existing rows and the running totals;
+* ``removed``: deleted rows and the running totals.
+
+The totals (submissions, graded) are counters in the cache, seeded from the
+database once and then moved by each change, so every event carries the
+current figures and a dropped event cannot leave a page off by some amount.
+
+Changes are published after their transaction commits: new and deleted
+rows through signals (``questions.signals``), and explicitly from the paths that
+bypass signals (the spool flush, batch grading, the auto-grade job, manual
+grading). Events travel over ``questions.events``, so they reach teachers
+connected to any process that shares the cache. Served without a streaming
+server (WSGI), the dashboard polls ``grading_snapshot`` instead.
+"""
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from .events import get_hub, sse
+from .models import Question, Submission
+
+
+CHANNEL = 'grading'
+LATEST = 10
+# Score updates carried per event; a bigger batch only refreshes the totals
+MAX_GRADED_ROWS = 200
+HEARTBEAT = 15
+# A stream sends at most one frame per this many seconds, merging what arrived
+COALESCE = 0.5
+
+_COUNTERS = {
+    'submitted': lambda: Submission.objects.count(),
+    'graded': lambda: Submission.objects.filter(graded=True).count(),
+}
+
+
+def _bump(name, delta):
+    key = f'grading:{name}'
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # First use (or evicted): start from the database, which already
+        # includes this change since we run after commit
+        cache.add(key, _COUNTERS[name](), None)
+        return cache.get(key)
+
+
+def progress_counts():
+    """``{'submitted', 'graded', 'pending'}`` from the cache counters."""
+    submitted, graded = _bump('submitted', 0), _bump('graded', 0)
+    return {'submitted': submitted, 'graded': graded, 'pending': max(0, submitted - graded)}
+
+
+def _totals(submitted=0, graded=0):
+    submitted, graded = _bump('submitted', submitted), _bump('graded', graded)
+    return {'submitted': submitted, 'graded': graded, 'pending': max(0, submitted - graded)}
+
+
+def _rows(submissions):
+    """Dashboard rows for ``submissions``, loading names only for those not already cached."""
+    usernames, questions = {}, {}
+    for sub in submissions:
+        if Submission.student.is_cached(sub):
+            usernames[sub.student_id] = sub.student.username
+        if Submission.question.is_cached(sub):
+            questions[sub.question_id] = sub.question
+    missing = {s.student_id for s in submissions} - set(usernames)
+    if missing:
+        usernames.update(get_user_model().objects.filter(id__in=missing).values_list('id', 'username'))
+    missing = {s.question_id for s in submissions} - set(questions)
+    if missing:
+        questions.update(Question.objects.only('subject', 'topic').in_bulk(missing))
+    rows = []
+    for sub in submissions:
+        question = questions.get(sub.question_id)
+        row = {
+            'student': usernames.get(sub.student_id, ''),
+            'subject': question.subject if question else '',
+            'topic': question.topic if question else '',
+            'score': sub.score if sub.graded else None,
+            'submitted_at': sub.submitted_at,
+        }
+        # Rows from bulk_create(ignore_conflicts=True) come back without an
+        # id; the page adds them without one rather than under a wrong one
+        if sub.id is not None:
+            row['id'] = sub.id
+        rows.append(row)
+    return rows
+
+
+def grading_snapshot():
+    """The newest rows and the totals, for a dashboard that polls instead of streaming."""
+    latest = Submission.objects.select_related('student', 'question').order_by('-submitted_at', '-id')[:LATEST]
+    return {'rows': _rows(list(latest)), 'totals': progress_counts()}
+
+
+def publish_new(submissions):
+    """Announce newly created ``submissions`` once the transaction commits."""
+    submissions = list(submissions)
+    if not submissions:
+        return
+
+    def send():
+        newest = sorted(submissions, key=lambda s: s.submitted_at)[-LATEST:][::-1]
+        get_hub().publish(CHANNEL, {
+            'type': 'submitted',
+            'rows': _rows(newest),
+            'totals': _totals(submitted=len(submissions), graded=sum(1 for s in submissions if s.graded)),
+        })
+    transaction.on_commit(send)
+
+
+def publish_graded(changes):
+    """Announce ``(submission, was_graded, previous_score)`` grading changes once committed."""
+    changes = list(changes)
+    if not changes:
+        return
+
+    def send():
+        get_hub().publish(CHANNEL, {
+            'type': 'graded',
+            'rows': [{'id': sub.id, 'score': sub.score} for sub, _, _ in changes[:MAX_GRADED_ROWS]],
+            'totals': _totals(graded=sum(1 for _, was_graded, _ in changes if not was_graded)),
+        })
+    transaction.on_commit(send)
+
+
+def publish_removed(submission):
+    def send():
+        get_hub().publish(CHANNEL, {
+            'type': 'removed',
+            'rows': [{'id': submission.id}],
+            'totals': _totals(submitted=-1, graded=-1 if submission.graded else 0),
+        })
+    transaction.on_commit(send)
+
+
+def _merge(events):
+    """Fold a burst of events into one frame per type, newest rows first."""
+    merged = {}
+    for event in events:
+        frame = merged.setdefault(event['type'], {'type': event['type'], 'rows': []})
+        frame['rows'] = (event['rows'] + frame['rows']) if event['type'] == 'submitted' else frame['rows'] + event['rows']
+        frame['totals'] = event['totals']
+    if 'submitted' in merged:
+        merged['submitted']['rows'] = merged['submitted']['rows'][:LATEST]
+    if 'graded' in merged:
+        merged['graded']['rows'] = merged['graded']['rows'][-MAX_GRADED_ROWS:]
+    return list(merged.values())
+
+
+async def grading_stream():
+    async with get_hub().subscribe(CHANNEL) as subscription:
+        yield ': connected\n\n'
+        while True:
+            event = await subscription.get(timeout=HEARTBEAT)
+            if event is None:
+                yield ': keep-alive\n\n'
+                continue
+            # During an exam submissions arrive in bursts; send them as one frame
+            await asyncio.sleep(COALESCE)
+            events = [event]
+            while not subscription.queue.empty():
+                events.append(subscription.queue.get_nowait())
+            for frame in _merge(events):
+                yield sse(frame['type'], frame)
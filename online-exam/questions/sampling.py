@@ -0,0 +1,195 @@
+"""
+Random question sampling for mock tests.
+
+Drawing ``k`` questions must not cost O(bank size) per student. Each stratum
+(subject, topic, difficulty) keeps a sorted ``array('q')`` of its question ids
+in process memory; a draw picks ``k`` positions with ``random.sample`` over a
+``range`` (O(k) time and memory) and loads just those rows.
+
+The arrays are rebuilt when the pool version in the cache changes (bumped by
+the Question signals) or after ``QUESTION_POOL_TTL`` seconds, which also
+covers writes that skip signals such as ``bulk_create``. With a shared cache
+backend every process sees the same version.
+
+The strata come from query parameters, so a process keeps at most
+``QUESTION_POOL_CACHE_SIZE`` arrays and drops the least recently used one
+when a new stratum is loaded.
+"""
+import hashlib
+import random
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Question
+
+
+POOL_VERSION_KEY = 'questions:pool_version'
+POOL_TTL = getattr(settings, 'QUESTION_POOL_TTL', 300)
+MAX_DRAW = getattr(settings, 'MOCK_TEST_MAX_QUESTIONS', 50)
+POOL_CACHE_SIZE = getattr(settings, 'QUESTION_POOL_CACHE_SIZE', 128)
+
+
+class PoolCache:
+    """
+    Per-process pools keyed by stratum, each valid for one version and at
+    most ``POOL_TTL`` seconds; beyond ``size`` entries the least recently
+    used is dropped. ``load(key)`` builds a missing pool, under a lock so
+    concurrent misses load it once.
+    """
+
+    def __init__(self, load, size=POOL_CACHE_SIZE):
+        self.load = load
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _fresh(self, key, version, now):
+        entry = self.entries.get(key)
+        if entry and entry[0] == version and now - entry[1] < POOL_TTL:
+            return entry[2]
+        return None
+
+    def get(self, key, version):
+        now = time.monotonic()
+        pool = self._fresh(key, version, now)
+        if pool is not None:
+            try:
+                self.entries.move_to_end(key)
+            except KeyError:  # evicted by another thread meanwhile
+                pass
+            return pool
+        with self.lock:
+            pool = self._fresh(key, version, now)
+            if pool is None:
+                pool = self.load(key)
+                self.entries[key] = (version, now, pool)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+            return pool
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class Stratum:
+    def __init__(self, count, subject='', topic='', difficulty=''):
+        self.count = count
+        self.subject = Question.normalize_key(subject)
+        self.topic = Question.normalize_key(topic)
+        self.difficulty = difficulty or ''
+
+    @property
+    def key(self):
+        return (self.subject, self.topic, self.difficulty)
+
+    def __str__(self):
+        return f"{self.count}:{self.subject}/{self.topic}/{self.difficulty or '*'}"
+
+
+def pool_version():
+    version = cache.get(POOL_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(POOL_VERSION_KEY, version, None)
+    return version
+
+
+def bump_pool_version():
+    try:
+        cache.incr(POOL_VERSION_KEY)
+    except ValueError:
+        cache.set(POOL_VERSION_KEY, 2, None)
+
+
+def question_count():
+    """Size of the whole bank, cached until the next pool version bump."""
+    key = f'questions:count:v{pool_version()}'
+    count = cache.get(key)
+    if count is None:
+        count = Question.objects.count()
+        cache.set(key, count, POOL_TTL)
+    return count
+
+
+def _load_ids(key):
+    subject, topic, difficulty = key
+    qs = Question.objects.all()
+    if subject:
+        qs = qs.filter(subject_key=subject)
+    if topic:
+        qs = qs.filter(topic_key=topic)
+    if difficulty:
+        qs = qs.filter(difficulty=difficulty)
+    return array('q', qs.order_by('id').values_list('id', flat=True).iterator(chunk_size=10000))
+
+
+_pools = PoolCache(_load_ids)
+
+
+def get_pool(key):
+    return _pools.get(key, pool_version())
+
+
+def student_seed(student_id, strata, attempt=0):
+    """Stable seed so reloading the page shows the same paper for the same attempt."""
+    spec = '|'.join(str(s) for s in strata)
+    raw = f"{settings.SECRET_KEY}:{student_id}:{attempt}:{spec}"
+    return int.from_bytes(hashlib.sha256(raw.encode()).digest()[:8], 'big')
+
+
+def sample_ids(strata, seed=None):
+    """Draw question ids for each stratum without replacement, in draw order."""
+    rng = random.Random(seed)
+    picked = []
+    seen = set()
+    for stratum in strata:
+        pool = get_pool(stratum.key)
+        want = min(stratum.count, len(pool))
+        for index in rng.sample(range(len(pool)), want):
+            qid = pool[index]
+            # Strata can overlap (e.g. "Algebra" and "Algebra/hard"); skip repeats
+            if qid not in seen:
+                seen.add(qid)
+                picked.append(qid)
+    return picked
+
+
+def sample_questions(strata, seed=None):
+    ids = sample_ids(strata, seed=seed)
+    by_id = Question.objects.in_bulk(ids)
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def strata_from_params(params, default_count=5):
+    """
+    Build strata from query parameters, e.g. ``?subject=Algebra&easy=3&hard=2``
+    for "3 easy and 2 hard questions in Algebra". Without per-difficulty
+    counts, ``count`` (default 5) questions of any difficulty are drawn.
+    """
+    subject = params.get('subject', '')
+    topic = params.get('topic', '')
+    strata = []
+    budget = MAX_DRAW
+    for difficulty, _ in Question.DIFFICULTY_CHOICES:
+        try:
+            count = int(params.get(difficulty) or 0)
+        except ValueError:
+            count = 0
+        count = max(0, min(count, budget))
+        if count:
+            strata.append(Stratum(count, subject, topic, difficulty))
+            budget -= count
+    if not strata:
+        try:
+            count = int(params.get('count') or default_count)
+        except ValueError:
+            count = default_count
+        strata.append(Stratum(max(1, min(count, MAX_DRAW)), subject, topic))
+    return strata
@@ -0,0 +1,206 @@
+"""
+Ranked full-text search over ``Question.question_text``.
+
+One API, three backends picked from the active database:
+
+- PostgreSQL: ``to_tsvector('english', question_text)`` matched against a
+  GIN expression index (created in migration 0003), ranked with ``ts_rank``
+  and highlighted with ``ts_headline``.
+- SQLite (``USE_SQLITE=1``): an FTS5 virtual table ``questions_question_fts``
+  keyed by question id, kept in sync by the signals in ``questions.signals``
+  and ranked with ``bm25()``.
+- Anything else: ``icontains`` with Python-side highlighting, so the page keeps
+  working on a database without full-text support.
+
+``search_questions(qs, text, limit, offset)`` returns a list of ``Question``
+objects from ``qs`` with ``rank`` and ``headline`` attributes. ``headline`` is
+HTML-escaped text with matches wrapped in ``<mark>``.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+from .models import Question
+
+
+FTS_TABLE = 'questions_question_fts'
+PG_CONFIG = 'english'
+
+# Sentinels that cannot appear in question text; swapped for <mark> after escaping
+_START = '\x02'
+_STOP = '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text or '')[:16]
+
+
+def _mark(text):
+    return escape(text).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+class BaseSearchBackend:
+    # Whether rows must be pushed to a side index on save/delete
+    needs_sync = False
+
+    def search(self, qs, text, limit, offset=0):
+        raise NotImplementedError
+
+    def index_question(self, question):
+        pass
+
+    def index_questions(self, questions):
+        """Index rows written without signals, e.g. by ``bulk_create``."""
+        for question in questions:
+            self.index_question(question)
+
+    def remove_question(self, question_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    def search(self, qs, text, limit, offset=0):
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        for token in tokens:
+            qs = qs.filter(question_text__icontains=token)
+        pattern = re.compile('|'.join(re.escape(t) for t in tokens), re.IGNORECASE)
+        results = list(qs.order_by('-created_at', '-id')[offset:offset + limit])
+        for q in results:
+            q.rank = 0.0
+            q.headline = _mark(pattern.sub(lambda m: f'{_START}{m.group(0)}{_STOP}', q.question_text))
+        return results
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    def _query(self, tokens):
+        from django.contrib.postgres.search import SearchQuery
+
+        # Every token must match; the last one is a prefix so results
+        # narrow as the user types.
+        terms = [f"'{t}'" for t in tokens]
+        terms[-1] += ':*'
+        return SearchQuery(' & '.join(terms), config=PG_CONFIG, search_type='raw')
+
+    def search(self, qs, text, limit, offset=0):
+        from django.contrib.postgres.search import SearchHeadline, SearchRank, SearchVector
+
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        vector = SearchVector('question_text', config=PG_CONFIG)
+        query = self._query(tokens)
+        qs = (
+            qs.alias(search=vector)
+            .filter(search=query)
+            .annotate(
+                rank=SearchRank(vector, query),
+                headline=SearchHeadline(
+                    'question_text', query, config=PG_CONFIG,
+                    start_sel=_START, stop_sel=_STOP, highlight_all=True,
+                ),
+            )
+            .order_by('-rank', '-created_at', '-id')
+        )
+        results = list(qs[offset:offset + limit])
+        for q in results:
+            q.headline = _mark(q.headline)
+        return results
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    needs_sync = True
+
+    def _match(self, tokens):
+        # Quote every token so FTS5 query syntax in user input is inert
+        terms = [f'"{t}"' for t in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, qs, text, limit, offset=0):
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        where = ''
+        inner_params = ()
+        # Only restrict to the filtered ids when there are filters; an
+        # unfiltered IN (SELECT id ...) would materialise the whole table.
+        # The unary + keeps SQLite from handing the IN list to FTS5 as
+        # per-rowid lookups, each of which would re-run the MATCH.
+        if qs.query.has_filters():
+            inner_sql, inner_params = qs.values('id').query.sql_with_params()
+            where = f" AND +rowid IN ({inner_sql})"
+        sql = (
+            f"SELECT rowid, bm25({FTS_TABLE}) AS rank, "
+            f"highlight({FTS_TABLE}, 0, %s, %s) "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s{where} "
+            f"ORDER BY rank, rowid DESC LIMIT %s OFFSET %s"
+        )
+        params = [_START, _STOP, self._match(tokens), *inner_params, limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            hits = cursor.fetchall()
+        by_id = Question.objects.in_bulk([row[0] for row in hits])
+        results = []
+        for pk, rank, headline in hits:
+            q = by_id.get(pk)
+            if q is None:
+                continue
+            # bm25() is "lower is better"; flip it so callers can sort descending
+            q.rank = -rank
+            q.headline = _mark(headline)
+            results.append(q)
+        return results
+
+    def index_question(self, question):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [question.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, question_text) VALUES (%s, %s)",
+                [question.pk, question.question_text],
+            )
+
+    def index_questions(self, questions):
+        rows = [(q.pk, q.question_text) for q in questions]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, question_text) VALUES (%s, %s)", rows
+            )
+
+    def remove_question(self, question_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [question_id])
+
+    def rebuild(self):
+        table = Question._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, question_text) SELECT id, question_text FROM {table}"
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+
+_BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteFTSBackend,
+}
+
+
+def get_backend():
+    path = getattr(settings, 'QUESTION_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    return _BACKENDS.get(connection.vendor, SimpleSearchBackend)()
+
+
+def search_questions(qs, text, limit, offset=0):
+    return get_backend().search(qs, text, limit, offset)
@@ -0,0 +1,73 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .duplicates import index_question
+from .leaderboard import record_removal
+from .models import Exam, ExamQuestion, Question, Submission
+from .papers import invalidate_paper, invalidate_papers_with
+from .progress import publish_new, publish_removed
+from .sampling import bump_pool_version
+from .search import get_backend
+
+
+@receiver(post_save, sender=Question)
+def index_question_text(sender, instance, **kwargs):
+    backend = get_backend()
+    if backend.needs_sync:
+        backend.index_question(instance)
+
+
+@receiver(post_save, sender=Question)
+def index_question_fingerprint(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'minhash' in update_fields:
+        index_question(instance)
+
+
+@receiver(post_delete, sender=Question)
+def unindex_question_text(sender, instance, **kwargs):
+    backend = get_backend()
+    if backend.needs_sync:
+        backend.remove_question(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_pools(sender, instance, **kwargs):
+    bump_pool_version()
+
+
+@receiver(post_save, sender=Question)
+def invalidate_exam_papers(sender, instance, created=False, **kwargs):
+    # Deleted questions leave their exams through the ExamQuestion cascade
+    if not created:
+        invalidate_papers_with(instance.pk)
+
+
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+def invalidate_exam_paper(sender, instance, **kwargs):
+    invalidate_paper(instance.pk)
+
+
+@receiver(post_save, sender=ExamQuestion)
+@receiver(post_delete, sender=ExamQuestion)
+def invalidate_exam_item(sender, instance, **kwargs):
+    invalidate_paper(instance.exam_id)
+
+
+@receiver(post_delete, sender=Submission)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    record_removal(instance)
+
+
+@receiver(post_save, sender=Submission)
+def announce_submission(sender, instance, created=False, **kwargs):
+    # Grading changes are announced by the code that grades (it knows the
+    # previous state); see questions.progress
+    if created:
+        publish_new([instance])
+
+
+@receiver(post_delete, sender=Submission)
+def announce_removal(sender, instance, **kwargs):
+    publish_removed(instance)
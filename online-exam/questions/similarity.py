@@ -0,0 +1,172 @@
+"""
+MinHash signatures and LSH banding for near-duplicate text.
+
+Text is reduced to a set of hashed word shingles and signed with one
+permutation hashing: each shingle hash is mixed once, its top bits pick one
+of ``NUM_PERM`` bins and each bin keeps the minimum of the next 32 bits of
+the hashes that land in it (empty bins borrow from the next filled one,
+"rotation densification"). That costs one multiply per shingle instead of
+one per shingle per permutation, and the fraction of equal positions in two
+signatures still estimates the Jaccard similarity of the shingle sets.
+Texts with far fewer shingles than bins (question stems) get noisy
+estimates that way, so they use classic MinHash with ``NUM_PERM``
+independent multiply-shift hashes instead (``exact=True``). Only compare
+signatures made the same way.
+Signatures are stored packed (``NUM_PERM`` little-endian uint32, see
+``pack``) so they fit a ``BinaryField``; an empty value means the text was
+too short to fingerprint.
+
+Candidate pairs come from banding: the signature is cut into ``BANDS`` bands
+of ``ROWS`` values and two texts are candidates when any band is identical,
+which finds pairs above roughly ``(1 / BANDS) ** (1 / ROWS)`` similarity
+without comparing every pair. Candidates are then checked against the
+requested threshold using the full signature.
+
+Hashing is deterministic (crc32 and fixed constants, never ``hash()``), so
+signatures computed by different processes or releases can be compared as
+long as the constants stay put.
+"""
+import hashlib
+import random
+import re
+import struct
+import zlib
+from collections import defaultdict
+from itertools import combinations
+
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+_MASK = 0xFFFFFFFF
+_MASK64 = (1 << 64) - 1
+_MIX = 0x9E3779B97F4A7C15
+_BIN_SHIFT = 64 - (NUM_PERM - 1).bit_length()
+# Added per bin of distance when borrowing, so borrowed values differ from real ones
+_OFFSET = 0x9E3779B9
+_EMPTY = 1 << 32
+_rng = random.Random(0x5EED)
+# Odd multipliers and offsets for the multiply-shift hash family
+_PERMUTATIONS = [(_rng.getrandbits(64) | 1, _rng.getrandbits(64)) for _ in range(NUM_PERM)]
+_FORMAT = struct.Struct(f'<{NUM_PERM}I')
+_BAND_BYTES = ROWS * 4
+
+_WORD = re.compile(r'\w+')
+
+
+def words(text):
+    return _WORD.findall((text or '').casefold())
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Set of crc32 hashes of the ``size``-word shingles of ``text``."""
+    tokens = words(text)
+    if len(tokens) < size:
+        return set()
+    return {
+        zlib.crc32(' '.join(tokens[i:i + size]).encode('utf-8'))
+        for i in range(len(tokens) - size + 1)
+    }
+
+
+def signature(hashes):
+    if not hashes:
+        return None
+    bins = [_EMPTY] * NUM_PERM
+    for h in hashes:
+        mixed = (h * _MIX) & _MASK64
+        index = mixed >> _BIN_SHIFT
+        value = (mixed >> (_BIN_SHIFT - 32)) & _MASK
+        if value < bins[index]:
+            bins[index] = value
+    result = []
+    for i, value in enumerate(bins):
+        distance = 0
+        while value == _EMPTY:
+            distance += 1
+            value = bins[(i + distance) % NUM_PERM]
+        result.append((value + distance * _OFFSET) & _MASK)
+    return result
+
+
+def exact_signature(hashes):
+    if not hashes:
+        return None
+    hashes = list(hashes)
+    return [min([((a * h + b) & _MASK64) >> 32 for h in hashes]) for a, b in _PERMUTATIONS]
+
+
+def pack(values):
+    return _FORMAT.pack(*values) if values else b''
+
+
+def unpack(data):
+    return _FORMAT.unpack(bytes(data))
+
+
+def text_signature(text, min_words=SHINGLE_SIZE, size=SHINGLE_SIZE, exact=False):
+    """Packed signature of ``text``, or ``b''`` when it has fewer than ``min_words`` words."""
+    if len(words(text)) < max(min_words, size):
+        return b''
+    sign = exact_signature if exact else signature
+    return pack(sign(shingles(text, size)))
+
+
+def estimate(a, b):
+    """Estimated Jaccard similarity of two unpacked signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def band_keys(data):
+    """The ``(band, bytes)`` bucket keys of a packed signature."""
+    data = bytes(data)
+    return [(i, data[i * _BAND_BYTES:(i + 1) * _BAND_BYTES]) for i in range(BANDS)]
+
+
+def band_hashes(data):
+    """
+    ``(band, int64)`` pairs for storing a signature's buckets in an indexed
+    column. The band number is part of the hash, so a bucket value alone
+    identifies the band it came from.
+    """
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(bytes([band]) + key, digest_size=8).digest(), 'little', signed=True
+        ))
+        for band, key in band_keys(data)
+    ]
+
+
+def similar_pairs(items, threshold):
+    """
+    Yield ``(id_a, id_b, similarity)`` with ``id_a < id_b`` for every pair of
+    ``(id, packed_signature)`` items whose estimated similarity is at least
+    ``threshold``. Items with an empty signature are ignored.
+    """
+    buckets = defaultdict(list)
+    signatures = {}
+    for item_id, data in items:
+        if not data:
+            continue
+        signatures[item_id] = data
+        for key in band_keys(data):
+            buckets[key].append(item_id)
+
+    seen = set()
+    unpacked = {}
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for a, b in combinations(sorted(members), 2):
+            if (a, b) in seen:
+                continue
+            seen.add((a, b))
+            if a not in unpacked:
+                unpacked[a] = unpack(signatures[a])
+            if b not in unpacked:
+                unpacked[b] = unpack(signatures[b])
+            score = estimate(unpacked[a], unpacked[b])
+            if score >= threshold:
+                yield a, b, score
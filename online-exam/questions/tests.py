@@ -1,3 +1,1119 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from . import adaptive, drafts, papers, sampling
+from .autograde import AnswerKey, answer_fields_from_post, is_correct
+from .drafts import DraftSpool, load_drafts, save_drafts
+from .filters import filtered_submissions
+from .grading import apply_grades, parse_grades
+from .ingest import SubmissionSpool, accept_submission
+from .item_analysis import analyze, compute_question_stats
+from .irt import LABEL_DIFFICULTY, MAX_ITERATIONS, estimate
+from .leaderboard import verify_summaries
+from .live import broadcast
+from .models import (
+    Exam, ExamAttempt, ExamDraft, ExamQuestion, PlagiarismFlag, Question, QuestionStats, StudentScoreSummary,
+    Submission,
+)
+from .pagination import decode_cursor, encode_cursor, page_size_from, paginate_keyset
+from .papers import get_paper
+from .plagiarism import candidate_questions, fingerprint, flag_question
+from .sampling import Stratum, get_pool, sample_ids, sample_questions, strata_from_params
+from .search import SimpleSearchBackend, get_backend
+from .similarity import band_hashes
+
+
+class ExamAttemptPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher = CustomUser.objects.create_user(
+            username='exam_teacher', email='exam_teacher@example.com', password=None, user_type=2
+        )
+        self.student = CustomUser.objects.create_user(
+            username='exam_student', email='exam_student@example.com', password=None, user_type=3
+        )
+        self.exam = Exam.objects.create(title='Midterm', author=teacher, time_limit_minutes=30)
+        question = Question.objects.create(question_text='What is 2 + 2?', subject='Maths')
+        ExamQuestion.objects.create(exam=self.exam, question=question, position=1)
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.student)
+
+    def test_attempt_page_renders_live_script_once(self):
+        response = self.client.post(reverse('start_exam', args=[self.exam.id]))
+        response = self.client.get(response.url)
+        self.assertEqual(response.status_code, 200)
+        html = response.content.decode()
+        self.assertContains(response, 'What is 2 + 2?')
+        self.assertEqual(html.count('new EventSource('), 1)
+        # Bootstrap, the drafts, autosave and the live countdown
+        self.assertEqual(html.count('<script'), 4)
+        self.assertLess(len(response.content), 50_000)
+
+    def test_wsgi_attempt_polls_instead_of_streaming(self):
+        response = self.client.post(reverse('start_exam', args=[self.exam.id]))
+        self.assertContains(self.client.get(response.url), 'const LIVE = false')
+        attempt = self.exam.attempts.get()
+        # The stream cannot be served here: answered at once, not held open
+        self.assertEqual(self.client.get(reverse('exam_events', args=[attempt.id])).status_code, 204)
+        broadcast(self.exam.id, 'Ten minutes left', 'exam_teacher')
+        status = self.client.get(reverse('exam_status', args=[attempt.id])).json()
+        self.assertFalse(status['submitted'])
+        self.assertEqual([b['message'] for b in status['broadcasts']], ['Ten minutes left'])
+
+
+class SubmissionSpoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool = SubmissionSpool(os.path.join(directory.name, 'spool.sqlite3'))
+        self.addCleanup(self.spool.close)
+        self.student = CustomUser.objects.create_user(
+            username='spool_student', email='spool_student@example.com', password=None, user_type=3
+        )
+        self.question = Question.objects.create(
+            question_text='Is water wet?', question_type='true_false',
+            choices=['True', 'False'], answer_key='True', points=2,
+        )
+
+    def test_resent_answer_in_one_batch_counts_once(self):
+        self.spool.enqueue(self.student.id, self.question.id, 'True', client_nonce='resent')
+        self.spool.enqueue(self.student.id, self.question.id, 'True', client_nonce='resent')
+        self.assertEqual(self.spool.flush(), 2)
+        self.assertEqual(self.spool.pending(), 0)
+        self.assertEqual(Submission.objects.filter(student=self.student).count(), 1)
+        summary = StudentScoreSummary.objects.get(student=self.student)
+        self.assertEqual((summary.total_score, summary.graded_count), (2, 1))
+
+    def test_flush_announces_only_new_rows(self):
+        self.spool.enqueue(self.student.id, self.question.id, 'True', client_nonce='old')
+        with mock.patch.object(self.spool, 'ack'):
+            self.spool.flush()
+        self.spool.enqueue(self.student.id, self.question.id, 'False', client_nonce='new')
+        self.spool.enqueue(self.student.id, self.question.id, 'False', client_nonce='new')
+        with mock.patch('questions.progress.get_hub') as hub, self.captureOnCommitCallbacks(execute=True):
+            self.spool.flush()
+        event = hub.return_value.publish.call_args.args[1]
+        self.assertEqual(event['type'], 'submitted')
+        self.assertEqual([row['score'] for row in event['rows']], [0])
+        self.assertNotIn('id', event['rows'][0])
+        self.assertEqual(event['totals']['submitted'], 2)
+
+    def test_spool_is_durable_wal(self):
+        self.assertEqual(self.spool._connection().execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.spool.enqueue_many([
+            (self.student.id, self.question.id, 'True', ''),
+            (self.student.id, self.question.id, 'False', ''),
+        ])
+        reopened = SubmissionSpool(self.spool.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.pending(), 2)
+        # Each row got its own nonce
+        self.assertEqual(len({row[3] for row in reopened.peek(10)}), 2)
+
+    def test_rows_are_kept_until_the_database_commits(self):
+        self.spool.enqueue(self.student.id, self.question.id, 'True')
+        with mock.patch('questions.ingest.record_grades', side_effect=RuntimeError('database went away')):
+            with self.assertRaises(RuntimeError):
+                self.spool.flush()
+        self.assertEqual(self.spool.pending(), 1)
+        self.assertFalse(Submission.objects.exists())
+        self.assertEqual(self.spool.flush(), 1)
+        self.assertEqual(Submission.objects.count(), 1)
+
+    def test_interrupted_flush_is_not_counted_twice(self):
+        self.spool.enqueue(self.student.id, self.question.id, 'True', client_nonce='a')
+        self.spool.enqueue(self.student.id, self.question.id, 'False', client_nonce='b')
+        # A crash after the commit but before the spool was told
+        with mock.patch.object(self.spool, 'ack'):
+            self.spool.flush()
+        self.assertEqual(self.spool.pending(), 2)
+        self.spool.enqueue(self.student.id, self.question.id, 'True', client_nonce='c')
+        self.assertEqual(self.spool.flush(), 3)
+        self.assertEqual(self.spool.pending(), 0)
+        self.assertEqual(Submission.objects.count(), 3)
+        summary = StudentScoreSummary.objects.get(student=self.student)
+        self.assertEqual((summary.total_score, summary.graded_count), (4, 3))
+
+    def test_answers_to_deleted_questions_are_dropped(self):
+        doomed = Question.objects.create(question_text='Deleted while spooled')
+        self.spool.enqueue(self.student.id, doomed.id, 'Gone')
+        self.spool.enqueue(self.student.id, self.question.id, 'True')
+        doomed.delete()
+        self.assertEqual(self.spool.flush(), 2)
+        self.assertEqual(list(Submission.objects.values_list('question_id', flat=True)), [self.question.id])
+
+    def test_command_empties_the_spool(self):
+        self.spool.enqueue_many([(self.student.id, self.question.id, 'True', '')] * 3)
+        with mock.patch('questions.ingest._spool', self.spool):
+            call_command('flush_submission_spool', batch_size=2, stdout=StringIO())
+        self.assertEqual(self.spool.pending(), 0)
+        self.assertEqual(Submission.objects.count(), 3)
+
+    def test_nonce_is_unique_per_student_and_question(self):
+        Submission.objects.create(question=self.question, student=self.student, answer_text='a', client_nonce='n')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Submission.objects.create(question=self.question, student=self.student, answer_text='b', client_nonce='n')
+        # Blank nonces (answers from before nonces existed) do not collide
+        Submission.objects.create(question=self.question, student=self.student, answer_text='c')
+        Submission.objects.create(question=self.question, student=self.student, answer_text='d')
+        self.assertEqual(Submission.objects.count(), 3)
+
+    def test_resent_direct_answer_is_dropped(self):
+        accept_submission(self.student, self.question, 'True', client_nonce='form')
+        accept_submission(self.student, self.question, 'True', client_nonce='form')
+        self.assertEqual(Submission.objects.count(), 1)
+        self.assertEqual(StudentScoreSummary.objects.get(student=self.student).graded_count, 1)
+
+
+class PlagiarismTests(TestCase):
+    ANSWER = 'The mitochondria is the powerhouse of the cell because it turns food into usable energy'
+
+    def setUp(self):
+        self.question = Question.objects.create(question_text='What do mitochondria do?', question_type='essay')
+        self.alice, self.bob = (
+            CustomUser.objects.create_user(
+                username=name, email=f'{name}@example.com', password=None, user_type=3
+            )
+            for name in ('plag_alice', 'plag_bob')
+        )
+
+    def answer(self, student, text=ANSWER):
+        return Submission.objects.create(
+            question=self.question, student=student, answer_text=text, minhash=fingerprint(text, 'essay'),
+        )
+
+    def test_own_resubmission_is_not_flagged(self):
+        self.answer(self.alice)
+        self.answer(self.alice)
+        self.assertEqual(candidate_questions(), [])
+        self.assertEqual(flag_question(self.question.id), (2, 0))
+
+    def test_copied_answer_is_flagged(self):
+        first = self.answer(self.alice)
+        second = self.answer(self.alice)
+        copied = self.answer(self.bob)
+        self.assertEqual(candidate_questions(), [self.question.id])
+        self.assertEqual(flag_question(self.question.id), (3, 2))
+        pairs = set(PlagiarismFlag.objects.values_list('first_id', 'second_id'))
+        self.assertEqual(pairs, {(first.id, copied.id), (second.id, copied.id)})
+
+
+class KeysetPaginationTests(TestCase):
+    def make_questions(self, n, same_time=False):
+        start = timezone.now()
+        questions = []
+        for i in range(n):
+            question = Question.objects.create(question_text=f'Question {i}')
+            # created_at is auto_now_add; set it afterwards
+            created_at = start if same_time else start + timedelta(minutes=i)
+            Question.objects.filter(pk=question.pk).update(created_at=created_at)
+            question.created_at = created_at
+            questions.append(question)
+        return questions
+
+    def walk(self, page_size):
+        ids, page = [], paginate_keyset(Question.objects.all(), page_size=page_size)
+        self.assertFalse(page.has_previous)
+        while True:
+            ids.append([q.id for q in page])
+            if not page.has_next:
+                return ids, page
+            page = paginate_keyset(Question.objects.all(), after=page.next_cursor, page_size=page_size)
+            self.assertTrue(page.has_previous)
+
+    def test_pages_split_at_page_size(self):
+        questions = self.make_questions(5)
+        pages, last = self.walk(2)
+        newest_first = [q.id for q in reversed(questions)]
+        self.assertEqual(pages, [newest_first[0:2], newest_first[2:4], newest_first[4:]])
+        back = paginate_keyset(Question.objects.all(), before=last.prev_cursor, page_size=2)
+        self.assertEqual([q.id for q in back], newest_first[2:4])
+        self.assertTrue(back.has_previous)
+
+    def test_exact_multiple_has_no_empty_last_page(self):
+        self.make_questions(4)
+        pages, _ = self.walk(2)
+        self.assertEqual([len(p) for p in pages], [2, 2])
+
+    def test_equal_timestamps_break_ties_by_id(self):
+        questions = self.make_questions(5, same_time=True)
+        pages, last = self.walk(2)
+        self.assertEqual(sum(pages, []), sorted((q.id for q in questions), reverse=True))
+        back = paginate_keyset(Question.objects.all(), before=last.prev_cursor, page_size=2)
+        self.assertEqual([q.id for q in back], pages[1])
+
+    def test_cursor_round_trip(self):
+        question = self.make_questions(1)[0]
+        self.assertEqual(decode_cursor(encode_cursor(question)), (question.created_at, question.pk))
+        for malformed in ('', 'not base64!', encode_cursor(question)[:-3]):
+            self.assertIsNone(decode_cursor(malformed))
+
+    def test_page_size_is_clamped(self):
+        self.assertEqual(page_size_from(None), 25)
+        self.assertEqual(page_size_from('abc'), 25)
+        self.assertEqual(page_size_from('0'), 1)
+        self.assertEqual(page_size_from('10000'), 100)
+
+    def test_subject_filter_ignores_case_and_spacing(self):
+        Question.objects.create(question_text='Folded', subject=' Maths ', topic='Algebra')
+        Question.objects.create(question_text='Other subject', subject='History')
+        client = Client(HTTP_HOST='localhost')
+        response = client.get(reverse('questions_list'), {'subject': 'MATHS', 'topic': 'algebra'})
+        self.assertContains(response, 'Folded')
+        self.assertNotContains(response, 'Other subject')
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = CustomUser.objects.create_user(
+            username='board_teacher', email='board_teacher@example.com', password=None, user_type=2
+        )
+        self.alice, self.bob = (
+            CustomUser.objects.create_user(
+                username=name, email=f'{name}@example.com', password=None, user_type=3
+            )
+            for name in ('board_alice', 'board_bob')
+        )
+        self.questions = [Question.objects.create(question_text=f'Essay {i}') for i in range(3)]
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.teacher)
+
+    def submit(self, student, question):
+        return Submission.objects.create(question=question, student=student, answer_text='An answer')
+
+    def grade(self, submission, score):
+        self.client.post(reverse('grade_submission', args=[submission.id]), {'score': score})
+
+    def totals(self):
+        return {
+            s.student_id: (s.total_score, s.graded_count, s.avg_score)
+            for s in StudentScoreSummary.objects.filter(graded_count__gt=0)
+        }
+
+    def test_regrade_replaces_the_previous_score(self):
+        sub = self.submit(self.alice, self.questions[0])
+        self.grade(sub, 4)
+        self.grade(sub, 7)
+        self.assertEqual(self.totals(), {self.alice.id: (7, 1, 7.0)})
+
+    def test_batch_regrade_replaces_previous_scores(self):
+        first, second = self.submit(self.alice, self.questions[0]), self.submit(self.alice, self.questions[1])
+        apply_grades({first.id: (3, ''), second.id: (5, '')})
+        apply_grades({first.id: (6, ''), second.id: (5, '')})
+        self.assertEqual(self.totals(), {self.alice.id: (11, 2, 5.5)})
+
+    def test_delete_takes_the_score_back_out(self):
+        graded, ungraded = self.submit(self.alice, self.questions[0]), self.submit(self.alice, self.questions[1])
+        kept = self.submit(self.alice, self.questions[2])
+        apply_grades({graded.id: (4, ''), kept.id: (2, '')})
+        # Deletes go through the signal with the stored row, as in a cascade
+        Submission.objects.filter(pk=ungraded.pk).delete()
+        self.assertEqual(self.totals(), {self.alice.id: (6, 2, 3.0)})
+        Submission.objects.filter(pk=graded.pk).delete()
+        self.assertEqual(self.totals(), {self.alice.id: (2, 1, 2.0)})
+        self.questions[2].delete()
+        self.assertEqual(self.totals(), {})
+
+    def test_rebuild_matches_incremental_summaries(self):
+        subs = [self.submit(student, q) for student in (self.alice, self.bob) for q in self.questions]
+        apply_grades({sub.id: (i + 1, '') for i, sub in enumerate(subs)})
+        self.grade(subs[0], 9)
+        Submission.objects.filter(pk=subs[4].pk).delete()
+        self.assertEqual(verify_summaries(), [])
+        incremental = self.totals()
+        call_command('rebuild_leaderboard', stdout=StringIO())
+        self.assertEqual(self.totals(), incremental)
+
+    def test_verify_reports_drift(self):
+        sub = self.submit(self.bob, self.questions[0])
+        apply_grades({sub.id: (3, '')})
+        StudentScoreSummary.objects.filter(student=self.bob).update(total_score=30)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_leaderboard', '--verify-only', stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_leaderboard', stdout=StringIO())
+        self.assertEqual(self.totals(), {self.bob.id: (3, 1, 3.0)})
+
+
+class SubmissionFilterTests(TestCase):
+    def setUp(self):
+        teacher = CustomUser.objects.create_user(
+            username='filter_teacher', email='filter_teacher@example.com', password=None, user_type=2
+        )
+        student = CustomUser.objects.create_user(
+            username='filter_student', email='filter_student@example.com', password=None, user_type=3
+        )
+        question = Question.objects.create(question_text='Explain', subject='Biology')
+        self.old = Submission.objects.create(
+            question=question, student=student, answer_text='old', submitted_at=timezone.now() - timedelta(days=10)
+        )
+        self.new = Submission.objects.create(question=question, student=student, answer_text='new')
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(teacher)
+
+    def test_date_range(self):
+        since = (timezone.now() - timedelta(days=2)).date().isoformat()
+        self.assertEqual(list(filtered_submissions({'from': since})), [self.new])
+        self.assertEqual(list(filtered_submissions({'to': since})), [self.old])
+
+    def test_impossible_dates_are_ignored(self):
+        for value in ('2020-13-45', '2021-02-30', 'yesterday'):
+            self.assertEqual(filtered_submissions({'from': value, 'to': value}).count(), 2)
+        response = self.client.get(reverse('submissions_list'), {'from': '2020-13-45'})
+        self.assertEqual(response.status_code, 200)
+        # The export streams from the replica; the filters are applied before that
+        response = self.client.get(reverse('export_performance_csv'), {'to': '2020-13-45'})
+        self.assertEqual(response.status_code, 200)
+
+
+class ImportQuestionsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = CustomUser.objects.create_user(
+            username='import_teacher', email='import_teacher@example.com', password=None, user_type=2
+        )
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.teacher)
+
+    def upload(self, content, name='questions.csv'):
+        return self.client.post(reverse('import_questions'), {'file': SimpleUploadedFile(name, content)})
+
+    def test_good_file(self):
+        response = self.upload(
+            b'question_text,subject,topic,difficulty\n'
+            b'What is 2 + 2?,Maths,Arithmetic,easy\n'
+            b'Name a noble gas.,Chemistry,Elements,medium\n'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['report'].created, 2)
+        self.assertIsNone(response.context['error'])
+        self.assertEqual(
+            set(Question.objects.values_list('subject', flat=True)), {'Maths', 'Chemistry'}
+        )
+
+    def test_bad_row_is_reported_and_the_rest_imported(self):
+        response = self.upload(
+            b'question_text,subject,topic,difficulty\n'
+            b'What is 2 + 2?,Maths,Arithmetic,trivial\n'
+            b'Name a noble gas.,Chemistry,Elements,medium\n'
+        )
+        report = response.context['report']
+        self.assertEqual(report.created, 1)
+        self.assertEqual([line for line, _ in report.errors], [2])
+        self.assertFalse(Question.objects.filter(subject='Maths').exists())
+
+    def test_bad_encoding_is_a_form_error(self):
+        response = self.upload(
+            'question_text,subject,topic,difficulty\n'
+            'Qu’est-ce qu’un caf\xe9 ?,French,Vocabulary,easy\n'.encode('cp1252')
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('not UTF-8', response.context['error'])
+        self.assertContains(response, 'not UTF-8')
+        self.assertFalse(Question.objects.exists())
+
+    def test_broken_csv_is_a_form_error(self):
+        # An unterminated quote swallows the rest of the file into one field,
+        # which trips the csv module's field size limit.
+        response = self.upload(b'question_text,subject,topic,difficulty\n"What is 2 + 2?' + b'x' * 200000)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.context['error'])
+        self.assertFalse(Question.objects.exists())
+
+    def test_command_fails_on_bad_encoding(self):
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as fh:
+            fh.write(b'question_text,subject,topic,difficulty\nCaf\xe9,French,,easy\n')
+        self.addCleanup(os.unlink, fh.name)
+        with self.assertRaisesMessage(CommandError, 'not UTF-8'):
+            call_command('import_questions', fh.name, stdout=StringIO(), stderr=StringIO())
+
+
+class SamplingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        sampling._pools.clear()
+        for n in range(30):
+            Question.objects.create(
+                question_text=f'Algebra question {n}', subject='Algebra', topic='Linear' if n % 2 else 'Quadratic',
+                difficulty=('easy', 'medium', 'hard')[n % 3],
+            )
+        for n in range(10):
+            Question.objects.create(question_text=f'Geometry question {n}', subject='Geometry', difficulty='easy')
+
+    def test_draws_k_distinct_existing_ids(self):
+        ids = sample_ids([Stratum(12)], seed=7)
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(len(set(ids)), 12)
+        self.assertEqual(Question.objects.filter(id__in=ids).count(), 12)
+        # Same seed, same paper
+        self.assertEqual(sample_ids([Stratum(12)], seed=7), ids)
+
+    def test_draw_is_capped_by_the_stratum(self):
+        self.assertEqual(len(sample_ids([Stratum(50, subject='Geometry')], seed=1)), 10)
+        self.assertEqual(sample_ids([Stratum(5, subject='Nothing here')], seed=1), [])
+
+    def test_filters_are_respected(self):
+        strata = strata_from_params({'subject': ' algebra ', 'topic': 'LINEAR', 'easy': '2', 'hard': '3'})
+        questions = sample_questions(strata, seed=3)
+        self.assertEqual([q.difficulty for q in questions], ['easy', 'easy', 'hard', 'hard', 'hard'])
+        self.assertEqual({(q.subject, q.topic) for q in questions}, {('Algebra', 'Linear')})
+
+    def test_overlapping_strata_do_not_repeat_questions(self):
+        ids = sample_ids([Stratum(10, subject='Geometry'), Stratum(10, subject='Geometry', difficulty='easy')], seed=5)
+        self.assertEqual(sorted(ids), sorted(Question.objects.filter(subject='Geometry').values_list('id', flat=True)))
+
+    def test_new_questions_are_seen_after_a_version_bump(self):
+        self.assertEqual(len(get_pool(('geometry', '', ''))), 10)
+        Question.objects.create(question_text='Geometry question 10', subject='Geometry')
+        self.assertEqual(len(get_pool(('geometry', '', ''))), 11)
+
+    def test_pool_cache_is_bounded(self):
+        with mock.patch.object(sampling._pools, 'size', 3):
+            for n in range(10):
+                get_pool((f'subject {n}', '', ''))
+            get_pool(('subject 7', '', ''))
+            get_pool(('subject 10', '', ''))
+            self.assertEqual(
+                list(sampling._pools.entries),
+                [('subject 9', '', ''), ('subject 7', '', ''), ('subject 10', '', '')],
+            )
+
+
+class IRTCalibrationTests(TestCase):
+    def test_estimate_recovers_known_parameters(self):
+        rng = np.random.default_rng(42)
+        n_students, n_items = 2000, 12
+        ability = rng.normal(size=n_students)
+        a = rng.uniform(0.7, 2.0, n_items)
+        b = np.linspace(-1.5, 1.5, n_items)
+        students = np.repeat(np.arange(n_students), n_items)
+        items = np.tile(np.arange(n_items), n_students)
+        p = 1 / (1 + np.exp(-a[items] * (ability[students] - b[items])))
+        correct = rng.random(len(students)) < p
+
+        result = estimate(students, items, correct, np.zeros(n_items), np.zeros(n_items))
+
+        self.assertLess(result['iterations'], MAX_ITERATIONS)
+        self.assertEqual(result['responses'].tolist(), [n_students] * n_items)
+        self.assertLess(np.abs(result['b'] - b).max(), 0.35)
+        self.assertLess(np.abs(result['a'] - a).max(), 0.4)
+        self.assertGreater(np.corrcoef(b, result['b'])[0, 1], 0.98)
+
+
+class AdaptiveTestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        adaptive._pools.clear()
+        student = CustomUser.objects.create_user(
+            username='cat_student', email='cat_student@example.com', password=None, user_type=3
+        )
+        for n in range(30):
+            Question.objects.create(
+                question_text=f'What is {n} + 1?', subject='Maths', question_type='numerical',
+                answer_key=str(n + 1), difficulty=('easy', 'medium', 'hard')[n % 3],
+            )
+        # Not part of a Maths test: other subject, and not auto-gradable
+        Question.objects.create(question_text='Name a river', subject='Geography', question_type='short_answer',
+                                answer_key='Nile')
+        Question.objects.create(question_text='Discuss', subject='Maths')
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(student)
+
+    def take_test(self, answer):
+        response = self.client.get(reverse('adaptive_test'), {'new': 1, 'subject': 'maths', 'count': 8})
+        while response.context['question'] is not None:
+            question = response.context['question']
+            self.client.post(reverse('adaptive_test'), {
+                'question_id': question.id, 'answer_text': answer(question),
+            })
+            response = self.client.get(reverse('adaptive_test'))
+        return response.context['state']
+
+    def test_right_answers_raise_the_difficulty(self):
+        state = self.take_test(lambda question: question.answer_key)
+        self.assertTrue(state['done'])
+        asked = [row[0] for row in state['asked']]
+        self.assertEqual(len(asked), 8)
+        self.assertEqual(len(set(asked)), 8)
+        self.assertEqual(
+            set(Question.objects.filter(id__in=asked).values_list('subject', 'question_type')),
+            {('Maths', 'numerical')},
+        )
+        self.assertTrue(all(row[4] is True for row in state['asked']))
+        self.assertGreater(state['theta'], 1.0)
+        self.assertEqual(state['asked'][-1][2], LABEL_DIFFICULTY['hard'])
+        self.assertEqual(Submission.objects.count(), 8)
+
+    def test_wrong_answers_lower_the_estimate(self):
+        state = self.take_test(lambda question: 'no idea')
+        self.assertTrue(all(row[4] is False for row in state['asked']))
+        self.assertLess(state['theta'], -1.0)
+        self.assertEqual(state['asked'][-1][2], LABEL_DIFFICULTY['easy'])
+
+    def test_resent_answer_is_ignored(self):
+        response = self.client.get(reverse('adaptive_test'), {'new': 1, 'subject': 'maths', 'count': 8})
+        question = response.context['question']
+        form = {'question_id': question.id, 'answer_text': question.answer_key}
+        self.client.post(reverse('adaptive_test'), form)
+        self.client.post(reverse('adaptive_test'), form)
+        self.assertEqual(len(self.client.session['adaptive_test']['asked']), 1)
+        self.assertEqual(Submission.objects.count(), 1)
+
+    def test_pool_cache_is_bounded(self):
+        with mock.patch.object(adaptive._pools, 'size', 2):
+            for subject in ('a', 'b', 'maths', 'c'):
+                adaptive.get_pool(subject)
+            self.assertEqual(list(adaptive._pools.entries), ['maths', 'c'])
+            self.assertEqual(len(adaptive.get_pool('maths')), 30)
+
+
+class NearDuplicateWarningTests(TestCase):
+    TEXT = 'Explain how photosynthesis turns light energy into chemical energy in plants.'
+
+    def setUp(self):
+        cache.clear()
+        teacher = CustomUser.objects.create_user(
+            username='dup_teacher', email='dup_teacher@example.com', password=None, user_type=2
+        )
+        self.original = Question.objects.create(question_text=self.TEXT, subject='Biology', author=teacher)
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(teacher)
+
+    def add(self, text):
+        return self.client.post(reverse('add_question'), {
+            'question_text': text, 'subject': 'Biology', 'topic': 'Plants', 'difficulty': 'easy',
+            'question_type': 'essay',
+        })
+
+    def test_similar_question_is_saved_and_the_matches_shown(self):
+        response = self.add(self.TEXT.replace('Explain', 'Describe'))
+        added = Question.objects.exclude(id=self.original.id).get()
+        self.assertRedirects(response, reverse('edit_question', args=[added.id]) + '?saved=1')
+        page = self.client.get(response.url)
+        self.assertContains(page, 'Question saved.')
+        self.assertEqual([q.id for q, _ in page.context['near_duplicates']], [self.original.id])
+        self.assertContains(page, f'#{self.original.id}</a>')
+
+    def test_distinct_question_goes_to_the_list(self):
+        response = self.add('What is the boiling point of water at sea level in Celsius?')
+        self.assertRedirects(response, reverse('questions_list'))
+
+    def test_editing_does_not_match_the_question_itself(self):
+        response = self.client.get(reverse('edit_question', args=[self.original.id]))
+        self.assertEqual(response.context['near_duplicates'], [])
+        self.assertNotContains(response, 'Question saved.')
+
+    def test_migration_backfill_matches_the_app_fingerprint(self):
+        migration = import_module('questions.migrations.0011_question_fingerprints')
+        for text in (self.TEXT, 'Too short here', 'Name the largest planet in the solar system.'):
+            data = Question.fingerprint(text)
+            self.assertEqual(migration.text_signature(text), data)
+            if data:
+                self.assertEqual(migration.band_hashes(data), band_hashes(data))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.newton = Question.objects.create(
+            question_text="State Newton's second law of motion.", subject='Physics', topic='Mechanics'
+        )
+        self.motion = Question.objects.create(
+            question_text='Describe projectile motion, and why motion along each axis is independent.',
+            subject='Physics', topic='Kinematics',
+        )
+        self.cell = Question.objects.create(question_text='Describe the <b>cell</b> membrane.', subject='Biology')
+
+    def ids(self, text, qs=None, backend=None):
+        backend = backend or get_backend()
+        return [q.id for q in backend.search(qs or Question.objects.all(), text, limit=10)]
+
+    def test_ranked_matches(self):
+        # Both mention motion; the one that says it twice ranks first
+        self.assertEqual(self.ids('motion'), [self.motion.id, self.newton.id])
+        self.assertEqual(self.ids('newton law'), [self.newton.id])
+        self.assertEqual(self.ids('   '), [])
+
+    def test_last_word_is_a_prefix(self):
+        self.assertEqual(self.ids('projec'), [self.motion.id])
+        self.assertEqual(self.ids('projec motion'), [])
+
+    def test_filters_apply_before_ranking(self):
+        self.assertEqual(self.ids('describe', qs=Question.objects.filter(subject_key='biology')), [self.cell.id])
+
+    def test_headline_is_escaped_and_marked(self):
+        (hit,) = get_backend().search(Question.objects.all(), 'cell', limit=10)
+        self.assertEqual(hit.headline, 'Describe the &lt;b&gt;<mark>cell</mark>&lt;/b&gt; membrane.')
+
+    def test_query_syntax_is_inert(self):
+        self.assertEqual(self.ids('motion OR NOT "cell" *'), [])
+        self.assertEqual(self.ids('cell)'), [self.cell.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.cell.question_text = 'Describe the nucleus.'
+        self.cell.save()
+        self.assertEqual(self.ids('cell'), [])
+        self.assertEqual(self.ids('nucleus'), [self.cell.id])
+        self.cell.delete()
+        self.assertEqual(self.ids('nucleus'), [])
+
+    def test_simple_backend(self):
+        backend = SimpleSearchBackend()
+        self.assertEqual(set(self.ids('motion', backend=backend)), {self.motion.id, self.newton.id})
+        (hit,) = backend.search(Question.objects.all(), 'CELL', limit=10)
+        self.assertEqual(hit.headline, 'Describe the &lt;b&gt;<mark>cell</mark>&lt;/b&gt; membrane.')
+
+    def test_list_view_pages_search_results(self):
+        client = Client(HTTP_HOST='localhost')
+        response = client.get(reverse('questions_list'), {'q': 'describe', 'per_page': 1})
+        self.assertTrue(response.context['search_mode'])
+        self.assertEqual(len(response.context['questions']), 1)
+        self.assertTrue(response.context['page'].has_next)
+        response = client.get(reverse('questions_list'), {'q': 'describe', 'per_page': 1, 'page': 2})
+        self.assertFalse(response.context['page'].has_next)
+
+
+class BatchGradingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        teacher = CustomUser.objects.create_user(
+            username='batch_teacher', email='batch_teacher@example.com', password=None, user_type=2
+        )
+        self.students = [
+            CustomUser.objects.create_user(
+                username=f'batch_student{n}', email=f'batch_student{n}@example.com', password=None, user_type=3
+            )
+            for n in range(2)
+        ]
+        questions = [Question.objects.create(question_text=f'Essay {n}') for n in range(6)]
+        self.submissions = [
+            Submission.objects.create(question=question, student=student, answer_text='An answer')
+            for question in questions for student in self.students
+        ]
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(teacher)
+
+    def post(self, data):
+        return self.client.post(f"{reverse('submissions_list')}?per_page=50", data)
+
+    def test_parse_grades(self):
+        grades, errors = parse_grades(
+            {'score_1': ' 7 ', 'feedback_1': ' Good ', 'score_2': '', 'score_3': 'ten', 'score_4': '-1'},
+            [1, 2, 3, 4, 5],
+        )
+        self.assertEqual(grades, {1: (7, 'Good')})
+        self.assertEqual(set(errors), {3, 4})
+
+    def test_page_is_graded_in_one_batch(self):
+        first, second, third = self.submissions[:3]
+        response = self.post({
+            f'score_{first.id}': '5', f'feedback_{first.id}': 'Clear',
+            f'score_{second.id}': '3',
+            f'score_{third.id}': '',
+        })
+        self.assertEqual(response.status_code, 302)
+        graded = Submission.objects.filter(graded=True).order_by('id')
+        self.assertEqual([(s.id, s.score, s.feedback) for s in graded], [(first.id, 5, 'Clear'), (second.id, 3, '')])
+        self.assertEqual(len({s.graded_at for s in graded}), 1)
+        self.assertEqual(
+            {s.student_id: (s.total_score, s.graded_count) for s in StudentScoreSummary.objects.all()},
+            {first.student_id: (5, 1), second.student_id: (3, 1)},
+        )
+
+    def test_regrading_adjusts_the_totals(self):
+        sub = self.submissions[0]
+        self.post({f'score_{sub.id}': '5'})
+        self.post({f'score_{sub.id}': '2'})
+        summary = StudentScoreSummary.objects.get(student_id=sub.student_id)
+        self.assertEqual((summary.total_score, summary.graded_count), (2, 1))
+
+    def test_one_bad_score_grades_nothing(self):
+        first, second = self.submissions[:2]
+        response = self.post({f'score_{first.id}': '5', f'score_{second.id}': 'lots'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'nothing was graded')
+        self.assertFalse(Submission.objects.filter(graded=True).exists())
+        rows = {row['submission'].id: row for row in response.context['rows']}
+        self.assertEqual(rows[first.id]['score'], '5')
+        self.assertEqual(rows[second.id]['error'], 'Score must be a whole number.')
+
+    def test_only_submissions_on_the_page_are_graded(self):
+        response = self.client.post(f"{reverse('submissions_list')}?per_page=2", {
+            f'score_{sub.id}': '1' for sub in self.submissions
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Submission.objects.filter(graded=True).count(), 2)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def queries(subs):
+            with CaptureQueriesContext(connection) as captured:
+                apply_grades({sub.id: (1, '') for sub in subs})
+            return len(captured)
+
+        # Creates both students' summary rows
+        queries(self.submissions[:2])
+        # Then 2 or 8 submissions of the same two students cost the same
+        self.assertEqual(queries(self.submissions[2:4]), queries(self.submissions[4:]))
+
+
+class AutogradeTests(TestCase):
+    def key(self, question_type, answer_key, tolerance=0, match_regex=False, points=2):
+        return AnswerKey(question_type, (), answer_key, tolerance, match_regex, points)
+
+    def test_rules(self):
+        cases = [
+            (self.key('multiple_choice', 'Paris'), '  paris ', True),
+            (self.key('multiple_choice', 'Paris'), 'Lyon', False),
+            (self.key('true_false', 'False'), 'false', True),
+            (self.key('numerical', '3.5', tolerance=0.1), '3.45', True),
+            (self.key('numerical', '3.5', tolerance=0.1), '3.7', False),
+            (self.key('numerical', '0.3'), '0.1e0', False),
+            (self.key('numerical', '1000'), '1,000', True),
+            (self.key('numerical', '1'), 'nan', False),
+            (self.key('numerical', '1'), 'one', False),
+            (self.key('short_answer', 'Photosynthesis\nphoto synthesis'), 'PHOTO   synthesis', True),
+            (self.key('short_answer', 'Photosynthesis'), 'photosynthesis is', False),
+            (self.key('short_answer', r'colou?r', match_regex=True), 'Color', True),
+            (self.key('short_answer', r'colou?r', match_regex=True), 'colours', False),
+            (self.key('fill_blanks', 'H2O\nwater'), 'Water', True),
+        ]
+        for key, answer, expected in cases:
+            with self.subTest(key=key, answer=answer):
+                self.assertIs(is_correct(key, answer), expected)
+
+    def test_form_fields(self):
+        fields, error = answer_fields_from_post({
+            'question_type': 'multiple_choice', 'option1': 'Paris', 'option2': 'Lyon', 'option3': '',
+            'correct_answer': '2', 'points': '3',
+        })
+        self.assertIsNone(error)
+        self.assertEqual((fields['choices'], fields['answer_key'], fields['points']), (['Paris', 'Lyon'], 'Lyon', 3))
+        for data in (
+            {'question_type': 'multiple_choice', 'option1': 'Paris', 'correct_answer': '3'},
+            {'question_type': 'numerical', 'numerical_answer': 'x'},
+            {'question_type': 'numerical', 'numerical_answer': '1', 'error_margin': '-1'},
+            {'question_type': 'short_answer', 'short_answer': '(unclosed', 'match_regex': '1'},
+            {'question_type': 'essay', 'points': '0'},
+            {'question_type': 'poem'},
+        ):
+            with self.subTest(data=data):
+                self.assertIsNotNone(answer_fields_from_post(data)[1])
+
+    def test_answers_are_graded_on_arrival(self):
+        student = CustomUser.objects.create_user(
+            username='auto_student', email='auto_student@example.com', password=None, user_type=3
+        )
+        question = Question.objects.create(
+            question_text='2 + 2?', question_type='numerical', answer_key='4', points=3,
+        )
+        essay = Question.objects.create(question_text='Discuss')
+        accept_submission(student, question, ' 4 ')
+        accept_submission(student, essay, 'Some thoughts')
+        sub = Submission.objects.get(question=question)
+        self.assertEqual((sub.graded, sub.auto_graded, sub.score), (True, True, 3))
+        self.assertFalse(Submission.objects.get(question=essay).graded)
+        self.assertEqual(StudentScoreSummary.objects.get(student=student).total_score, 3)
+
+
+class AutogradeCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = CustomUser.objects.create_user(
+            username='regrade_student', email='regrade_student@example.com', password=None, user_type=3
+        )
+        self.question = Question.objects.create(
+            question_text='Capital of France?', question_type='multiple_choice',
+            choices=['Paris', 'Lyon'], answer_key='Paris', points=2,
+        )
+        self.right = Submission.objects.create(question=self.question, student=self.student, answer_text='Paris')
+        self.wrong = Submission.objects.create(question=self.question, student=self.student, answer_text='Lyon')
+        self.manual = Submission.objects.create(
+            question=self.question, student=self.student, answer_text='Lyon',
+            graded=True, auto_graded=False, score=1, feedback='Close enough',
+        )
+
+    def regrade(self, *args):
+        out = StringIO()
+        call_command('autograde_submissions', '--workers', '1', '--chunk-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_regrades_against_the_current_key(self):
+        self.assertIn('updated 2', self.regrade())
+        scores = dict(Submission.objects.values_list('id', 'score'))
+        self.assertEqual(scores, {self.right.id: 2, self.wrong.id: 0, self.manual.id: 1})
+        # Nothing left to change
+        self.assertIn('updated 0', self.regrade())
+
+        Question.objects.filter(id=self.question.id).update(answer_key='Lyon')
+        self.regrade()
+        scores = dict(Submission.objects.values_list('id', 'score'))
+        self.assertEqual(scores, {self.right.id: 0, self.wrong.id: 2, self.manual.id: 1})
+        summary = StudentScoreSummary.objects.get(student=self.student)
+        self.assertEqual((summary.total_score, summary.graded_count), (2, 2))
+
+    def test_manual_grades_only_with_include_manual(self):
+        self.regrade('--include-manual')
+        self.manual.refresh_from_db()
+        self.assertEqual((self.manual.score, self.manual.auto_graded), (0, True))
+
+
+class ExamPaperTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        papers._papers.clear()
+        self.exam = Exam.objects.create(title='Finals', time_limit_minutes=45)
+        self.first = Question.objects.create(
+            question_text='Capital of France?', question_type='multiple_choice',
+            choices=['Paris', 'Lyon'], answer_key='Paris', points=2,
+        )
+        self.second = Question.objects.create(question_text='Discuss <b>tyranny</b>.', points=5)
+        ExamQuestion.objects.create(exam=self.exam, question=self.first, position=1)
+        ExamQuestion.objects.create(exam=self.exam, question=self.second, position=2)
+
+    def snapshot(self, version):
+        return cache.get(f'exam_paper:{self.exam.id}:v{version}')
+
+    def test_snapshot_contents(self):
+        paper = get_paper(self.exam.id)
+        self.assertEqual(paper['question_ids'], [self.first.id, self.second.id])
+        self.assertEqual(paper['exam']['total_points'], 7)
+        data = json.loads(paper['json'])
+        self.assertEqual([q['number'] for q in data['questions']], [1, 2])
+        self.assertNotIn('answer_key', data['questions'][0])
+        self.assertIn('Discuss &lt;b&gt;tyranny&lt;/b&gt;.', paper['html'])
+
+    def test_served_without_queries_until_something_changes(self):
+        paper = get_paper(self.exam.id)
+        with self.assertNumQueries(0):
+            self.assertIs(get_paper(self.exam.id), paper)
+        # Another process: nothing local, one cache read
+        papers._papers.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_paper(self.exam.id), paper)
+
+    def test_changes_make_a_new_snapshot_and_leave_the_old_one(self):
+        old = get_paper(self.exam.id)
+        version = papers.paper_version(self.exam.id)
+        self.first.question_text = 'Capital of Italy?'
+        self.first.save()
+        new = get_paper(self.exam.id)
+        self.assertIn('Capital of Italy?', new['html'])
+        self.assertEqual(papers.paper_version(self.exam.id), version + 1)
+        # The old version's snapshot is never rewritten
+        self.assertEqual(self.snapshot(version), old)
+        self.assertIn('Capital of France?', old['html'])
+
+    def test_every_kind_of_edit_bumps_the_version(self):
+        edits = [
+            lambda: Exam.objects.get(id=self.exam.id).save(),
+            lambda: ExamQuestion.objects.create(
+                exam=self.exam, position=3, question=Question.objects.create(question_text='Third'),
+            ),
+            lambda: ExamQuestion.objects.get(exam=self.exam, question=self.first).delete(),
+            lambda: self.second.delete(),
+        ]
+        for edit in edits:
+            version = papers.paper_version(self.exam.id)
+            edit()
+            self.assertEqual(papers.paper_version(self.exam.id), version + 1)
+        self.assertEqual(len(get_paper(self.exam.id)['question_ids']), 1)
+
+    def test_unrelated_question_edit_keeps_the_snapshot(self):
+        get_paper(self.exam.id)
+        version = papers.paper_version(self.exam.id)
+        other = Question.objects.create(question_text='Not on the paper')
+        other.question_text = 'Still not on the paper'
+        other.save()
+        self.assertEqual(papers.paper_version(self.exam.id), version)
+
+    def test_waits_for_a_concurrent_build(self):
+        version = papers.paper_version(self.exam.id)
+        key = f'exam_paper:{self.exam.id}:v{version}'
+        cache.add(f'{key}:lock', 1, papers.LOCK_TIMEOUT)
+        built = papers.build_paper(self.exam.id)
+
+        def built_meanwhile(seconds):
+            cache.set(key, built)
+
+        with mock.patch.object(papers.time, 'sleep', side_effect=built_meanwhile):
+            with self.assertNumQueries(0):
+                self.assertEqual(get_paper(self.exam.id), built)
+
+
+class ExamDraftTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        papers._papers.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool = DraftSpool(os.path.join(directory.name, 'drafts.sqlite3'))
+        self.addCleanup(self.spool.close)
+        patcher = mock.patch.object(drafts, '_spool', self.spool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.student = CustomUser.objects.create_user(
+            username='draft_student', email='draft_student@example.com', password=None, user_type=3
+        )
+        exam = Exam.objects.create(title='Quiz', time_limit_minutes=30)
+        self.questions = [Question.objects.create(question_text=f'Essay {n}') for n in range(3)]
+        for position, question in enumerate(self.questions, start=1):
+            ExamQuestion.objects.create(exam=exam, question=question, position=position)
+        self.now = timezone.now()
+        self.attempt = ExamAttempt.objects.create(
+            exam=exam, student=self.student, started_at=self.now, deadline=self.now + timedelta(minutes=30)
+        )
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.student)
+
+    def save(self, answers, seconds=0):
+        save_drafts(self.attempt.id, self.attempt.deadline, answers, self.now + timedelta(seconds=seconds))
+
+    def stored(self):
+        return dict(ExamDraft.objects.filter(attempt=self.attempt).values_list('question_id', 'answer_text'))
+
+    def test_saves_between_flushes_coalesce(self):
+        first = self.questions[0].id
+        for n in range(5):
+            self.save({first: f'draft {n}'}, seconds=n)
+        self.assertEqual(self.spool.pending(), 1)
+        self.assertEqual(self.spool.flush(), 1)
+        self.assertEqual(self.spool.pending(), 0)
+        self.assertEqual(self.stored(), {first: 'draft 4'})
+
+    def test_older_drafts_never_win(self):
+        first = self.questions[0].id
+        self.save({first: 'newer'}, seconds=10)
+        self.save({first: 'older'}, seconds=5)
+        self.spool.flush()
+        # As if another host spooled an older copy of the same answer
+        self.spool.put_many([(self.attempt.id, first, 'stale', self.now)])
+        self.spool.flush()
+        self.assertEqual(self.stored(), {first: 'newer'})
+
+    def test_drafts_without_a_live_attempt_or_question_are_dropped(self):
+        self.save({self.questions[0].id: 'kept', self.questions[1].id: 'question deleted'})
+        self.questions[1].delete()
+        other = ExamAttempt.objects.create(
+            exam=self.attempt.exam, student=CustomUser.objects.create_user(
+                username='draft_other', email='draft_other@example.com', password=None, user_type=3
+            ),
+            deadline=self.now, submitted_at=self.now,
+        )
+        self.spool.put_many([(other.id, self.questions[0].id, 'already submitted', self.now)])
+        self.assertEqual(self.spool.flush(), 3)
+        self.assertEqual(self.spool.pending(), 0)
+        self.assertEqual(list(ExamDraft.objects.values_list('answer_text', flat=True)), ['kept'])
+
+    def test_drafts_survive_a_cache_restart_once_flushed(self):
+        ids = [q.id for q in self.questions]
+        self.save({ids[0]: 'first', ids[1]: 'x' * (drafts.MAX_DRAFT_LENGTH + 10)})
+        self.assertEqual(len(load_drafts(self.attempt.id, ids)[ids[1]]), drafts.MAX_DRAFT_LENGTH)
+        self.spool.flush()
+        cache.clear()
+        loaded = load_drafts(self.attempt.id, ids)
+        self.assertEqual(set(loaded), {ids[0], ids[1]})
+        self.assertEqual(loaded[ids[0]], 'first')
+
+    def test_autosave_then_submit(self):
+        ids = [q.id for q in self.questions]
+        response = self.client.post(
+            reverse('autosave_exam', args=[self.attempt.id]),
+            {f'answer_{ids[0]}': 'from the draft', f'answer_{ids[1]}': 'overwritten by the form'},
+        )
+        self.assertEqual(response.json()['saved'], 2)
+        self.assertFalse(ExamDraft.objects.exists())
+
+        self.client.post(reverse('submit_exam', args=[self.attempt.id]), {f'answer_{ids[1]}': 'final'})
+        answers = dict(Submission.objects.filter(student=self.student).values_list('question_id', 'answer_text'))
+        self.assertEqual(answers, {ids[0]: 'from the draft', ids[1]: 'final'})
+        self.assertEqual(self.spool.pending(), 0)
+        self.assertEqual(load_drafts(self.attempt.id, ids), {})
+
+    def test_autosave_after_the_deadline_is_refused(self):
+        ExamAttempt.objects.filter(id=self.attempt.id).update(deadline=self.now - timedelta(minutes=5))
+        response = self.client.post(
+            reverse('autosave_exam', args=[self.attempt.id]), {f'answer_{self.questions[0].id}': 'late'}
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.spool.pending(), 0)
+
+
+class ItemAnalysisTests(TestCase):
+    def complete_matrix(self, n_students=40, n_items=5, seed=1):
+        rng = np.random.default_rng(seed)
+        ability = rng.normal(size=(n_students, 1))
+        scores = (rng.normal(size=(n_students, n_items)) + ability > np.linspace(-1, 1, n_items)).astype(float)
+        students = np.repeat(np.arange(n_students), n_items)
+        questions = np.tile(np.arange(n_items), n_students) + 1
+        ids = np.arange(len(students))
+        return scores, (ids, students, questions, scores.ravel())
+
+    def test_matches_the_textbook_formulas_on_a_complete_matrix(self):
+        matrix, answers = self.complete_matrix()
+        n_items = matrix.shape[1]
+        result = analyze(
+            *answers, np.arange(1, n_items + 1), np.zeros(n_items, dtype=np.int64), np.ones(n_items, dtype=np.int64)
+        )
+        self.assertEqual(result['responses'].tolist(), [len(matrix)] * n_items)
+        np.testing.assert_allclose(result['facility'], matrix.mean(axis=0))
+        np.testing.assert_allclose(result['variance'], matrix.var(axis=0), atol=1e-12)
+        totals = matrix.sum(axis=1)
+        item_rest = [np.corrcoef(matrix[:, i], (totals - matrix[:, i]) / (n_items - 1))[0, 1] for i in range(n_items)]
+        np.testing.assert_allclose(result['discrimination'], item_rest)
+        alpha = n_items / (n_items - 1) * (1 - matrix.var(axis=0).sum() / totals.var())
+        self.assertAlmostEqual(result['alpha'][0], alpha)
+
+    def test_latest_answer_counts_and_points_scale(self):
+        # Student 0 answered item 1 twice; the second, later answer counts
+        ids = np.array([1, 2, 3, 4])
+        students = np.array([0, 0, 1, 1])
+        questions = np.array([1, 1, 1, 99])
+        scores = np.array([0.0, 4.0, 2.0, 1.0])
+        result = analyze(ids, students, questions, scores, np.array([1]), np.array([0]), np.array([4]))
+        self.assertEqual(result['answers'], 2)
+        self.assertEqual(result['responses'].tolist(), [2])
+        self.assertAlmostEqual(result['facility'][0], (4 / 4 + 2 / 4) / 2)
+        # Too few answers for a correlation or an alpha
+        self.assertTrue(np.isnan(result['discrimination'][0]))
+        self.assertTrue(np.isnan(result['alpha'][0]))
+
+    # Reads go to the primary here; replica routing has its own tests
+    @mock.patch('questions.item_analysis.replica_configured', return_value=False)
+    def test_compute_question_stats(self, replica_configured):
+        matrix, _ = self.complete_matrix(n_students=12, n_items=3, seed=2)
+        questions = [Question.objects.create(question_text=f'Item {n}', subject='Maths') for n in range(3)]
+        unanswered = Question.objects.create(question_text='Nobody answered', subject='Maths')
+        for row, scores in enumerate(matrix):
+            student = CustomUser.objects.create_user(
+                username=f'item_student{row}', email=f'item_student{row}@example.com', password=None, user_type=3
+            )
+            Submission.objects.bulk_create([
+                Submission(question=question, student=student, answer_text='x', graded=True, score=int(score))
+                for question, score in zip(questions, scores)
+            ])
+        summary = compute_question_stats()
+        self.assertEqual((summary['answers'], summary['questions']), (36, 3))
+        stats = QuestionStats.objects.in_bulk()
+        self.assertNotIn(unanswered.id, stats)
+        for question, column in zip(questions, matrix.T):
+            self.assertEqual(stats[question.id].responses, 12)
+            self.assertAlmostEqual(stats[question.id].facility, column.mean())
+        self.assertAlmostEqual(summary['alpha']['maths'], stats[questions[0].id].subject_alpha)
@@ -2,7 +2,9 @@ from django.urls import path
 from .views import (
     questions_list,
     add_question,
+    import_questions_view,
     edit_question,
+    similar_questions,
     delete_question,
     take_question,
     submissions_list,
@@ -11,18 +13,48 @@ from .views import (
     export_performance_csv,
     student_submissions,
     mock_test,
+    adaptive_test,
+    exams_list,
+    exam_edit,
+    exam_delete,
+    start_exam,
+    exam_attempt,
+    autosave_exam,
+    exam_status,
+    exam_events,
+    grading_events,
+    grading_status,
+    broadcast_exam,
+    submit_exam,
 )
 
 urlpatterns = [
     path('', questions_list, name='questions_list'),
     path('add/', add_question, name='add_question'),
+    path('import/', import_questions_view, name='import_questions'),
     path('edit/<int:id>/', edit_question, name='edit_question'),
+    path('similar/', similar_questions, name='similar_questions'),
     path('delete/<int:id>/', delete_question, name='delete_question'),
     path('take/<int:id>/', take_question, name='take_question'),
     path('submissions/', submissions_list, name='submissions_list'),
+    path('submissions/events/', grading_events, name='grading_events'),
+    path('submissions/status/', grading_status, name='grading_status'),
     path('grade/<int:id>/', grade_submission, name='grade_submission'),
     path('leaderboard/', leaderboard, name='leaderboard'),
     path('export/performance.csv', export_performance_csv, name='export_performance_csv'),
+    path('export/performance.csv.gz', export_performance_csv, {'compress': True}, name='export_performance_csv_gz'),
     path('me/submissions/', student_submissions, name='student_submissions'),
     path('mock-test/', mock_test, name='mock_test'),
+    path('mock-test/adaptive/', adaptive_test, name='adaptive_test'),
+    path('exams/', exams_list, name='exams_list'),
+    path('exams/new/', exam_edit, name='exam_create'),
+    path('exams/<int:id>/edit/', exam_edit, name='exam_edit'),
+    path('exams/<int:id>/delete/', exam_delete, name='exam_delete'),
+    path('exams/<int:id>/broadcast/', broadcast_exam, name='broadcast_exam'),
+    path('exams/<int:id>/start/', start_exam, name='start_exam'),
+    path('exams/attempt/<int:id>/', exam_attempt, name='exam_attempt'),
+    path('exams/attempt/<int:id>/autosave/', autosave_exam, name='autosave_exam'),
+    path('exams/attempt/<int:id>/status/', exam_status, name='exam_status'),
+    path('exams/attempt/<int:id>/events/', exam_events, name='exam_events'),
+    path('exams/attempt/<int:id>/submit/', submit_exam, name='submit_exam'),
 ]
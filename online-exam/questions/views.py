@@ -1,27 +1,75 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Count, Sum
-from django.http import HttpResponse
-import csv
-from .models import Question, Submission
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.safestring import mark_safe
+import io
+import json
+from online_exam_backend.routers import reads_from_replica
+from .exports import csv_chunks, gzip_chunks, performance_rows
+from .filters import filtered_submissions
+from .grading import apply_grades, parse_grades
+from .adaptive import advance, new_test, record_answer
+from .autograde import answer_fields_from_post, answer_key_for, is_correct
+from .drafts import discard_drafts, load_drafts, save_drafts
+from .events import can_stream
+from .duplicates import find_similar
+from .importer import detect_format, import_questions
+from .ingest import accept_submission, new_nonce
+from .leaderboard import record_grade
+from .live import TIME_SYNC, arecent_broadcasts, attempt_ended, attempt_status, broadcast, exam_stream
+from .models import Exam, ExamAttempt, ExamQuestion, Question, QuestionStats, StudentScoreSummary, Submission
+from .papers import aget_paper, attempt_deadline, get_paper, invalidate_paper, window_error
+from .plagiarism import flags_for
+from .progress import grading_snapshot, grading_stream, publish_graded
+from .pagination import OffsetPage, paginate_keyset, page_number_from, page_size_from
+from .sampling import sample_questions, strata_from_params, student_seed
+from .search import search_questions
 
 def questions_list(request):
     qs = Question.objects.all()
-    subject = request.GET.get('subject')
-    topic = request.GET.get('topic')
+    subject = Question.normalize_key(request.GET.get('subject'))
+    topic = Question.normalize_key(request.GET.get('topic'))
     difficulty = request.GET.get('difficulty')
     search = request.GET.get('q')
 
+    # Filter on the case-folded columns so the composite indexes are usable
     if subject:
-        qs = qs.filter(subject__iexact=subject)
+        qs = qs.filter(subject_key=subject)
     if topic:
-        qs = qs.filter(topic__iexact=topic)
+        qs = qs.filter(topic_key=topic)
     if difficulty:
         qs = qs.filter(difficulty=difficulty)
-    if search:
-        qs = qs.filter(question_text__icontains=search)
 
-    return render(request, 'questions/questions_list.html', {'questions': qs})
+    page_size = page_size_from(request.GET.get('per_page'))
+    if search:
+        # Ranked full-text results have their own order, so page by number
+        number = page_number_from(request.GET.get('page'))
+        hits = search_questions(qs, search, limit=page_size + 1, offset=(number - 1) * page_size)
+        page = OffsetPage(hits[:page_size], number, has_next=len(hits) > page_size)
+    else:
+        page = paginate_keyset(
+            qs,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            page_size=page_size,
+        )
+    if request.user.is_authenticated and request.user.user_type == 2:
+        # Item analysis for the page in one query (see questions.item_analysis)
+        stats = QuestionStats.objects.in_bulk([q.id for q in page])
+        for question in page:
+            question.item_stats = stats.get(question.id)
+    return render(request, 'questions/questions_list.html', {
+        'questions': page,
+        'page': page,
+        'search_mode': bool(search),
+    })
 
 @login_required
 def add_question(request):
@@ -32,16 +80,37 @@ def add_question(request):
         subject = request.POST.get('subject', '').strip()
         topic = request.POST.get('topic', '').strip()
         difficulty = request.POST.get('difficulty', 'easy')
-        Question.objects.create(
+        answer_fields, error = answer_fields_from_post(request.POST)
+        if error:
+            return render(request, 'questions/add_question.html', {'error': error})
+        question = Question.objects.create(
             question_text=text,
             subject=subject,
             topic=topic,
             difficulty=difficulty,
             author=request.user,
+            **answer_fields,
         )
-        return redirect('questions_list')
+        return _after_save(question)
     return render(request, 'questions/add_question.html')
 
+@login_required
+def import_questions_view(request):
+    if request.user.user_type != 2:  # only teachers
+        return redirect('questions_list')
+    report = None
+    if request.method == 'POST' and request.FILES.get('file'):
+        upload = request.FILES['file']
+        fmt = request.POST.get('format') or detect_format(upload.name)
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        report = import_questions(lines, fmt=fmt, author=request.user)
+    return render(request, 'questions/import_questions.html', {
+        'report': report,
+        'errors': report.errors[:500] if report else [],
+        'near_duplicates': report.near_duplicates[:500] if report else [],
+        'error': report.fatal if report else None,
+    })
+
 @login_required
 def edit_question(request, id):
     if request.user.user_type != 2 and request.user.user_type != 1:
@@ -52,9 +121,63 @@ def edit_question(request, id):
         question.subject = request.POST.get('subject', '').strip()
         question.topic = request.POST.get('topic', '').strip()
         question.difficulty = request.POST.get('difficulty', question.difficulty)
+        answer_fields, error = answer_fields_from_post(request.POST)
+        if error:
+            return render(request, 'questions/edit_question.html', _edit_context(question, error))
+        for field, value in answer_fields.items():
+            setattr(question, field, value)
         question.save()
-        return redirect('questions_list')
-    return render(request, 'questions/edit_question.html', {'question': question})
+        return _after_save(question)
+    context = _edit_context(question)
+    # The same check as similar_questions, so the warning shows without JavaScript
+    context['near_duplicates'] = find_similar(question.question_text, exclude_id=question.id)
+    context['saved'] = bool(request.GET.get('saved'))
+    return render(request, 'questions/edit_question.html', context)
+
+
+def _after_save(question):
+    # A saved question that looks like existing ones goes back to its edit
+    # page, which lists them; otherwise on to the list as before
+    if find_similar(question.question_text, exclude_id=question.id, limit=1):
+        return redirect(f"{reverse('edit_question', args=[question.id])}?saved=1")
+    return redirect('questions_list')
+
+
+def _edit_context(question, error=None):
+    # The form always shows four option boxes for multiple choice
+    options = (list(question.choices) + [''] * 4)[:4]
+    correct = options.index(question.answer_key) + 1 if question.answer_key in options else 1
+    blanks = '; '.join(question.answer_key.splitlines()) if question.question_type == 'fill_blanks' else ''
+    return {
+        'question': question,
+        'options': options,
+        'correct_option': correct,
+        'blank_answers': blanks,
+        'error': error,
+    }
+
+@login_required
+def similar_questions(request):
+    # Live near-duplicate check for the add/edit forms
+    if request.user.user_type != 2 and request.user.user_type != 1:
+        return HttpResponseForbidden()
+    exclude = request.GET.get('exclude') or ''
+    matches = find_similar(
+        request.GET.get('text', '')[:5000],
+        exclude_id=int(exclude) if exclude.isdigit() else None,
+    )
+    return JsonResponse({'matches': [
+        {
+            'id': q.id,
+            'text': q.question_text[:200],
+            'subject': q.subject,
+            'author': q.author.username if q.author else '',
+            'similarity': round(score, 2),
+            'url': reverse('edit_question', args=[q.id]),
+        }
+        for q, score in matches
+    ]})
+
 
 @login_required
 def delete_question(request, id):
@@ -65,22 +188,65 @@ def delete_question(request, id):
     return redirect('questions_list')
 
 
+async def _auser(request):
+    # Async views must not touch the lazy request.user; load it once and
+    # keep it there for the templates
+    request.user = await request.auser()
+    return request.user
+
+
 @login_required
-def take_question(request, id):
-    question = get_object_or_404(Question, id=id)
+async def take_question(request, id):
+    user = await _auser(request)
+    question = await aget_object_or_404(Question, id=id)
     if request.method == 'POST':
         answer = request.POST['answer_text']
-        Submission.objects.create(question=question, student=request.user, answer_text=answer)
+        await sync_to_async(accept_submission)(user, question, answer, request.POST.get('client_nonce', '')[:64])
         return redirect('questions_list')
-    return render(request, 'questions/take_question.html', {'question': question})
+    return render(request, 'questions/take_question.html', {
+        'question': question,
+        'client_nonce': new_nonce(),
+    })
 
 
 @login_required
 def submissions_list(request):
     if request.user.user_type != 2:
         return redirect('questions_list')
-    submissions = Submission.objects.select_related('question', 'student').order_by('-submitted_at')
-    return render(request, 'questions/submissions_list.html', {'submissions': submissions})
+    # Optional filters: ?question=<id>&graded=0|1&flagged=1&from=YYYY-MM-DD&to=YYYY-MM-DD
+    qs = filtered_submissions(
+        request.GET, Submission.objects.select_related('question', 'student').defer('minhash')
+    )
+    page = paginate_keyset(
+        qs,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=page_size_from(request.GET.get('per_page')),
+        field='submitted_at',
+    )
+    errors = {}
+    if request.method == 'POST':
+        # Batch grading: only the submissions on this page can be graded
+        grades, errors = parse_grades(request.POST, [s.id for s in page])
+        if not errors:
+            apply_grades(grades)
+            return redirect(request.get_full_path())
+    flags = flags_for([s.id for s in page])
+    rows = [
+        {
+            'submission': s,
+            'similar': flags.get(s.id, []),
+            'score': request.POST.get(f'score_{s.id}', '') if errors else '',
+            'feedback': request.POST.get(f'feedback_{s.id}', s.feedback) if errors else s.feedback,
+            'error': errors.get(s.id),
+        }
+        for s in page
+    ]
+    return render(request, 'questions/submissions_list.html', {
+        'rows': rows,
+        'page': page,
+        'error': 'Some scores could not be saved; nothing was graded.' if errors else None,
+    })
 
 
 @login_required
@@ -89,33 +255,46 @@ def grade_submission(request, id):
         return redirect('questions_list')
     sub = get_object_or_404(Submission, id=id)
     if request.method == 'POST':
+        was_graded, previous_score = sub.graded, sub.score
         sub.graded = True
+        sub.auto_graded = False
         sub.score = int(request.POST.get('score', 0))
         sub.feedback = request.POST.get('feedback', '')
-        sub.save()
+        sub.graded_at = timezone.now()
+        with transaction.atomic():
+            sub.save()
+            record_grade(sub, was_graded, previous_score)
+            publish_graded([(sub, was_graded, previous_score)])
         return redirect('submissions_list')
     return render(request, 'questions/grade_submission.html', {'submission': sub})
 
 
+@reads_from_replica
 @login_required
 def leaderboard(request):
-    # Top students by total score
-    agg = Submission.objects.filter(graded=True).values('student__username').annotate(
-        total_score=Sum('score'), count=Count('id'), avg=Avg('score')
-    ).order_by('-total_score')[:20]
-    return render(request, 'questions/leaderboard.html', {'rows': agg})
+    # Top students by total score, read from the maintained summary table
+    rows = StudentScoreSummary.objects.select_related('student').filter(
+        graded_count__gt=0
+    ).order_by('-total_score', 'student')[:20]
+    return render(request, 'questions/leaderboard.html', {'rows': rows})
 
 
+@reads_from_replica
 @login_required
-def export_performance_csv(request):
+def export_performance_csv(request, compress=False):
     if request.user.user_type != 2:
         return redirect('questions_list')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="performance.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Student', 'Question ID', 'Score', 'Graded', 'Submitted At'])
-    for s in Submission.objects.select_related('student', 'question').all():
-        writer.writerow([s.student.username, s.question_id, s.score or 0, s.graded, s.submitted_at])
+    # Optional filters: ?from=YYYY-MM-DD&to=YYYY-MM-DD&subject=...&graded=1
+    qs = filtered_submissions(request.GET)
+    chunks = csv_chunks(performance_rows(qs))
+    filename = 'performance.csv'
+    if compress:
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+    response = StreamingHttpResponse(
+        chunks, content_type='application/gzip' if compress else 'text/csv'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 
@@ -127,9 +306,361 @@ def student_submissions(request):
 
 @login_required
 def mock_test(request):
-    # Simple random 5 questions mock
-    import random
-    all_ids = list(Question.objects.values_list('id', flat=True))
-    random.shuffle(all_ids)
-    selected = Question.objects.filter(id__in=all_ids[:5])
+    # Random (optionally stratified) paper, e.g. ?subject=Algebra&easy=3&hard=2.
+    # The seed is per student and attempt so a refresh shows the same paper;
+    # ?new=1 starts a fresh attempt.
+    attempt = request.session.get('mock_test_attempt', 0)
+    if request.GET.get('new'):
+        attempt += 1
+        request.session['mock_test_attempt'] = attempt
+    strata = strata_from_params(request.GET)
+    seed = student_seed(request.user.pk, strata, attempt)
+    selected = sample_questions(strata, seed=seed)
     return render(request, 'questions/mock_test.html', {'questions': selected})
+
+
+
+@login_required
+def adaptive_test(request):
+    # One question at a time, each chosen for the current ability estimate
+    # (see questions.adaptive); ?new=1&subject=Algebra&count=15 starts a test.
+    state = request.session.get('adaptive_test')
+    if state is None or request.GET.get('new'):
+        state = new_test(request.GET.get('subject', ''), request.GET.get('count'))
+    elif request.method == 'POST':
+        # Only an answer to the question on screen counts; a resent form changes nothing
+        if state['current'] is not None and request.POST.get('question_id') == str(state['current']):
+            question = Question.objects.filter(id=state['current']).first()
+            correct = None
+            if question is not None:
+                answer = request.POST.get('answer_text', '')
+                accept_submission(request.user, question, answer, state['nonce'])
+                key = answer_key_for(question)
+                correct = is_correct(key, answer) if key else None
+            record_answer(state, correct)
+            request.session['adaptive_test'] = state
+        return redirect('adaptive_test')
+
+    question = None
+    while not state['done']:
+        advance(state)
+        if state['done']:
+            break
+        question = Question.objects.filter(id=state['current']).first()
+        if question is not None:
+            break
+        # Deleted since the pool was built
+        record_answer(state, None)
+    request.session['adaptive_test'] = state
+
+    rows = []
+    if state['done']:
+        by_id = Question.objects.in_bulk([row[0] for row in state['asked']])
+        rows = [
+            {'question': by_id.get(qid), 'difficulty': b, 'correct': correct}
+            for qid, a, b, c, correct in state['asked']
+        ]
+    return render(request, 'questions/adaptive_test.html', {
+        'state': state,
+        'question': question,
+        'number': len(state['asked']),
+        'rows': rows,
+        'correct_count': sum(1 for row in rows if row['correct']),
+    })
+
+# Answers posted this long after the deadline still count (slow networks, auto-submit)
+EXAM_SUBMIT_GRACE = getattr(settings, 'EXAM_SUBMIT_GRACE_SECONDS', 30)
+
+
+def _exams_context(request, error=None):
+    now = timezone.now()
+    if request.user.user_type == 2:
+        exams = Exam.objects.filter(author=request.user).annotate(
+            question_count=Count('items', distinct=True),
+            attempt_count=Count('attempts', distinct=True),
+        ).order_by('-created_at')
+        return {'exams': exams, 'error': error}
+    exams = Exam.objects.filter(Q(closes_at__isnull=True) | Q(closes_at__gt=now)).annotate(
+        question_count=Count('items')
+    ).filter(question_count__gt=0).order_by('opens_at', 'id')
+    attempts = {a.exam_id: a for a in ExamAttempt.objects.filter(student=request.user)}
+    rows = [{'exam': e, 'attempt': attempts.get(e.id)} for e in exams]
+    return {'rows': rows, 'now': now, 'error': error}
+
+
+@login_required
+def exams_list(request):
+    return render(request, 'questions/exams_list.html', _exams_context(request))
+
+
+def _parse_exam_time(value):
+    value = (value or '').strip()
+    if not value:
+        return None, None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        return None, f'"{value}" is not a valid date and time.'
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed, None
+
+
+def _exam_question_ids(value):
+    """Ordered, de-duplicated ids from "12, 5 33"; returns ``(ids, error)``."""
+    ids = []
+    for token in value.replace(',', ' ').split():
+        if not token.isdigit():
+            return [], f'"{token}" is not a question id.'
+        if int(token) not in ids:
+            ids.append(int(token))
+    found = set(Question.objects.filter(id__in=ids).values_list('id', flat=True))
+    missing = [str(i) for i in ids if i not in found]
+    if missing:
+        return [], f'No question with id {", ".join(missing)}.'
+    return ids, None
+
+
+@login_required
+def exam_edit(request, id=None):
+    if request.user.user_type != 2:
+        return redirect('questions_list')
+    exam = get_object_or_404(Exam, id=id, author=request.user) if id else Exam(author=request.user)
+    question_ids = ', '.join(
+        str(qid) for qid in exam.items.values_list('question_id', flat=True)
+    ) if exam.pk else ''
+    error = None
+    if request.method == 'POST':
+        exam.title = request.POST.get('title', '').strip()
+        exam.description = request.POST.get('description', '').strip()
+        question_ids = request.POST.get('question_ids', '')
+        limit = request.POST.get('time_limit_minutes', '')
+        exam.opens_at, open_error = _parse_exam_time(request.POST.get('opens_at'))
+        exam.closes_at, close_error = _parse_exam_time(request.POST.get('closes_at'))
+        ids, ids_error = _exam_question_ids(question_ids)
+        if not exam.title:
+            error = 'The exam needs a title.'
+        elif not limit.isdigit() or int(limit) < 1:
+            error = 'The time limit must be a whole number of minutes.'
+        elif open_error or close_error or ids_error:
+            error = open_error or close_error or ids_error
+        elif exam.opens_at and exam.closes_at and exam.closes_at <= exam.opens_at:
+            error = 'The exam must close after it opens.'
+        if not error:
+            exam.time_limit_minutes = int(limit)
+            with transaction.atomic():
+                exam.save()
+                exam.items.all().delete()
+                ExamQuestion.objects.bulk_create([
+                    ExamQuestion(exam=exam, question_id=qid, position=position)
+                    for position, qid in enumerate(ids, start=1)
+                ])
+            # bulk_create skips the signal that drops the cached paper
+            invalidate_paper(exam.pk)
+            return redirect('exams_list')
+    return render(request, 'questions/exam_form.html', {
+        'exam': exam,
+        'question_ids': question_ids,
+        'error': error,
+    })
+
+
+@login_required
+def exam_delete(request, id):
+    if request.user.user_type != 2:
+        return redirect('questions_list')
+    exam = get_object_or_404(Exam, id=id, author=request.user)
+    if request.method == 'POST':
+        exam.delete()
+    return redirect('exams_list')
+
+
+def _attempt_data(attempt, now):
+    return {
+        'id': attempt.id,
+        'exam': attempt.exam_id,
+        'started_at': attempt.started_at.isoformat(),
+        'deadline': attempt.deadline.isoformat(),
+        'remaining_seconds': attempt.remaining_seconds(now),
+        'submitted': attempt.submitted_at is not None,
+    }
+
+
+def _wants_json(request):
+    return 'application/json' in request.headers.get('Accept', '') or request.GET.get('format') == 'json'
+
+
+@login_required
+def start_exam(request, id):
+    # Serves the cached paper snapshot: the only table touched per student is
+    # ExamAttempt, so a whole class can start at once
+    if request.user.user_type != 3 or request.method != 'POST':
+        return redirect('exams_list')
+    paper = get_paper(id)
+    if paper is None:
+        raise Http404('No such exam.')
+    now = timezone.now()
+    attempt = ExamAttempt.objects.filter(exam_id=id, student=request.user).first()
+    if attempt is None:
+        error = window_error(paper, now)
+        if error:
+            if _wants_json(request):
+                return JsonResponse({'error': error}, status=409)
+            return render(request, 'questions/exams_list.html', _exams_context(request, error), status=409)
+        try:
+            with transaction.atomic():
+                attempt = ExamAttempt.objects.create(
+                    exam_id=id, student=request.user, started_at=now,
+                    deadline=attempt_deadline(paper, now),
+                )
+        except IntegrityError:
+            # A double click: the first request created it
+            attempt = ExamAttempt.objects.get(exam_id=id, student=request.user)
+    if _wants_json(request):
+        # The paper is already serialized; splice it in rather than re-encode it
+        body = '{"attempt": %s, "paper": %s}' % (json.dumps(_attempt_data(attempt, now)), paper['json'])
+        return HttpResponse(body, content_type='application/json')
+    return redirect('exam_attempt', id=attempt.id)
+
+
+@login_required
+def exam_attempt(request, id):
+    attempt = get_object_or_404(ExamAttempt, id=id, student=request.user)
+    if attempt.submitted_at:
+        return redirect('student_submissions')
+    paper = get_paper(attempt.exam_id)
+    if paper is None:
+        raise Http404('No such exam.')
+    return render(request, 'questions/exam_attempt.html', {
+        'attempt': attempt,
+        'exam': paper['exam'],
+        'paper_html': mark_safe(paper['html']),
+        'remaining': attempt.remaining_seconds(),
+        # Under WSGI the page polls exam_status instead (questions.live)
+        'live_stream': can_stream(request),
+        'poll_seconds': TIME_SYNC,
+        # The paper HTML is shared by everyone; the page fills in this student's drafts
+        'drafts': {str(qid): text for qid, text in load_drafts(attempt.id, paper['question_ids']).items()},
+    })
+
+
+def _posted_answers(data, question_ids):
+    return {
+        qid: data[f'answer_{qid}'] for qid in question_ids if f'answer_{qid}' in data
+    }
+
+
+@login_required
+async def autosave_exam(request, id):
+    # Drafts go to the cache and the local draft spool only; see questions.drafts
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required.'}, status=405)
+    user = await _auser(request)
+    attempt = await ExamAttempt.objects.filter(id=id, student=user).only(
+        'exam_id', 'deadline', 'submitted_at'
+    ).afirst()
+    if attempt is None:
+        raise Http404('No such attempt.')
+    now = timezone.now()
+    if attempt.submitted_at or (now - attempt.deadline).total_seconds() > EXAM_SUBMIT_GRACE:
+        return JsonResponse({'error': 'This attempt is over.'}, status=409)
+    paper = await aget_paper(attempt.exam_id)
+    if paper is None:
+        raise Http404('No such exam.')
+    answers = _posted_answers(request.POST, paper['question_ids'])
+    if answers:
+        await sync_to_async(save_drafts)(attempt.id, attempt.deadline, answers, now)
+    return JsonResponse({
+        'saved': len(answers),
+        'saved_at': now.isoformat(),
+        'remaining_seconds': attempt.remaining_seconds(now),
+    })
+
+
+@login_required
+async def exam_status(request, id):
+    user = await _auser(request)
+    attempt = await ExamAttempt.objects.filter(id=id, student=user).afirst()
+    if attempt is None:
+        raise Http404('No such attempt.')
+    # Pages that cannot stream (WSGI) poll this for the announcements too
+    return JsonResponse({**attempt_status(attempt), 'broadcasts': await arecent_broadcasts(attempt.exam_id)})
+
+
+@login_required
+async def exam_events(request, id):
+    # Server-sent events: remaining time, teacher broadcasts and the end of
+    # the attempt (see questions.live). Serve it from the ASGI app: under
+    # WSGI each open stream holds a worker thread.
+    user = await _auser(request)
+    attempt = await ExamAttempt.objects.filter(id=id, student=user).afirst()
+    if attempt is None:
+        raise Http404('No such attempt.')
+    if not can_stream(request):
+        # WSGI cannot stream; 204 stops EventSource and the page polls exam_status
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(exam_stream(attempt, EXAM_SUBMIT_GRACE), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+async def grading_events(request):
+    # Server-sent events with new submissions and grading totals for the
+    # teacher dashboard (see questions.progress); serve from the ASGI app
+    user = await _auser(request)
+    if user.user_type != 2:
+        return HttpResponseForbidden()
+    if not can_stream(request):
+        # WSGI cannot stream; 204 stops EventSource and the page polls grading_status
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(grading_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def grading_status(request):
+    # What grading_events would have sent, for dashboards that poll
+    if request.user.user_type != 2:
+        return HttpResponseForbidden()
+    return JsonResponse(grading_snapshot())
+
+
+@login_required
+def broadcast_exam(request, id):
+    if request.user.user_type != 2:
+        return redirect('questions_list')
+    exam = get_object_or_404(Exam, id=id, author=request.user)
+    message = request.POST.get('message', '').strip()[:500] if request.method == 'POST' else ''
+    if message:
+        broadcast(exam.id, message, request.user.username)
+    return redirect('exams_list')
+
+
+@login_required
+def submit_exam(request, id):
+    attempt = get_object_or_404(ExamAttempt, id=id, student=request.user)
+    if request.method != 'POST' or attempt.submitted_at:
+        return redirect('exams_list')
+    paper = get_paper(attempt.exam_id)
+    if paper is None:
+        raise Http404('No such exam.')
+    now = timezone.now()
+    # Autosaved drafts cover questions the form did not post, and everything
+    # when the form arrives too late to count (drafts stop at the deadline)
+    answers = load_drafts(attempt.id, paper['question_ids'])
+    if (now - attempt.deadline).total_seconds() <= EXAM_SUBMIT_GRACE:
+        answers.update(_posted_answers(request.POST, paper['question_ids']))
+    questions = Question.objects.in_bulk(paper['question_ids'])
+    for qid in paper['question_ids']:
+        answer = answers.get(qid, '').strip()
+        if answer and qid in questions:
+            # One nonce per attempt and question makes a resubmit a no-op
+            accept_submission(request.user, questions[qid], answer, f'exam-{attempt.id}-{qid}')
+    ExamAttempt.objects.filter(id=attempt.id, submitted_at__isnull=True).update(submitted_at=now)
+    discard_drafts(attempt.id, paper['question_ids'])
+    attempt_ended(attempt.id)
+    return redirect('student_submissions')